@@ -11,6 +11,7 @@ from ...integrations.google_auth import (
     store_credentials_to_file,
     get_authorized_http # Keep this import for the status check
 )
+from ...services.prefetch import prefetcher
 from ...utils.logger import get_logger
 
 router = APIRouter()
@@ -67,6 +68,9 @@ async def google_callback(
         # The credentials are saved and will be loaded later when an API call is made.
         
         logger.info(f"Successfully obtained and stored credentials at {settings.TOKEN_PATH}")
+
+        # Warm the services and read caches in the background so the first questions do not run cold
+        prefetcher.trigger("login")
         
         # 3. Redirect back to the frontend on success
         return RedirectResponse(
@@ -1,8 +1,17 @@
-from fastapi import APIRouter,HTTPException,Depends
+import threading
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import APIRouter,HTTPException,Depends,Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 
+from ...config import settings
+from ...services.admission import AdmissionRejected, admission
 from ...services.agent_orchestrator import AgentOrchestrator
+from ...services.mcp_service import MCPService
 from ...utils.logger import get_logger
+from ...utils.serialization import JSON_MEDIA_TYPE, FastJSONResponse, exceeds, iter_json_object, summarize_output
 from ...models.schemas import ChatResponse
 
 router = APIRouter()
@@ -11,20 +20,110 @@ logger = get_logger(__name__)
 class ChatRequest(BaseModel):
     message:str
 
+_orchestrator: Optional[AgentOrchestrator] = None
+_orchestrator_lock = threading.Lock()
+_mcp_service: Optional[MCPService] = None
+_mcp_service_lock = threading.Lock()
+
+def get_mcp_service()->MCPService:
+    # Built on its own so startup can compile the tool registry (and fail on drift) without waiting for the LLM SDKs
+    global _mcp_service
+    if _mcp_service is None:
+        with _mcp_service_lock:
+            if _mcp_service is None:
+                _mcp_service = MCPService()
+    return _mcp_service
+
+def peek_mcp_service()->Optional[MCPService]:
+    """The MCP service if it has been built, without building it."""
+    return _mcp_service
+
 def get_orchestrator()->AgentOrchestrator:
-    return AgentOrchestrator()
+    # Shared across requests so the MCP servers keep their Google services and caches warm.
+    # The lock makes a request that arrives during the startup warm-up wait for it instead of building a second one.
+    global _orchestrator
+    if _orchestrator is None:
+        with _orchestrator_lock:
+            if _orchestrator is None:
+                _orchestrator = AgentOrchestrator(get_mcp_service())
+    return _orchestrator
+
+def peek_orchestrator()->Optional[AgentOrchestrator]:
+    """The orchestrator if it has been built, without building it."""
+    return _orchestrator
+
+
+def _client_key(http_request:Request)->str:
+    # The header is trusted as-is, so it must come from the proxy in front of the app (see CHAT_USER_HEADER)
+    user = http_request.headers.get(settings.CHAT_USER_HEADER)
+    if user:
+        return user
+    return http_request.client.host if http_request.client else "anonymous"
+
+def _deadline_seconds(http_request:Request)->float:
+    # Clients can only shorten the deadline, e.g. when their own HTTP timeout is lower
+    try:
+        requested = float(http_request.headers.get("x-request-timeout", settings.CHAT_DEADLINE_SECONDS))
+    except ValueError:
+        requested = settings.CHAT_DEADLINE_SECONDS
+    return min(requested, settings.CHAT_DEADLINE_SECONDS)
+
+DETAIL_LEVELS = ("none", "summary", "full")
+
+def _detail_level(http_request:Request, detail:Optional[str])->str:
+    level = (detail or http_request.headers.get(settings.CHAT_DETAIL_HEADER) or settings.CHAT_DEFAULT_DETAIL).lower()
+    if level not in DETAIL_LEVELS:
+        raise HTTPException(status_code=400, detail=f"detail must be one of: {', '.join(DETAIL_LEVELS)}")
+    return level
+
+def _render(response:ChatResponse, level:str)->Response:
+    """Encodes the chat response with only the tool detail the client asked for."""
+    head = {"message": response.message, "tool_executed": response.tool_executed}
+    if level == "none" or response.tool_details is None:
+        return FastJSONResponse({**head, "tool_details": None})
+    # Plain dicts rather than model_dump(), which would deep-copy every output first
+    if level == "summary":
+        details = [{"tool_call_id": d.tool_call_id, "output": summarize_output(d.output)} for d in response.tool_details]
+    else:
+        details = [{"tool_call_id": d.tool_call_id, "output": d.output} for d in response.tool_details]
+        if exceeds(details, settings.CHAT_STREAM_THRESHOLD_BYTES):
+            # A sync iterator, so Starlette encodes each piece on the threadpool instead of the event loop
+            return StreamingResponse(iter_json_object(head, "tool_details", details), media_type=JSON_MEDIA_TYPE)
+    return FastJSONResponse({**head, "tool_details": details})
+
+@asynccontextmanager
+async def _unlimited_slot(user:str, deadline_seconds:float):
+    yield
 
 
 @router.post("",response_model=ChatResponse)
 async def post_chat_message(
     request:ChatRequest,
+    http_request:Request,
+    detail:Optional[str] = None,
     orchestrator:AgentOrchestrator = Depends(get_orchestrator)
 
 ):
-    """Sends a message to the agent and gets a response, potentially triggering a Google Workspace action via tool"""
+    """Sends a message to the agent and gets a response, potentially triggering a Google Workspace action via tool
+
+    detail (or the X-Chat-Detail header) picks how much of each tool's output comes back:
+    "none" omits tool_details, "summary" keeps statuses, messages and counts, "full" returns everything.
+    """
+    user = _client_key(http_request)
+    level = _detail_level(http_request, detail)
+    slot = admission.slot if settings.CHAT_ADMISSION_ENABLED else _unlimited_slot
     try:
-        response = orchestrator.orchestrate_chat(user_message=request.message)
-        return response
+        async with slot(user, _deadline_seconds(http_request)):
+            # The chat blocks on OpenAI and Google, so it runs on the threadpool (which copies the context, incl. the trace).
+            # The client key only orders admission: every Google call goes out under the one OAuth token, so all
+            # clients share that Google user's quota bucket
+            response = await run_in_threadpool(orchestrator.orchestrate_chat, user_message=request.message)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except PermissionError as e:
         raise HTTPException(
             status_code=401,
@@ -36,3 +135,5 @@ async def post_chat_message(
             status_code=500,
             detail=f"Internal Server Error: {str(e)}"
         )
+    # Summarising, sizing and encoding large tool outputs is CPU work, so it stays off the event loop too
+    return await run_in_threadpool(_render, response, level)
@@ -0,0 +1,72 @@
+import asyncio
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from ...services.job_queue import JobStore, TERMINAL_STATUSES
+from ...utils.logger import get_logger
+from ...models.schemas import JobStatus
+
+router = APIRouter()
+logger = get_logger(__name__)
+
+# Reads go straight to the jobs table, so any worker process can answer for any job
+store = JobStore()
+
+# Seconds between status checks while streaming, and between keep-alive comments
+EVENT_POLL_SECONDS = 1.0
+KEEPALIVE_SECONDS = 15.0
+
+
+def _get_or_404(job_id: str) -> dict:
+    job = store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job
+
+
+@router.get("", response_model=List[JobStatus])
+def list_jobs(status: Optional[str] = None, limit: int = Query(50, ge=1, le=500)):
+    """Lists recent background jobs, newest first."""
+    return store.list(status=status, limit=limit)
+
+
+@router.get("/{job_id}", response_model=JobStatus)
+def get_job(job_id: str):
+    """Returns the status, progress and (once finished) result of a background job."""
+    return _get_or_404(job_id)
+
+
+@router.post("/{job_id}/cancel", response_model=JobStatus)
+def cancel_job(job_id: str):
+    """Cancels a queued job, or asks a running one to stop at its next checkpoint."""
+    _get_or_404(job_id)
+    return store.cancel(job_id)
+
+
+@router.get("/{job_id}/events")
+async def stream_job(job_id: str):
+    """Server-sent events: one `job` event per status or progress change, ending when the job finishes."""
+    await run_in_threadpool(_get_or_404, job_id)
+
+    async def events():
+        last_update, idle = None, 0.0
+        while True:
+            job = await run_in_threadpool(store.get, job_id)
+            if job is None:
+                return
+            if job["updated_at"] != last_update:
+                last_update, idle = job["updated_at"], 0.0
+                payload = JobStatus(**job).model_dump_json()
+                yield f"event: job\ndata: {payload}\n\n"
+                if job["status"] in TERMINAL_STATUSES:
+                    return
+            elif idle >= KEEPALIVE_SECONDS:
+                idle = 0.0
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(EVENT_POLL_SECONDS)
+            idle += EVENT_POLL_SECONDS
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
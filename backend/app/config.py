@@ -1,7 +1,8 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pathlib import Path
+from typing import Literal
 
-BASE_DIR = Path(__file__).resolve().parent.parent.parent
+BASE_DIR = Path(__file__).resolve().parent.parent  # backend/
 
 class Settings(BaseSettings):
     # Project Settings
@@ -14,8 +15,19 @@ class Settings(BaseSettings):
     # LLM Settings
     LLM_PROVIDER: str = "openai" 
     OPENAI_API_KEY: str  # No default - must come from .env
+    OPENAI_BASE_URL: str = ""  # OpenAI-compatible endpoint, e.g. the benchmark stub; empty uses api.openai.com
     ANTHROPIC_API_KEY: str = ""
     LLM_MODEL: str = "gpt-4o" 
+    ANTHROPIC_MODEL: str = "claude-3-5-sonnet-latest"
+    LLM_MAX_TOKENS: int = 1024  # required by the Anthropic API
+
+    # LLM routing
+    LLM_ROUTES: list[str] = []  # "provider:model" in preference order; defaults to LLM_PROVIDER first, then any provider with a key
+    LLM_ROUTER_WINDOW: int = 50
+    LLM_ROUTER_MIN_SAMPLES: int = 5
+    LLM_ROUTER_MAX_ERROR_RATE: float = 0.5
+    LLM_ROUTER_COOLDOWN_SECONDS: float = 30.0
+    LLM_ROUTER_EXPLORE_RATE: float = 0.05
     
     # Google OAuth Settings
     GOOGLE_CLIENT_ID: str  # No default - must come from .env
@@ -40,11 +52,124 @@ class Settings(BaseSettings):
     MCP_CONFIG_PATH: Path = BASE_DIR / "mcp_config" / "mcp_server_config.json"
     TOOL_DEFINITION_PATH: Path = BASE_DIR / "mcp_config" / "tool_definitions.json"
     MCP_PROTOCOL_VERSION: str = "0.9.1"
+    # "inprocess" calls server classes directly; "subprocess" runs each as MCP server processes
+    MCP_SERVER_MODE: str = "inprocess"
+    MCP_WORKERS_PER_SERVER: int = 2
+    MCP_SERVER_WORKERS: dict[str, int] = {}  # per-server override, e.g. {"GSheetsMCPServer": 4}
+    MCP_TOOL_CALL_TIMEOUT_SECONDS: float = 60.0
+    MCP_WORKER_START_TIMEOUT_SECONDS: float = 30.0
+    MCP_HEALTH_CHECK_INTERVAL_SECONDS: float = 15.0
+
+    # Tool result cache
+    TOOL_CACHE_ENABLED: bool = True
+    TOOL_CACHE_BACKEND: str = "auto"  # "memory", "sqlite" (shared by all workers) or "auto" (sqlite when WORKERS > 1)
+    TOOL_CACHE_MAX_ENTRIES: int = 512
+    TOOL_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    TOOL_CACHE_TTLS: dict[str, int] = {}  # per-tool TTL override in seconds, 0 disables, e.g. {"gmail_read_emails": 10}
+
+    # Google API resilience
+    GOOGLE_HTTP_TIMEOUT_SECONDS: float = 30.0
+    GOOGLE_API_ENDPOINT: str = ""  # serve every Workspace API from {endpoint}/{api}/, e.g. the benchmark fakes
+    TOOL_DEADLINE_SECONDS: float = 45.0
+    TOOL_DEADLINES: dict[str, float] = {}  # per-tool deadline override, e.g. {"gforms_get_responses": 300}
+    GOOGLE_RETRY_MAX_ATTEMPTS: int = 5
+    GOOGLE_RETRY_BASE_DELAY_SECONDS: float = 0.5
+    GOOGLE_RETRY_MAX_DELAY_SECONDS: float = 16.0
+    GOOGLE_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    GOOGLE_CIRCUIT_RESET_SECONDS: float = 30.0
+    GOOGLE_HEDGE_AFTER_SECONDS: float = 0.0  # start a duplicate of a slow read after this long; 0 disables
+
+    # Google API quotas
+    GOOGLE_QUOTA_ENABLED: bool = True
+    GOOGLE_QUOTAS: dict[str, dict[str, list[int]]] = {}  # per-minute [project, per-user] overrides, e.g. {"sheets": {"read": [600, 120]}}
+    GOOGLE_QUOTA_HEADROOM: float = 0.9  # fraction of each published limit the scheduler paces to
+    GOOGLE_QUOTA_BURST_SECONDS: float = 5.0
+
+    # Tool output compaction
+    TOOL_OUTPUT_TOKEN_BUDGET: int = 6000  # shared by all tool outputs of one summary call
+    TOOL_OUTPUT_MIN_TOKENS: int = 300
+
+    # Speculative tool execution
+    SPECULATIVE_TOOL_EXECUTION: bool = False  # stream the planning call and start read-only tools early
+    SPECULATIVE_MAX_WORKERS: int = 4
+
+    # Multi-step plans (execute_plan)
+    AGENT_MULTI_STEP: bool = True  # offer the model execute_plan for chained tool calls
+    PLAN_MAX_STEPS: int = 25  # tool calls and ask steps per chat, for_each items included
+    PLAN_MAX_PARALLEL: int = 4  # independent steps of one plan running at once
+    PLAN_FOR_EACH_PARALLEL: int = 4  # for_each element calls running at once, across all plans of this process
+    PLAN_TIME_BUDGET_SECONDS: float = 120.0  # no new step starts after this
+    PLAN_TOKEN_BUDGET: int = 20000  # LLM tokens for the plan, re-plans and ask steps
+    PLAN_MAX_REPLANS: int = 2  # LLM repair rounds after failed steps
+
+    # Background jobs
+    JOBS_ENABLED: bool = True
+    JOB_WORKERS: int = 2  # job threads per server process
+    JOB_POLL_SECONDS: float = 2.0
+    JOB_LEASE_SECONDS: float = 60.0  # a running job with no heartbeat for this long is resumed by another worker
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_DEADLINE_SECONDS: float = 3600.0  # replaces the per-tool deadlines while a job runs
+    JOB_MIN_SHEET_CELLS: int = 5000  # gsheet_update_sheet calls at least this large run as jobs
+    JOB_TOOLS: list[str] = []  # tools that always run as jobs
+
+    # Chat admission control (per worker process)
+    CHAT_ADMISSION_ENABLED: bool = True
+    CHAT_MAX_CONCURRENT: int = 8  # chats executing at once; keep below the threadpool size (40)
+    CHAT_MAX_QUEUE: int = 32  # chats waiting for a slot; beyond this requests get 503
+    CHAT_MAX_PER_USER: int = 4  # running + queued chats per user; beyond this requests get 429 (0 = no limit)
+    CHAT_DEADLINE_SECONDS: float = 120.0  # default deadline; clients may ask for less with X-Request-Timeout
+    CHAT_EXPECTED_SECONDS: float = 8.0  # initial estimate of a chat's duration, refined as chats finish
+    CHAT_SERVICE_TIME_ALPHA: float = 0.2  # weight of the latest chat in the moving average
+    # Identifies the user for fairness and CHAT_MAX_PER_USER; falls back to the client address. Only set this
+    # to a header your reverse proxy sets after authentication and strips from client requests: otherwise any
+    # client can pick a fresh value per request and escape the per-user limit and the fair share
+    CHAT_USER_HEADER: str = "X-User-ID"
+
+    # Chat responses
+    CHAT_DEFAULT_DETAIL: Literal["none", "summary", "full"] = "full"  # tool_details level when the client asks for none
+    CHAT_DETAIL_HEADER: str = "X-Chat-Detail"  # same as the ?detail= query parameter
+    CHAT_STREAM_THRESHOLD_BYTES: int = 1_000_000  # larger full-detail responses are encoded and sent one tool output at a time
+    GZIP_ENABLED: bool = True  # compress responses for clients that accept gzip
+    GZIP_MIN_BYTES: int = 1024  # smaller responses are sent uncompressed
+
+    # Post-login prefetch
+    PREFETCH_ENABLED: bool = False  # warm services and read caches after login and periodically (one worker runs the periodic loop)
+    PREFETCH_INTERVAL_SECONDS: float = 600.0  # periodic re-warm while a token is stored; 0 prefetches only after login
+    PREFETCH_MAX_PARALLEL: int = 2  # reads in flight at once (they also run at bulk quota priority)
+    PREFETCH_MAX_READS: int = 10  # reads per run, recent documents included
+    PREFETCH_RECENT_DOCUMENTS: int = 5  # most recently read docs/sheets/forms to refresh
+    PREFETCH_CALENDAR: bool = True  # today's and upcoming events
+    PREFETCH_INBOX: bool = True  # unread and recent message metadata
+    PREFETCH_DEADLINE_SECONDS: float = 60.0  # a run starts no reads after this
+
+    # Data pipelines (pipeline_run)
+    PIPELINE_PAGE_ROWS: int = 1000  # source rows read per request
+    PIPELINE_SHEET_MAX_COLUMNS: int = 52  # columns read from a sheet source
+    PIPELINE_BATCH_ROWS: int = 500  # rows per append to a sheet sink
+    PIPELINE_MAX_EMAILS: int = 200  # a gmail sink stops with an error beyond this
+    PIPELINE_SAMPLE_RECORDS: int = 5  # records returned by a dry run
+
+    # Sheets query engine
+    SHEET_QUERY_CACHE_TTL_SECONDS: int = 300
+    SHEET_QUERY_MAX_CACHED_TABLES: int = 32
+    SHEET_QUERY_MAX_RESULT_ROWS: int = 500
+    SHEET_WRITE_MAX_CHUNK_ROWS: int = 1000
+    SHEET_WRITE_MAX_REQUEST_BYTES: int = 2_000_000
+
+    # Forms ingestion and builder
+    FORMS_RESPONSES_PAGE_SIZE: int = 1000
+    FORMS_TEXT_SAMPLE_SIZE: int = 5
+    FORMS_TOP_OPTIONS: int = 20
+    FORMS_BATCH_MAX_REQUESTS: int = 100
 
     # Server Settings
     HOST: str = "0.0.0.0"
     PORT: int = 8000
     RELOAD: bool = True
+    WORKERS: int = 1  # uvicorn worker processes; above 1, reload is off and caches/quotas are shared or split across workers
+    # "background" compiles the tool registry before serving (drift fails the boot) and builds the LLM clients in a thread;
+    # "blocking" builds the whole agent before serving; "off" waits for the first chat request
+    STARTUP_WARMUP: str = "background"
 
     # Database
     DATABASE_URL: str = "sqlite:///./agentic_workspace.db"
@@ -56,6 +181,15 @@ class Settings(BaseSettings):
     # Logging
     LOG_LEVEL: str = "INFO"
     LOG_FILE: str = "logs/app.log"
+    LOG_FORMAT: str = "text"  # "text" or "json" (one object per line)
+    LOG_ASYNC: bool = True  # write from a background thread instead of the request path
+    LOG_MAX_FIELD_CHARS: int = 2000  # longer messages and extra= fields are truncated; 0 disables
+    LOG_SAMPLE_RATES: dict[str, float] = {}  # logger name or prefix -> fraction of INFO records kept, e.g. {"app.mcp_servers": 0.1}
+
+    # Tracing
+    TRACE_ENABLED: bool = True
+    TRACE_SAMPLE_RATE: float = 0.1  # fraction of requests whose spans are exported
+    TRACE_FILE: str = "logs/traces.jsonl"
 
     model_config = SettingsConfigDict(
         env_file=".env", 
@@ -66,5 +200,4 @@ class Settings(BaseSettings):
 
 settings = Settings()
 
-# Ensure credentials directory exists
-settings.CREDENTIALS_DIR.mkdir(exist_ok=True)
\ No newline at end of file
+# The credentials directory is created when the first token is stored (google_auth.store_credentials_to_file)
\ No newline at end of file
@@ -1,15 +1,18 @@
 import os
 import json
 import httplib2
-from typing import Any, Optional
+from google_auth_httplib2 import AuthorizedHttp
+from typing import Any, Optional, TYPE_CHECKING
 from pathlib import Path
 
-from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import Flow
-from google.auth import default as google_auth_default
+
+if TYPE_CHECKING:
+    # oauthlib and requests are only needed for the login flow and token refresh, so they load on first use
+    from google_auth_oauthlib.flow import Flow
 
 from ..config import settings
+from ..utils.locks import interprocess_lock
 from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -19,7 +22,7 @@ logger = get_logger(__name__)
 CREDENTIALS_FILE = settings.CREDENTIALS_DIR / "credentials.json"
 
 
-def build_oauth_client() -> Flow:
+def build_oauth_client() -> "Flow":
     """
     Initializes and returns the Google OAuth flow object.
     
@@ -46,6 +49,7 @@ def build_oauth_client() -> Flow:
         }
 
         # 2. Build the flow object
+        from google_auth_oauthlib.flow import Flow
         flow = Flow.from_client_config(
             client_config=client_config,
             scopes=settings.GOOGLE_SCOPES,
@@ -76,18 +80,35 @@ def load_credentials_from_file(token_path: Path) -> Optional[Credentials]:
         logger.error(f"Error loading credentials from token.json: {e}")
         return None
 
+def token_lock_path(token_path: Path) -> Path:
+    return token_path.with_name(token_path.name + ".lock")
+
 def store_credentials_to_file(credentials: Credentials, token_path: Path):
     """Saves the credentials (including refresh token) to the specified file."""
     token_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(token_path, 'w') as token_file:
+    # Write then rename, so a worker reading concurrently never sees a half-written token
+    tmp_path = token_path.with_name(f"{token_path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w') as token_file:
         token_file.write(credentials.to_json())
+    os.replace(tmp_path, token_path)
 
-def exchange_code_for_token(code: str, flow: Flow) -> Credentials:
+def exchange_code_for_token(code: str, flow: "Flow") -> Credentials:
     """Exchanges the authorization code for an OAuth token."""
     flow.fetch_token(code=code)
     return flow.credentials
 
 
+def build_service(api_name: str, api_version: str, **kwargs) -> Any:
+    """googleapiclient.discovery.build, imported on first use since discovery is slow to load."""
+    from googleapiclient.discovery import build
+    if settings.GOOGLE_API_ENDPOINT:
+        # Fake endpoints serve no discovery documents; the copies bundled with the client describe the same APIs
+        kwargs.pop("discoveryServiceUrl", None)
+        kwargs["static_discovery"] = True
+        kwargs["client_options"] = {"api_endpoint": f"{settings.GOOGLE_API_ENDPOINT.rstrip('/')}/{api_name}/"}
+    return build(api_name, api_version, **kwargs)
+
+
 def get_authorized_http(credentials: Optional[Credentials] = None) -> httplib2.Http:
     """
     Retrieves or loads the Google credentials, ensures they are valid/refreshed,
@@ -102,19 +123,27 @@ def get_authorized_http(credentials: Optional[Credentials] = None) -> httplib2.H
     
     # Check if credentials need refreshing
     if credentials.expired and credentials.refresh_token:
-        try:
-            # Use the refresh token to get a new access token
-            credentials.refresh(Request())
-            # Save the refreshed credentials back to the file
-            store_credentials_to_file(credentials, settings.TOKEN_PATH)
-            logger.info("Successfully refreshed Google access token.")
-        except Exception as e:
-            # If refresh fails (e.g., revoked token), log and force re-auth
-            logger.error(f"Failed to refresh token. User must re-authenticate. Error: {e}")
-            # Ensure file is removed if refresh fails to force re-authentication
-            if settings.TOKEN_PATH.exists():
-                os.remove(settings.TOKEN_PATH)
-            raise PermissionError("Token refresh failed. User must re-authenticate.")
+        # Workers share token.json; the lock makes one of them refresh while the rest wait and reuse its token
+        with interprocess_lock(token_lock_path(settings.TOKEN_PATH)):
+            latest = load_credentials_from_file(settings.TOKEN_PATH)
+            if latest is not None and latest.valid:
+                credentials = latest
+            else:
+                try:
+                    # Use the refresh token to get a new access token
+                    from google.auth.transport.requests import Request
+                    credentials.refresh(Request())
+                    # Save the refreshed credentials back to the file
+                    store_credentials_to_file(credentials, settings.TOKEN_PATH)
+                    logger.info("Successfully refreshed Google access token.")
+                except Exception as e:
+                    # If refresh fails (e.g., revoked token), log and force re-auth
+                    logger.error(f"Failed to refresh token. User must re-authenticate. Error: {e}")
+                    # Ensure file is removed if refresh fails to force re-authentication
+                    if settings.TOKEN_PATH.exists():
+                        os.remove(settings.TOKEN_PATH)
+                    raise PermissionError("Token refresh failed. User must re-authenticate.")
             
     # Return the authorized HTTP object used by googleapiclient.discovery.build
-    return credentials.authorize(httplib2.Http())
\ No newline at end of file
+    # The socket timeout keeps a stalled connection from holding a worker thread forever
+    return AuthorizedHttp(credentials, http=httplib2.Http(timeout=settings.GOOGLE_HTTP_TIMEOUT_SECONDS))
\ No newline at end of file
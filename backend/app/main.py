@@ -1,13 +1,47 @@
-from fastapi import FastAPI
+import importlib
+import os
+import threading
+import time
+
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
+from fastapi.middleware.gzip import GZipMiddleware
 
 from .config import settings
-from .api.routes import chat, auth # Import other route modules here
+from .api.routes import chat, auth, jobs # Import other route modules here
+from .services.prefetch import prefetcher
 from .utils.logger import get_logger
+from .utils.metrics import REGISTRY, CONTENT_TYPE
+from .utils.tracing import current_request_id, request_span
 
 logger = get_logger(__name__)
 
+# Slow-to-import SDKs that are otherwise loaded by the first request that needs them
+WARMUP_MODULES = ("openai", "anthropic", "googleapiclient.discovery", "google_auth_oauthlib.flow")
+
+def warm_up():
+    """Builds the agent and imports the heavy SDKs so the first chat request does not pay for them."""
+    started = time.perf_counter()
+    chat.get_orchestrator()
+    for module in WARMUP_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            logger.warning(f"Warm-up could not import {module}: {e}")
+    logger.info(f"Warm-up finished in {time.perf_counter() - started:.2f}s")
+
+# Set when a background warm-up fails, so /ready can report why this worker is not ready
+_warmup_error = None
+
+def _background_warm_up():
+    global _warmup_error
+    try:
+        warm_up()
+    except Exception as e:
+        # Leave the build to the first request, which will surface the error to the caller
+        _warmup_error = str(e)
+        logger.error(f"Background warm-up failed: {e}", exc_info=True)
+
 def create_app() -> FastAPI:
     # --- CHANGE START ---
     docs_url = f"{settings.API_V1_STR}/docs"
@@ -33,12 +67,61 @@ def create_app() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    if settings.GZIP_ENABLED:
+        # Large tool_details (sheet values, form responses) compress well; streamed responses are compressed as they go
+        app.add_middleware(GZipMiddleware, minimum_size=settings.GZIP_MIN_BYTES)
+
+    @app.middleware("http")
+    async def trace_requests(request: Request, call_next):
+        # Honour an upstream request ID so logs can be joined across services
+        request_id = request.headers.get("x-request-id")
+        with request_span(f"{request.method} {request.url.path}", request_id=request_id, **{"http.method": request.method, "http.target": request.url.path}) as trace_span:
+            response = await call_next(request)
+            trace_span.set_attribute("http.status_code", response.status_code)
+            response.headers["X-Request-ID"] = current_request_id()
+        return response
 
     # Include API Routers
     app.include_router(auth.router, prefix=f"{settings.API_V1_STR}/auth", tags=["Authentication"])
     app.include_router(chat.router, prefix=f"{settings.API_V1_STR}/chat", tags=["Chat & Agent"])
+    app.include_router(jobs.router, prefix=f"{settings.API_V1_STR}/jobs", tags=["Background Jobs"])
     # Include other routers: gmail, gdocs, calendar, etc.
 
+    @app.on_event("startup")
+    def build_orchestrator():
+        if settings.STARTUP_WARMUP == "blocking":
+            # Compile the tool registry up front so drift between tool definitions and servers fails the boot, not a request
+            warm_up()
+        elif settings.STARTUP_WARMUP == "background":
+            # The registry is compiled here, before serving, so drift still fails the boot; only the LLM clients and SDK imports are deferred
+            chat.get_mcp_service()
+            threading.Thread(target=_background_warm_up, name="warm-up", daemon=True).start()
+        # Only the MCP service: prefetching never needs the agent, so STARTUP_WARMUP="off" still builds no LLM clients
+        prefetcher.start(chat.get_mcp_service)
+
+    @app.on_event("shutdown")
+    def stop_mcp_workers():
+        prefetcher.stop()
+        mcp_service = chat.peek_mcp_service()
+        if mcp_service is not None:
+            mcp_service.close()
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        # Prometheus text format; outside API_V1_STR so scrapers use the conventional path
+        return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+    @app.get("/ready", include_in_schema=False)
+    def ready(response: Response):
+        # Per worker: a load balancer or process manager should only route here once this process has warmed up
+        is_ready = chat.peek_orchestrator() is not None or settings.STARTUP_WARMUP == "off"
+        if not is_ready:
+            response.status_code = 503
+        body = {"ready": is_ready, "pid": os.getpid()}
+        if _warmup_error:
+            body["error"] = _warmup_error
+        return body
+
     @app.get("/")
     def read_root():
         return {"message": "Agentic Google Workspace Backend is Running!"}
@@ -53,13 +136,16 @@ def create_app() -> FastAPI:
 app = create_app()
 
 if __name__ == "__main__":
-    # Ensure RELOAD is cast to boolean for Uvicorn
-    should_reload = settings.RELOAD.lower() in ('true', '1', 't')
+    import uvicorn
+
+    # Uvicorn cannot reload and prefork at the same time; workers win
+    should_reload = settings.RELOAD and settings.WORKERS <= 1
     
-    logger.info(f"Server is launching at http://{settings.HOST}:{settings.PORT}")
+    logger.info(f"Server is launching at http://{settings.HOST}:{settings.PORT} with {settings.WORKERS} worker(s)")
     uvicorn.run(
-        "main:app", 
+        "app.main:app", 
         host=settings.HOST, 
         port=settings.PORT, 
-        reload=should_reload
+        reload=should_reload,
+        workers=settings.WORKERS
     )
\ No newline at end of file
@@ -0,0 +1,80 @@
+"""Progress checkpoints for tools that run as background jobs.
+
+A server method that loops over chunks asks for `progress(key)` and calls `advance()` after each
+chunk is done. Inside a job, every advance is saved with the job, so after a restart the tool is
+re-run and `completed` tells it how many chunks to skip. Outside a job, progress() returns a
+tracker that is never persisted, so the same code path serves interactive calls.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional
+
+
+class JobCancelledError(Exception):
+    """Raised at a checkpoint when the job has been cancelled."""
+
+
+class Progress:
+    def __init__(self, key: str, state: Optional[Dict[str, Any]] = None, save: Optional[Callable[[str, Dict[str, Any]], bool]] = None):
+        state = state or {}
+        self.key = key
+        self.completed: int = state.get("completed", 0)
+        self.total: Optional[int] = state.get("total")
+        # Counters the tool wants back on resume, e.g. cells already written
+        self.data: Dict[str, Any] = state.get("data", {})
+        self._save = save
+
+    def advance(self, total: Optional[int] = None, **data):
+        """Marks one more unit done; raises JobCancelledError if the job was cancelled meanwhile."""
+        self.completed += 1
+        if total is not None:
+            self.total = total
+        self.data.update(data)
+        if self._save is not None and not self._save(self.key, {"completed": self.completed, "total": self.total, "data": self.data}):
+            raise JobCancelledError(f"Job cancelled after {self.completed} of {self.total or '?'} step(s) of {self.key}")
+
+
+class JobContext:
+    """Binds checkpoints to one job; `save(key, state)` persists and returns False once the job is cancelled."""
+
+    def __init__(self, job_id: str, checkpoints: Dict[str, Dict[str, Any]], save: Callable[[str, Dict[str, Any]], bool]):
+        self.job_id = job_id
+        self.checkpoints = checkpoints
+        self.save = save
+
+
+_job: ContextVar[Optional[JobContext]] = ContextVar("current_job", default=None)
+_scope: ContextVar[str] = ContextVar("checkpoint_scope", default="")
+
+
+@contextmanager
+def job_context(context: JobContext):
+    token = _job.set(context)
+    try:
+        yield context
+    finally:
+        _job.reset(token)
+
+
+@contextmanager
+def checkpoint_scope(name: str):
+    """Prefixes progress keys inside the block, so a tool that calls another tool several times
+    (e.g. one sheet append per batch) gets separate checkpoints for each nested call."""
+    token = _scope.set(f"{_scope.get()}{name}/")
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def current_job_id() -> Optional[str]:
+    context = _job.get()
+    return context.job_id if context is not None else None
+
+
+def progress(key: str) -> Progress:
+    context = _job.get()
+    key = f"{_scope.get()}{key}"
+    if context is None:
+        return Progress(key)
+    return Progress(key, context.checkpoints.get(key), context.save)
@@ -1,8 +1,8 @@
 from typing import Dict, Any, List, Optional
-from googleapiclient.discovery import build
 from datetime import datetime,timedelta
 
-from ..integrations.google_auth import get_authorized_http
+from ..integrations.google_auth import get_authorized_http, build_service
+from .resilience import execute_request
 from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -15,11 +15,12 @@ class GCalendarMCPServer:
     def _get_service(self):
         if not self.service:
             http = get_authorized_http()
-            self.service = build('calendar', 'v3', http=http)
+            self.service = build_service('calendar', 'v3', http=http)
         return self.service
     
     #tool: calendar schedule meeting
     def calendar_schedule_meeting(self,summary:str,attendees:List[str],start_time:str,end_time:Optional[str]=None,location:Optional[str] = None)->Dict[str,Any]:
+        """Schedules a meeting with a Google Meet link. Times are ISO 8601; the default length is one hour."""
         try:
             service = self._get_service()
             start_dt = datetime.fromisoformat(start_time)
@@ -35,11 +36,11 @@ class GCalendarMCPServer:
                 'conferenceData': {'createRequest': {'requestId': f"meet-{datetime.now().timestamp()}", 'conferenceSolutionKey': {'type': 'hangoutsMeet'}}},
             }
 
-            created_event = service.events().insert(
+            created_event = execute_request(service.events().insert(
                 calendarId = self.calendar_id,
                 body = event,
                 conferenceDataVersion=1
-            ).execute()
+            ))
             return{
                 "status":"success",
                 "message":f"Meeting{summary} scheduled successfully.",
@@ -54,7 +55,7 @@ class GCalendarMCPServer:
         """Cancels an existing calendar event."""
         try:
             service = self._get_service()
-            service.events().delete(calendarId=self.calendar_id, eventId=event_id).execute()
+            execute_request(service.events().delete(calendarId=self.calendar_id, eventId=event_id))
             
             return {
                 "status": "success",
@@ -72,14 +73,14 @@ class GCalendarMCPServer:
             if not time_min:
                 time_min = datetime.now().isoformat() + 'Z' 
 
-            events_result = service.events().List(
+            events_result = execute_request(service.events().list(
                 calendarId=self.calendar_id,
                 timeMin = time_min,
                 timeMax = time_max,
                 maxResults = max_results,
                 singleEvents=True,
                 orderBy='startTime'
-            ).execute()
+            ))
 
             events = events_result.get('items', [])
             event_summaries = []
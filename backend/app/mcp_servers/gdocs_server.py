@@ -1,8 +1,8 @@
 from typing import Dict,Any,Optional
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
-from ..integrations.google_auth import get_authorized_http
+from ..integrations.google_auth import get_authorized_http, build_service
+from .resilience import execute_request
 from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -15,19 +15,19 @@ class GDocsMCPServer:
         """Initializes and returns the Google Docs service."""
         if not self.docs_service:
             http = get_authorized_http()
-            self.docs_service = build('docs', 'v1', http=http)
+            self.docs_service = build_service('docs', 'v1', http=http)
         return self.docs_service
     
     def gdocs_create_document(self,title:str,content:Optional[str]=None)->Dict[str,Any]:
         """Creates a new Google Doc and optionally inserts initial content."""
         try:
             service = self._get_service()
-            document = service.documents().create(body={'title': title}).execute()
+            document = execute_request(service.documents().create(body={'title': title}))
             document_id = document.get('documentId')
 
             if content:
                 requests = [{'insertText': {'text': content, 'endIndex': 1}}]
-                service.documents().batchUpdate(documentId=document_id, body={'requests': requests}).execute()
+                execute_request(service.documents().batchUpdate(documentId=document_id, body={'requests': requests}))
 
             return {
                 "status": "success",
@@ -36,7 +36,7 @@ class GDocsMCPServer:
             }
         
         except Exception as e:
-            logger.erro(f"Failed to create document: {e}")
+            logger.error(f"Failed to create document: {e}")
             return {"status": "error", "message": f"Failed to create document. Details: {str(e)}"}
         
 
@@ -44,12 +44,12 @@ class GDocsMCPServer:
         """Retrives the text content of a Google Doc"""
         try:
             service = self._get_service()
-            document = service.documents().get(documentId = document_id).execute()
+            document = execute_request(service.documents().get(documentId = document_id))
 
             content_text = ""
             for element in document.get('body',{}).get('content',[]):
                 if 'paragraph' in element:
-                    for run in element['paragraph']['element']:
+                    for run in element['paragraph'].get('elements', []):
                         if 'textRun' in run:
                             content_text += run['textRun']['content']
             return {
@@ -71,7 +71,7 @@ class GDocsMCPServer:
             service = self._get_service()
             
             # Find the end of the document
-            document = service.documents().get(documentId=document_id, fields='body.content').execute()
+            document = execute_request(service.documents().get(documentId=document_id, fields='body.content'))
             end_index = document['body']['content'][-1]['endIndex'] - 1
             
             requests = [
@@ -82,10 +82,10 @@ class GDocsMCPServer:
                     }
                 }
             ]
-            service.documents().batchUpdate(
+            execute_request(service.documents().batchUpdate(
                 documentId=document_id, 
                 body={'requests': requests}
-            ).execute()
+            ))
             
             return {
                 "status": "success",
@@ -0,0 +1,152 @@
+import copy
+import json
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+
+from ..config import settings
+from ..utils.db import sqlite_session
+
+QUESTION_TYPES = (
+    "short_answer", "paragraph", "multiple_choice", "checkbox", "dropdown",
+    "scale", "grid", "checkbox_grid", "date", "time", "section", "text"
+)
+
+CHOICE_TYPES = {"multiple_choice": "RADIO", "checkbox": "CHECKBOX", "dropdown": "DROP_DOWN"}
+
+# Fields the API assigns on creation; they have to be stripped before an item can be created again
+_SERVER_ASSIGNED_KEYS = {"itemId", "questionId", "goToSectionId"}
+# Media items reference uploaded content that cannot be re-created from the form definition
+_UNCLONEABLE_ITEMS = ("imageItem", "videoItem")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS form_templates (
+    name TEXT PRIMARY KEY,
+    source_form_id TEXT,
+    definition_json TEXT NOT NULL,
+    created_at TEXT
+);
+"""
+
+
+def build_item(question: Dict[str, Any]) -> Dict[str, Any]:
+    """Builds a Forms API Item from a simplified question spec.
+
+    Spec keys: question (title), type, options, required, description, and for scale: low, high,
+    low_label, high_label; for grid/checkbox_grid: rows, columns.
+    """
+    q_type = question.get('type', 'short_answer')
+    if q_type not in QUESTION_TYPES:
+        raise ValueError(f"Unsupported question type '{q_type}'. Supported: {', '.join(QUESTION_TYPES)}")
+
+    item = {"title": question.get('question') or question.get('title', '')}
+    if question.get('description'):
+        item['description'] = question['description']
+
+    if q_type == 'section':
+        item['pageBreakItem'] = {}
+        return item
+    if q_type == 'text':
+        item['textItem'] = {}
+        return item
+
+    if q_type in ('grid', 'checkbox_grid'):
+        rows, columns = question.get('rows') or [], question.get('columns') or question.get('options') or []
+        if not rows or not columns:
+            raise ValueError(f"Grid question '{item['title']}' needs both rows and columns.")
+        item['questionGroupItem'] = {
+            "questions": [{"required": question.get('required', True), "rowQuestion": {"title": r}} for r in rows],
+            "grid": {"columns": {"type": "CHECKBOX" if q_type == 'checkbox_grid' else "RADIO", "options": [{"value": c} for c in columns]}}
+        }
+        return item
+
+    body: Dict[str, Any] = {"required": question.get('required', True)}
+    if q_type in CHOICE_TYPES:
+        options = question.get('options') or []
+        if not options:
+            raise ValueError(f"Question '{item['title']}' of type {q_type} needs options.")
+        body['choiceQuestion'] = {"type": CHOICE_TYPES[q_type], "options": [{"value": opt} for opt in options]}
+    elif q_type == 'scale':
+        scale = {"low": int(question.get('low', 1)), "high": int(question.get('high', 5))}
+        if question.get('low_label'):
+            scale['lowLabel'] = question['low_label']
+        if question.get('high_label'):
+            scale['highLabel'] = question['high_label']
+        body['scaleQuestion'] = scale
+    elif q_type == 'date':
+        body['dateQuestion'] = {"includeYear": True}
+    elif q_type == 'time':
+        body['timeQuestion'] = {}
+    else:
+        body['textQuestion'] = {"paragraph": q_type == 'paragraph'}
+    item['questionItem'] = {"question": body}
+    return item
+
+
+def create_item_requests(items: List[Dict[str, Any]], start_index: int = 0) -> List[Dict[str, Any]]:
+    return [
+        {"createItem": {"item": item, "location": {"index": start_index + i}}}
+        for i, item in enumerate(items)
+    ]
+
+
+def chunk_requests(requests: List[Dict[str, Any]], size: int = settings.FORMS_BATCH_MAX_REQUESTS) -> List[List[Dict[str, Any]]]:
+    return [requests[i:i + size] for i in range(0, len(requests), size)]
+
+
+def _strip_server_fields(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _strip_server_fields(v) for k, v in value.items() if k not in _SERVER_ASSIGNED_KEYS}
+    if isinstance(value, list):
+        return [_strip_server_fields(v) for v in value]
+    return value
+
+
+def template_from_form(form: Dict[str, Any]) -> Dict[str, Any]:
+    """Turns a forms.get payload into a reusable definition of info and creatable items."""
+    items = [
+        _strip_server_fields(copy.deepcopy(item))
+        for item in form.get('items', [])
+        if not any(key in item for key in _UNCLONEABLE_ITEMS)
+    ]
+    info = form.get('info', {})
+    return {
+        "title": info.get('title', ''),
+        "description": info.get('description'),
+        "items": items,
+        "skipped_items": len(form.get('items', [])) - len(items)
+    }
+
+
+class FormTemplateStore:
+    """Named form definitions kept in the local database so recurring forms skip the source read."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._initialised = False
+        self._memory: Dict[str, Dict[str, Any]] = {}
+
+    def _connect(self):
+        if not self._initialised:
+            with sqlite_session() as conn:
+                conn.executescript(SCHEMA)
+            self._initialised = True
+        return sqlite_session()
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if name in self._memory:
+                return self._memory[name]
+            with self._connect() as conn:
+                row = conn.execute("SELECT definition_json FROM form_templates WHERE name = ?", (name,)).fetchone()
+            if row:
+                self._memory[name] = json.loads(row["definition_json"])
+            return self._memory.get(name)
+
+    def save(self, name: str, definition: Dict[str, Any], source_form_id: Optional[str] = None):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO form_templates (name, source_form_id, definition_json, created_at) VALUES (?, ?, ?, ?)",
+                (name, source_form_id, json.dumps(definition), datetime.now(timezone.utc).isoformat())
+            )
+            self._memory[name] = definition
@@ -0,0 +1,230 @@
+import json
+import math
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Any, Iterator, List, Optional
+
+from ..config import settings
+from ..utils.db import sqlite_session
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS form_responses (
+    form_id TEXT NOT NULL,
+    response_id TEXT NOT NULL,
+    last_submitted_time TEXT,
+    response_json TEXT NOT NULL,
+    PRIMARY KEY (form_id, response_id)
+);
+CREATE TABLE IF NOT EXISTS form_ingest_state (
+    form_id TEXT PRIMARY KEY,
+    watermark TEXT,
+    response_count INTEGER NOT NULL DEFAULT 0,
+    questions_json TEXT NOT NULL DEFAULT '{}',
+    aggregates_json TEXT NOT NULL DEFAULT '{}',
+    updated_at TEXT
+);
+"""
+
+
+def _parse_number(value: str) -> Optional[float]:
+    try:
+        number = float(value.replace(",", "").strip())
+    except (ValueError, AttributeError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def extract_questions(form: Dict[str, Any]) -> Dict[str, Dict[str, str]]:
+    """Maps questionId -> {title, kind} for every question in a form definition, including grid rows."""
+    questions = {}
+    for item in form.get('items', []):
+        title = item.get('title', 'Untitled')
+        question = item.get('questionItem', {}).get('question')
+        if question:
+            if 'choiceQuestion' in question:
+                kind = 'choice'
+            elif 'scaleQuestion' in question or 'ratingQuestion' in question:
+                kind = 'scale'
+            elif 'fileUploadQuestion' in question:
+                kind = 'file'
+            else:
+                kind = 'text'
+            questions[question['questionId']] = {"title": title, "kind": kind}
+        for row in item.get('questionGroupItem', {}).get('questions', []):
+            row_title = row.get('rowQuestion', {}).get('title', '')
+            questions[row['questionId']] = {"title": f"{title} [{row_title}]", "kind": 'choice'}
+    return questions
+
+
+class ResponseAggregator:
+    """Per-question aggregates that are updated one response at a time.
+
+    Options are counted for choice and scale questions, numeric answers keep count/sum/sum of
+    squares/min/max so mean and stddev never need the raw data again, and free text keeps
+    the most recent samples only.
+    """
+
+    def __init__(self, state: Optional[Dict[str, Any]] = None, sample_size: int = settings.FORMS_TEXT_SAMPLE_SIZE):
+        self.state = state or {}
+        self.sample_size = sample_size
+
+    def _question_state(self, question_id: str, meta: Dict[str, str]) -> Dict[str, Any]:
+        entry = self.state.setdefault(question_id, {"answered": 0, "options": {}, "numeric": None, "samples": []})
+        entry["title"] = meta.get("title", question_id)
+        entry["kind"] = meta.get("kind", "text")
+        return entry
+
+    def add(self, response: Dict[str, Any], questions: Dict[str, Dict[str, str]]):
+        for question_id, answer in response.get('answers', {}).items():
+            entry = self._question_state(question_id, questions.get(question_id, {}))
+            entry["answered"] += 1
+
+            if 'fileUploadAnswers' in answer:
+                files = answer['fileUploadAnswers'].get('answers', [])
+                entry["options"]["files"] = entry["options"].get("files", 0) + len(files)
+                continue
+
+            values = [a.get('value', '') for a in answer.get('textAnswers', {}).get('answers', [])]
+            for value in values:
+                if entry["kind"] in ('choice', 'scale'):
+                    entry["options"][value] = entry["options"].get(value, 0) + 1
+                number = _parse_number(value)
+                if number is not None:
+                    stats = entry["numeric"] or {"count": 0, "sum": 0.0, "sum_sq": 0.0, "min": number, "max": number}
+                    stats["count"] += 1
+                    stats["sum"] += number
+                    stats["sum_sq"] += number * number
+                    stats["min"] = min(stats["min"], number)
+                    stats["max"] = max(stats["max"], number)
+                    entry["numeric"] = stats
+                elif entry["kind"] == 'text':
+                    entry["samples"] = (entry["samples"] + [value])[-self.sample_size:]
+
+    def summary(self, top_options: int = settings.FORMS_TOP_OPTIONS) -> List[Dict[str, Any]]:
+        """Compact per-question view for the agent."""
+        questions = []
+        for question_id, entry in self.state.items():
+            item = {"question_id": question_id, "title": entry.get("title"), "kind": entry.get("kind"), "answered": entry["answered"]}
+            if entry["options"]:
+                ranked = sorted(entry["options"].items(), key=lambda kv: kv[1], reverse=True)
+                item["option_counts"] = dict(ranked[:top_options])
+                if len(ranked) > top_options:
+                    item["other_options"] = len(ranked) - top_options
+            stats = entry.get("numeric")
+            if stats and stats["count"]:
+                mean = stats["sum"] / stats["count"]
+                variance = max(stats["sum_sq"] / stats["count"] - mean * mean, 0.0)
+                item["stats"] = {
+                    "count": stats["count"],
+                    "mean": round(mean, 4),
+                    "min": stats["min"],
+                    "max": stats["max"],
+                    "stddev": round(math.sqrt(variance), 4)
+                }
+            if entry["samples"]:
+                item["samples"] = entry["samples"]
+            questions.append(item)
+        return questions
+
+
+class FormResponseStore:
+    """Local per-form copy of responses with an ingestion watermark and running aggregates."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._initialised = False
+
+    def _connect(self):
+        if not self._initialised:
+            with sqlite_session() as conn:
+                conn.executescript(SCHEMA)
+            self._initialised = True
+        return sqlite_session()
+
+    def load_state(self, form_id: str) -> Dict[str, Any]:
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT * FROM form_ingest_state WHERE form_id = ?", (form_id,)).fetchone()
+        if not row:
+            return {"watermark": None, "response_count": 0, "questions": {}, "aggregates": {}}
+        return {
+            "watermark": row["watermark"],
+            "response_count": row["response_count"],
+            "questions": json.loads(row["questions_json"]),
+            "aggregates": json.loads(row["aggregates_json"]),
+        }
+
+    def save_page(self, form_id: str, responses: List[Dict[str, Any]], questions: Dict[str, Dict[str, str]], aggregator: ResponseAggregator, response_count: int, watermark: Optional[str]) -> int:
+        """Stores one page of responses and folds the new ones into the aggregates in a single transaction.
+
+        Responses already stored with the same lastSubmittedTime are skipped, so re-fetching an overlapping
+        window never double counts. An edited response replaces its stored copy, and since its old answers
+        cannot be taken back out of min/max and text samples, the aggregates are then rebuilt from the stored
+        responses. Returns the number of responses that were new.
+        """
+        new, edited = 0, False
+        with self._lock, self._connect() as conn:
+            for response in responses:
+                stored = conn.execute(
+                    "SELECT last_submitted_time FROM form_responses WHERE form_id = ? AND response_id = ?",
+                    (form_id, response['responseId'])
+                ).fetchone()
+                if stored and stored["last_submitted_time"] == response.get('lastSubmittedTime'):
+                    continue
+                conn.execute(
+                    """INSERT INTO form_responses (form_id, response_id, last_submitted_time, response_json) VALUES (?, ?, ?, ?)
+                       ON CONFLICT(form_id, response_id) DO UPDATE SET last_submitted_time = excluded.last_submitted_time,
+                       response_json = excluded.response_json""",
+                    (form_id, response['responseId'], response.get('lastSubmittedTime'), json.dumps(response))
+                )
+                if stored:
+                    edited = True
+                else:
+                    aggregator.add(response, questions)
+                    new += 1
+            if edited:
+                aggregator.state = {}
+                rows = conn.execute(
+                    "SELECT response_json FROM form_responses WHERE form_id = ? ORDER BY COALESCE(last_submitted_time, ''), response_id",
+                    (form_id,)
+                )
+                for row in rows:
+                    aggregator.add(json.loads(row["response_json"]), questions)
+            conn.execute(
+                """INSERT INTO form_ingest_state (form_id, watermark, response_count, questions_json, aggregates_json, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(form_id) DO UPDATE SET watermark = excluded.watermark, response_count = excluded.response_count,
+                   questions_json = excluded.questions_json, aggregates_json = excluded.aggregates_json, updated_at = excluded.updated_at""",
+                (form_id, watermark, response_count + new, json.dumps(questions), json.dumps(aggregator.state), datetime.now(timezone.utc).isoformat())
+            )
+        return new
+
+    def latest_responses(self, form_id: str, limit: int) -> List[Dict[str, Any]]:
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(
+                "SELECT response_json FROM form_responses WHERE form_id = ? ORDER BY last_submitted_time DESC LIMIT ?",
+                (form_id, limit)
+            ).fetchall()
+        return [json.loads(r["response_json"]) for r in rows]
+
+    def iter_responses(self, form_id: str, batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """Yields every stored response, oldest first, reading `batch_size` rows at a time."""
+        after = ("", "")
+        while True:
+            # Keyset pagination, so no connection or lock is held while the caller consumes a batch
+            with self._lock, self._connect() as conn:
+                rows = conn.execute(
+                    """SELECT response_id, last_submitted_time, response_json FROM form_responses
+                       WHERE form_id = ? AND (COALESCE(last_submitted_time, ''), response_id) > (?, ?)
+                       ORDER BY COALESCE(last_submitted_time, ''), response_id LIMIT ?""",
+                    (form_id, after[0], after[1], batch_size)
+                ).fetchall()
+            for row in rows:
+                yield json.loads(row["response_json"])
+            if len(rows) < batch_size:
+                return
+            after = (rows[-1]["last_submitted_time"] or "", rows[-1]["response_id"])
+
+    def reset(self, form_id: str):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM form_responses WHERE form_id = ?", (form_id,))
+            conn.execute("DELETE FROM form_ingest_state WHERE form_id = ?", (form_id,))
@@ -1,23 +1,28 @@
 # backend/app/mcp_servers/gforms_server.py
 
 from typing import Dict, Any, List, Optional
-from googleapiclient.discovery import build
 
-from ..integrations.google_auth import get_authorized_http
+from ..config import settings
+from ..integrations.google_auth import get_authorized_http, build_service
+from .resilience import execute_request
 from ..utils.logger import get_logger
+from .gforms_builder import FormTemplateStore, build_item, chunk_requests, create_item_requests, template_from_form
+from .gforms_responses import FormResponseStore, ResponseAggregator, extract_questions
 
 logger = get_logger(__name__)
 
 class GFormsMCPServer:
     def __init__(self):
         self.service = None
+        self.response_store = FormResponseStore()
+        self.template_store = FormTemplateStore()
         self.DISCOVERY_DOC = "https://forms.googleapis.com/$discovery/rest?version=v1"
 
     def _get_service(self):
         """Initializes and returns the Google Forms API service (v1)."""
         if not self.service:
             http = get_authorized_http()
-            self.service = build(
+            self.service = build_service(
                 'forms', 
                 'v1', 
                 http=http, 
@@ -29,64 +34,114 @@ class GFormsMCPServer:
     # Helper to generate form requests
     def _create_question_request(self, question_text: str, question_type: str, options: Optional[List[str]] = None, index: int = 0) -> Dict[str, Any]:
         """Generates a batchUpdate request for creating a question."""
-        item = {"title": question_text, "questionItem": {"question": {"required": True}}}
-        
-        if question_type == 'multiple_choice' and options:
-            item['questionItem']['question']['choiceQuestion'] = {
-                'type': 'RADIO',
-                'options': [{'value': opt} for opt in options]
-            }
-        elif question_type == 'short_answer':
-            item['questionItem']['question']['textQuestion'] = {}
-        # Add more types as needed (checkbox, paragraph, etc.)
-
-        return {
-            "createItem": {
-                "item": item,
-                "location": {"index": index}
-            }
-        }
+        item = build_item({"question": question_text, "type": question_type, "options": options})
+        return create_item_requests([item], start_index=index)[0]
+
+    def _populate_form(self, service, form_id: str, items: List[Dict[str, Any]], description: Optional[str] = None) -> int:
+        """Adds the description and all items to a new form in as few batchUpdate calls as possible."""
+        requests = []
+        if description:
+            requests.append({"updateFormInfo": {"info": {"description": description}, "updateMask": "description"}})
+        requests.extend(create_item_requests(items))
+
+        batches = chunk_requests(requests)
+        for batch in batches:
+            execute_request(service.forms().batchUpdate(
+                formId=form_id,
+                body={'requests': batch}
+            ))
+        return len(batches)
 
     # Tool: gforms_create_form
-    def gforms_create_form(self, title: str, questions: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
-        """Creates a new Google Form with a title and optional questions."""
+    def gforms_create_form(self, title: str, questions: Optional[List[Dict[str, Any]]] = None, description: Optional[str] = None) -> Dict[str, Any]:
+        """Creates a new Google Form with a title and optional questions.
+
+        Each question: {"question", "type", "options", "required", "description"}; type is one of
+        short_answer, paragraph, multiple_choice, checkbox, dropdown, scale (low/high/low_label/high_label),
+        grid or checkbox_grid (rows/columns), date, time, section or text.
+        """
         try:
+            # Build every item up front so an invalid question fails before anything is created
+            items = [build_item(q) for q in questions or []]
             service = self._get_service()
-            
+
             # 1. Create the new form
-            new_form = service.forms().create(body={'info': {'title': title}}).execute()
+            new_form = execute_request(service.forms().create(body={'info': {'title': title}}))
             form_id = new_form.get('formId')
-            
-            # 2. Add questions if provided
-            if questions:
-                requests = []
-                for i, q in enumerate(questions):
-                    q_type = q.get('type', 'short_answer')
-                    q_options = q.get('options')
-                    requests.append(self._create_question_request(q['question'], q_type, q_options, i))
-                
-                if requests:
-                    service.forms().batchUpdate(
-                        formId=form_id, 
-                        body={'requests': requests}
-                    ).execute()
+
+            # 2. Add description and questions in chunked batchUpdates
+            batch_calls = self._populate_form(service, form_id, items, description)
 
             return {
                 "status": "success",
-                "message": f"Google Form '{title}' created with {len(questions) if questions else 0} questions.",
-                "details": {"id": form_id, "submitUrl": new_form.get('responderUri')}
+                "message": f"Google Form '{title}' created with {len(items)} items.",
+                "details": {"id": form_id, "submitUrl": new_form.get('responderUri'), "apiCalls": 1 + batch_calls}
             }
-        
+
         except Exception as e:
             logger.error(f"Failed to create Google Form: {e}")
             return {"status": "error", "message": f"Failed to create Google Form. Details: {str(e)}"}
 
+    # Tool: gforms_save_template
+    def gforms_save_template(self, form_id: str, template_name: str) -> Dict[str, Any]:
+        """Saves the structure of an existing Google Form as a named template for cloning."""
+        try:
+            service = self._get_service()
+            form = execute_request(service.forms().get(formId=form_id))
+            template = template_from_form(form)
+            self.template_store.save(template_name, template, source_form_id=form_id)
+
+            return {
+                "status": "success",
+                "message": f"Template '{template_name}' saved with {len(template['items'])} items.",
+                "details": {"skippedItems": template["skipped_items"]}
+            }
+
+        except Exception as e:
+            logger.error(f"Failed to save form template: {e}")
+            return {"status": "error", "message": f"Failed to save form template. Details: {str(e)}"}
+
+    # Tool: gforms_clone_form
+    def gforms_clone_form(self, title: str, template_name: Optional[str] = None, source_form_id: Optional[str] = None) -> Dict[str, Any]:
+        """Creates a new Google Form from a saved template, or from the current state of an existing form.
+
+        With both arguments, the source form is saved as the named template the first time and reused after that.
+        """
+        try:
+            if not template_name and not source_form_id:
+                raise ValueError("Either template_name or source_form_id is required.")
+            service = self._get_service()
+
+            name = template_name or f"form:{source_form_id}"
+            # Without a template name the source is read on every clone, so later edits to it show up
+            template = self.template_store.get(template_name) if template_name else None
+            if template is None:
+                if not source_form_id:
+                    raise ValueError(f"No saved template named '{template_name}'.")
+                template = template_from_form(execute_request(service.forms().get(formId=source_form_id)))
+                if template_name:
+                    self.template_store.save(template_name, template, source_form_id=source_form_id)
+
+            new_form = execute_request(service.forms().create(body={'info': {'title': title}}))
+            form_id = new_form.get('formId')
+            batch_calls = self._populate_form(service, form_id, template["items"], template.get("description"))
+
+            return {
+                "status": "success",
+                "message": f"Google Form '{title}' created from template '{name}' with {len(template['items'])} items.",
+                "details": {"id": form_id, "submitUrl": new_form.get('responderUri'), "apiCalls": 1 + batch_calls}
+            }
+
+        except Exception as e:
+            logger.error(f"Failed to clone Google Form: {e}")
+            return {"status": "error", "message": f"Failed to clone Google Form. Details: {str(e)}"}
+
     # Tool: gforms_read_form
     def gforms_read_form(self, form_id: str) -> Dict[str, Any]:
         """Retrieves metadata and questions from a Google Form."""
         try:
             service = self._get_service()
-            form = service.forms().get(formId=form_id).execute()
+            form = execute_request(service.forms().get(formId=form_id))
             
             return {
                 "status": "success",
@@ -99,17 +154,66 @@ class GFormsMCPServer:
             return {"status": "error", "message": f"Failed to read Google Form. Details: {str(e)}"}
 
     # Tool: gforms_get_responses
-    def gforms_get_responses(self, form_id: str) -> Dict[str, Any]:
-        """Fetches all responses submitted to a Google Form."""
+    def gforms_get_responses(self, form_id: str, include_raw: bool = False, raw_limit: int = 20, full_refresh: bool = False) -> Dict[str, Any]:
+        """Ingests new responses of a Google Form and returns per-question aggregates.
+
+        Only responses submitted since the last ingestion are fetched (all pages). Raw responses
+        are returned only when include_raw is set, newest first and capped at raw_limit.
+        """
         try:
             service = self._get_service()
-            responses = service.forms().responses().list(formId=form_id).execute()
-            
-            return {
+            if full_refresh:
+                self.response_store.reset(form_id)
+
+            state = self.response_store.load_state(form_id)
+            questions = state["questions"]
+            aggregator = ResponseAggregator(state["aggregates"])
+            watermark = state["watermark"]
+            response_count = state["response_count"]
+
+            # '>=' rather than '>' so responses sharing the watermark second are not lost; duplicates are skipped on insert
+            request_kwargs = {"formId": form_id, "pageSize": settings.FORMS_RESPONSES_PAGE_SIZE}
+            if watermark:
+                request_kwargs["filter"] = f"timestamp >= {watermark}"
+
+            new_watermark, new_total, page_token = watermark, 0, None
+            while True:
+                page = execute_request(service.forms().responses().list(pageToken=page_token, **request_kwargs))
+                responses = page.get('responses', [])
+                page_token = page.get('nextPageToken')
+
+                if any(qid not in questions for r in responses for qid in r.get('answers', {})):
+                    # Unknown question ids mean the form changed since the last ingestion
+                    questions = extract_questions(execute_request(service.forms().get(formId=form_id)))
+
+                for response in responses:
+                    submitted = response.get('lastSubmittedTime')
+                    if submitted and (new_watermark is None or submitted > new_watermark):
+                        new_watermark = submitted
+
+                # The watermark only moves once every page is stored, so an interrupted run resumes safely
+                new = self.response_store.save_page(
+                    form_id, responses, questions, aggregator, response_count,
+                    watermark if page_token else new_watermark
+                )
+                response_count += new
+                new_total += new
+                if not page_token:
+                    break
+
+            result = {
                 "status": "success",
-                "message": f"Fetched {len(responses.get('responses', []))} responses.",
-                "responses": responses.get('responses', [])
+                "message": f"Ingested {new_total} new responses ({response_count} total).",
+                "summary": {
+                    "total_responses": response_count,
+                    "new_responses": new_total,
+                    "last_submitted_time": new_watermark,
+                    "questions": aggregator.summary()
+                }
             }
+            if include_raw:
+                result["responses"] = self.response_store.latest_responses(form_id, raw_limit)
+            return result
         
         except Exception as e:
             logger.error(f"Failed to get form responses: {e}")
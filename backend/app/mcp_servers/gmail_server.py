@@ -1,9 +1,9 @@
 from typing import Dict, Any, Optional
-from googleapiclient.discovery import build
 from email.mime.text import MIMEText # Corrected import: 'mine' -> 'mime'
 import base64
 
-from ..integrations.google_auth import get_authorized_http
+from ..integrations.google_auth import get_authorized_http, build_service
+from .resilience import execute_request
 from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -15,7 +15,7 @@ class GmailMCPServer:
     def _get_service(self):
         if not self.service:
             http = get_authorized_http()
-            self.service = build('gmail', 'v1', http=http)
+            self.service = build_service('gmail', 'v1', http=http)
         return self.service
     
     # Tool: gmail_send_email
@@ -31,9 +31,9 @@ class GmailMCPServer:
             raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
 
             #send message
-            sent_message = service.users().messages().send(
+            sent_message = execute_request(service.users().messages().send(
                 userId='me',
-                body={'raw': raw_message}).execute()
+                body={'raw': raw_message}))
             
             logger.info(f"Email sent to {recipient} with id {sent_message['id']}")
 
@@ -51,11 +51,11 @@ class GmailMCPServer:
         try:
             service = self._get_service()
             
-            response = service.users().messages().list(
+            response = execute_request(service.users().messages().list(
                 userId='me', 
                 maxResults=max_results, 
                 q=query
-            ).execute()
+            ))
             
             messages = response.get('messages', [])
             email_summaries = []
@@ -63,7 +63,7 @@ class GmailMCPServer:
             if messages:
                 for msg in messages:
                     # Fetching full message for subject/snippet (can be slow for many messages)
-                    full_msg = service.users().messages().get(userId='me', id=msg['id'], format='metadata', metadataHeaders=['Subject', 'From']).execute()
+                    full_msg = execute_request(service.users().messages().get(userId='me', id=msg['id'], format='metadata', metadataHeaders=['Subject', 'From']))
                     
                     snippet = full_msg.get('snippet', 'No snippet available.')
                     headers = {h['name']: h['value'] for h in full_msg.get('payload', {}).get('headers', [])}
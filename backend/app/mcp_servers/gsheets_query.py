@@ -0,0 +1,279 @@
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from ..config import settings
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+TABLE_NAME = "sheet"
+
+# Filter operators mapped to their SQL form. The value placeholder is filled by sqlite parameters.
+FILTER_OPERATORS = {
+    "=": "{col} = ?",
+    "!=": "{col} != ?",
+    ">": "{col} > ?",
+    ">=": "{col} >= ?",
+    "<": "{col} < ?",
+    "<=": "{col} <= ?",
+    "contains": "{col} LIKE '%' || ? || '%'",
+    "startswith": "{col} LIKE ? || '%'",
+    "in": "{col} IN ({placeholders})",
+    "is_empty": "{col} IS NULL",
+    "not_empty": "{col} IS NOT NULL",
+}
+
+AGGREGATE_FUNCTIONS = {
+    "sum": "SUM({col})",
+    "avg": "AVG({col})",
+    "min": "MIN({col})",
+    "max": "MAX({col})",
+    "count": "COUNT({col})",
+    "count_distinct": "COUNT(DISTINCT {col})",
+}
+
+_NUMBER_RE = re.compile(r"^[-+]?[$€£]?[-+]?\d[\d,]*(\.\d+)?$|^[-+]?[$€£]?\.\d+$")
+
+
+def _parse_number(value: str) -> Optional[float]:
+    """Parses spreadsheet-formatted numbers such as '1,234.50' or '$12'."""
+    text = value.strip()
+    if not text or not _NUMBER_RE.match(text):
+        return None
+    return float(text.replace(",", "").replace("$", "").replace("€", "").replace("£", ""))
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+class CachedSheetTable:
+    """Raw values of one sheet range plus a lazily built in-memory SQLite table."""
+
+    def __init__(self, values: List[List[Any]]):
+        self.values = values
+        self.loaded_at = time.monotonic()
+        self.columns: List[str] = []
+        self.numeric_columns: set = set()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _build_table(self) -> sqlite3.Connection:
+        header = self.values[0] if self.values else []
+        rows = self.values[1:]
+        width = max([len(header)] + [len(r) for r in rows]) if self.values else 0
+
+        # Normalise header names: blank or duplicate headers get a positional name.
+        columns, seen = [], set()
+        for i in range(width):
+            name = str(header[i]).strip() if i < len(header) else ""
+            if not name or name.lower() in seen:
+                name = f"column_{i + 1}"
+            seen.add(name.lower())
+            columns.append(name)
+
+        # Infer column types once so filters and aggregates compare numbers, not strings.
+        padded = [[str(r[i]) if i < len(r) and r[i] is not None else "" for i in range(width)] for r in rows]
+        numeric = set()
+        for i, name in enumerate(columns):
+            cells = [row[i] for row in padded if row[i].strip()]
+            if cells and all(_parse_number(c) is not None for c in cells):
+                numeric.add(name)
+
+        conn = sqlite3.connect(":memory:", check_same_thread=False)
+        column_defs = ", ".join(f"{_quote(c)} {'REAL' if c in numeric else 'TEXT'}" for c in columns)
+        conn.execute(f"CREATE TABLE {TABLE_NAME} ({column_defs})")
+        if padded and columns:
+            converted = [
+                tuple(
+                    (_parse_number(cell) if name in numeric else cell) if cell.strip() else None
+                    for cell, name in zip(row, columns)
+                )
+                for row in padded
+            ]
+            conn.executemany(
+                f"INSERT INTO {TABLE_NAME} VALUES ({', '.join('?' for _ in columns)})", converted
+            )
+
+        self.columns = columns
+        self.numeric_columns = numeric
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = self._build_table()
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class SheetTableCache:
+    """LRU cache of sheet ranges keyed by (spreadsheet_id, range) with a TTL.
+
+    When disabled, `put` still builds the table for the caller but does not keep it.
+    """
+
+    def __init__(self, ttl_seconds: int = settings.SHEET_QUERY_CACHE_TTL_SECONDS, max_tables: int = settings.SHEET_QUERY_MAX_CACHED_TABLES, enabled: bool = True):
+        self.ttl_seconds = ttl_seconds
+        self.max_tables = max_tables
+        self.enabled = enabled
+        self._tables: "OrderedDict[Tuple[str, str], CachedSheetTable]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, spreadsheet_id: str, range: str) -> Optional[CachedSheetTable]:
+        if not self.enabled:
+            return None
+        key = (spreadsheet_id, range)
+        with self._lock:
+            table = self._tables.get(key)
+            if table is None:
+                return None
+            if time.monotonic() - table.loaded_at > self.ttl_seconds:
+                self._tables.pop(key).close()
+                return None
+            self._tables.move_to_end(key)
+            return table
+
+    def put(self, spreadsheet_id: str, range: str, values: List[List[Any]]) -> CachedSheetTable:
+        key = (spreadsheet_id, range)
+        table = CachedSheetTable(values)
+        if not self.enabled:
+            return table
+        with self._lock:
+            old = self._tables.pop(key, None)
+            if old is not None:
+                old.close()
+            self._tables[key] = table
+            while len(self._tables) > self.max_tables:
+                _, evicted = self._tables.popitem(last=False)
+                evicted.close()
+        return table
+
+    def invalidate(self, spreadsheet_id: str):
+        """Drops every cached range of a spreadsheet, e.g. after a write."""
+        with self._lock:
+            for key in [k for k in self._tables if k[0] == spreadsheet_id]:
+                self._tables.pop(key).close()
+
+
+class SheetQueryEngine:
+    """Runs filter, group-by, aggregate and sort operations over a cached sheet table."""
+
+    def __init__(self, max_result_rows: int = settings.SHEET_QUERY_MAX_RESULT_ROWS):
+        self.max_result_rows = max_result_rows
+
+    @staticmethod
+    def _resolve_column(table: CachedSheetTable, name: str) -> str:
+        for column in table.columns:
+            if column.lower() == str(name).strip().lower():
+                return column
+        raise ValueError(f"Unknown column '{name}'. Available columns: {', '.join(table.columns)}")
+
+    def _coerce(self, table: CachedSheetTable, column: str, value: Any) -> Any:
+        if column in table.numeric_columns and isinstance(value, str):
+            number = _parse_number(value)
+            return value if number is None else number
+        return value
+
+    def _build_where(self, table: CachedSheetTable, filters: List[Dict[str, Any]]) -> Tuple[str, List[Any]]:
+        clauses, params = [], []
+        for f in filters:
+            op = str(f.get("op", "=")).lower()
+            if op not in FILTER_OPERATORS:
+                raise ValueError(f"Unsupported filter operator '{op}'. Supported: {', '.join(FILTER_OPERATORS)}")
+            column = self._resolve_column(table, f.get("column", ""))
+            col_sql = _quote(column)
+            if op == "in":
+                values = f.get("value") or []
+                if not isinstance(values, list) or not values:
+                    raise ValueError("The 'in' operator requires a non-empty list value.")
+                clauses.append(FILTER_OPERATORS[op].format(col=col_sql, placeholders=", ".join("?" for _ in values)))
+                params.extend(self._coerce(table, column, v) for v in values)
+            elif op in ("is_empty", "not_empty"):
+                clauses.append(FILTER_OPERATORS[op].format(col=col_sql))
+            elif op in ("contains", "startswith"):
+                # Text matching is case-insensitive and works on the displayed value of numeric columns too.
+                clauses.append(FILTER_OPERATORS[op].format(col=f"CAST({col_sql} AS TEXT)"))
+                params.append(str(f.get("value", "")))
+            else:
+                clauses.append(FILTER_OPERATORS[op].format(col=col_sql))
+                params.append(self._coerce(table, column, f.get("value")))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def run(
+        self,
+        table: CachedSheetTable,
+        select: Optional[List[str]] = None,
+        filters: Optional[List[Dict[str, Any]]] = None,
+        group_by: Optional[List[str]] = None,
+        aggregates: Optional[List[Dict[str, Any]]] = None,
+        order_by: Optional[List[Dict[str, Any]]] = None,
+        limit: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Compiles the query spec to SQL and runs it against the cached table."""
+        with table._lock:
+            conn = table.connection()
+
+            group_columns = [self._resolve_column(table, c) for c in (group_by or [])]
+            output, output_names = [], []
+            if aggregates:
+                for column in group_columns:
+                    output.append(_quote(column))
+                    output_names.append(column)
+                for agg in aggregates:
+                    func = str(agg.get("func", "")).lower()
+                    if func not in AGGREGATE_FUNCTIONS:
+                        raise ValueError(f"Unsupported aggregate '{func}'. Supported: {', '.join(AGGREGATE_FUNCTIONS)}")
+                    raw_column = agg.get("column", "*")
+                    if raw_column == "*":
+                        if func != "count":
+                            raise ValueError("Only 'count' can be applied to '*'.")
+                        col_sql, label = "*", "rows"
+                    else:
+                        label = self._resolve_column(table, raw_column)
+                        col_sql = _quote(label)
+                    alias = agg.get("alias") or f"{func}_{label}"
+                    output.append(f"{AGGREGATE_FUNCTIONS[func].format(col=col_sql)} AS {_quote(alias)}")
+                    output_names.append(alias)
+            else:
+                selected = [self._resolve_column(table, c) for c in select] if select else (group_columns or table.columns)
+                output = [_quote(c) for c in selected]
+                output_names = list(selected)
+
+            where_sql, params = self._build_where(table, filters or [])
+            sql = f"SELECT {'DISTINCT ' if group_columns and not aggregates else ''}{', '.join(output)} FROM {TABLE_NAME}{where_sql}"
+            if group_columns and aggregates:
+                sql += " GROUP BY " + ", ".join(_quote(c) for c in group_columns)
+
+            if order_by:
+                terms = []
+                for o in order_by:
+                    name = o.get("column", "")
+                    # Ordering may reference an aggregate alias as well as a source column.
+                    target = next((n for n in output_names if n.lower() == str(name).lower()), None) or self._resolve_column(table, name)
+                    direction = "DESC" if str(o.get("direction", "asc")).lower() == "desc" else "ASC"
+                    terms.append(f"{_quote(target)} {direction}")
+                sql += " ORDER BY " + ", ".join(terms)
+
+            row_limit = min(int(limit), self.max_result_rows) if limit else self.max_result_rows
+            # Fetch one extra row so callers know whether the result was cut off.
+            sql += " LIMIT ?"
+            params.append(row_limit + 1)
+
+            rows = conn.execute(sql, params).fetchall()
+            total_rows = conn.execute(f"SELECT COUNT(*) FROM {TABLE_NAME}").fetchone()[0]
+
+        truncated = len(rows) > row_limit
+        return {
+            "columns": output_names,
+            "rows": [list(r) for r in rows[:row_limit]],
+            "truncated": truncated,
+            "source_rows": total_rows,
+        }
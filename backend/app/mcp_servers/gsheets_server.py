@@ -1,22 +1,44 @@
 
 
-from typing import Dict, Any, List
-from googleapiclient.discovery import build
+from typing import Dict, Any, List, Optional
 
-from ..integrations.google_auth import get_authorized_http
+from ..integrations.google_auth import get_authorized_http, build_service
+from .resilience import execute_request
+from .quota import google_processes
+from .checkpoint import progress
 from ..utils.logger import get_logger
+from .gsheets_query import SheetTableCache, SheetQueryEngine
+from .gsheets_writer import (
+    WRITE_MODES,
+    chunked_value_ranges,
+    count_cells,
+    diff_value_ranges,
+    group_value_ranges,
+    payload_size,
+    split_rows,
+    write_report
+)
 
 logger = get_logger(__name__)
 
+
+def _table_cache_enabled() -> bool:
+    """Cached tables live in one process and a write only invalidates that process's copy, so the
+    cache stays off once sheet tools run in more than one process."""
+    return google_processes("sheets") <= 1
+
+
 class GSheetsMCPServer:
     def __init__(self):
         self.service = None
+        self.table_cache = SheetTableCache(enabled=_table_cache_enabled())
+        self.query_engine = SheetQueryEngine()
 
     def _get_service(self):
         """Initializes and returns the Google Sheets API service (v4)."""
         if not self.service:
             http = get_authorized_http()
-            self.service = build('sheets', 'v4', http=http)
+            self.service = build_service('sheets', 'v4', http=http)
         return self.service
 
     # Tool: gsheet_create_sheet
@@ -26,10 +48,10 @@ class GSheetsMCPServer:
             service = self._get_service()
             
             spreadsheet_body = {'properties': {'title': title}}
-            spreadsheet = service.spreadsheets().create(
+            spreadsheet = execute_request(service.spreadsheets().create(
                 body=spreadsheet_body, 
                 fields='spreadsheetId,spreadsheetUrl'
-            ).execute()
+            ))
             
             return {
                 "status": "success",
@@ -47,12 +69,14 @@ class GSheetsMCPServer:
         try:
             service = self._get_service()
             
-            result = service.spreadsheets().values().get(
+            result = execute_request(service.spreadsheets().values().get(
                 spreadsheetId=spreadsheet_id, 
                 range=range
-            ).execute()
+            ))
             
             values = result.get('values', [])
+            # Keep the snapshot so follow-up gsheet_query calls on this range stay local
+            self.table_cache.put(spreadsheet_id, range, values)
             
             return {
                 "status": "success",
@@ -65,25 +89,182 @@ class GSheetsMCPServer:
             return {"status": "error", "message": f"Failed to read sheet data. Details: {str(e)}"}
 
     # Tool: gsheet_update_sheet
-    def gsheet_update_sheet(self, spreadsheet_id: str, range: str, values: List[List[str]]) -> Dict[str, Any]:
-        """Writes or updates data in a specified range."""
+    def gsheet_update_sheet(self, spreadsheet_id: str, range: str, values: List[List[str]], mode: str = "overwrite") -> Dict[str, Any]:
+        """Writes or updates data in a specified range.
+
+        mode: 'overwrite' (single update), 'chunked' (size-bounded batchUpdates for large payloads),
+        'append' (append rows after the table in range) or 'diff' (send only cells that changed).
+        """
         try:
+            if mode not in WRITE_MODES:
+                raise ValueError(f"Unsupported write mode '{mode}'. Supported: {', '.join(WRITE_MODES)}")
             service = self._get_service()
-            
+
+            if mode == "chunked":
+                return self._write_chunked(service, spreadsheet_id, range, values)
+            if mode == "append":
+                return self._write_append(service, spreadsheet_id, range, values)
+            if mode == "diff":
+                return self._write_diff(service, spreadsheet_id, range, values)
+
             body = {'values': values}
-            result = service.spreadsheets().values().update(
-                spreadsheetId=spreadsheet_id, 
+            result = execute_request(service.spreadsheets().values().update(
+                spreadsheetId=spreadsheet_id,
                 range=range,
                 valueInputOption='USER_ENTERED',
                 body=body
-            ).execute()
-            
+            ), idempotent=True)
+            self.table_cache.invalidate(spreadsheet_id)
+
             return {
                 "status": "success",
                 "message": f"Updated {result.get('updatedCells')} cells in the sheet.",
-                "details": {"updatedRange": result.get('updatedRange')}
+                "details": {
+                    "updatedRange": result.get('updatedRange'),
+                    **write_report(mode, count_cells(values), payload_size(body), 1, result.get('updatedCells'))
+                }
             }
-        
+
         except Exception as e:
             logger.error(f"Failed to update sheet data: {e}")
-            return {"status": "error", "message": f"Failed to update sheet data. Details: {str(e)}"}
\ No newline at end of file
+            return {"status": "error", "message": f"Failed to update sheet data. Details: {str(e)}"}
+
+    def _batch_update(self, service, spreadsheet_id: str, value_ranges: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Sends ValueRanges as size-bounded values.batchUpdate calls."""
+        batches = group_value_ranges(value_ranges)
+        # Inside a background job, batches sent before a restart are skipped on resume
+        done = progress(f"sheets.batch_update:{spreadsheet_id}")
+        sent = {"cells": 0, "bytes": 0, "requests": 0, "updated": 0, **done.data}
+        for index, batch in enumerate(batches):
+            if index < done.completed:
+                continue
+            body = {'valueInputOption': 'USER_ENTERED', 'data': batch}
+            result = execute_request(service.spreadsheets().values().batchUpdate(
+                spreadsheetId=spreadsheet_id,
+                body=body
+            ), idempotent=True)  # rewrites fixed ranges, so replaying it is harmless
+            sent["cells"] += sum(count_cells(vr["values"]) for vr in batch)
+            sent["bytes"] += payload_size(body)
+            sent["requests"] += 1
+            sent["updated"] += result.get('totalUpdatedCells', 0)
+            done.advance(total=len(batches), **sent)
+        return sent
+
+    def _write_chunked(self, service, spreadsheet_id: str, range: str, values: List[List[str]]) -> Dict[str, Any]:
+        sent = self._batch_update(service, spreadsheet_id, chunked_value_ranges(range, values))
+        self.table_cache.invalidate(spreadsheet_id)
+        return {
+            "status": "success",
+            "message": f"Updated {sent['updated']} cells in {sent['requests']} request(s).",
+            "details": write_report("chunked", sent["cells"], sent["bytes"], sent["requests"], sent["updated"])
+        }
+
+    def _write_append(self, service, spreadsheet_id: str, range: str, values: List[List[str]]) -> Dict[str, Any]:
+        chunks = [rows for _, rows in split_rows(values)]
+        # Appends are not idempotent, so a resumed job must not resend chunks that already landed
+        done = progress(f"sheets.append:{spreadsheet_id}:{range}")
+        cells, size, requests, updated = (done.data.get(k, 0) for k in ("cells", "size", "requests", "updated"))
+        for index, rows in enumerate(chunks):
+            if index < done.completed:
+                continue
+            body = {'values': rows}
+            result = execute_request(service.spreadsheets().values().append(
+                spreadsheetId=spreadsheet_id,
+                range=range,
+                valueInputOption='USER_ENTERED',
+                insertDataOption='INSERT_ROWS',
+                body=body
+            ))
+            cells += count_cells(rows)
+            size += payload_size(body)
+            requests += 1
+            updated += result.get('updates', {}).get('updatedCells', 0)
+            done.advance(total=len(chunks), cells=cells, size=size, requests=requests, updated=updated)
+        self.table_cache.invalidate(spreadsheet_id)
+        return {
+            "status": "success",
+            "message": f"Appended {len(values)} rows ({updated} cells) in {requests} request(s).",
+            "details": write_report("append", cells, size, requests, updated)
+        }
+
+    def _write_diff(self, service, spreadsheet_id: str, range: str, values: List[List[str]]) -> Dict[str, Any]:
+        # The diff is saved with a job before any batch is sent: once some batches have landed, diffing again
+        # would yield a shorter, shifted batch list and the resumed job would skip ranges it never wrote
+        planned = progress(f"sheets.diff:{spreadsheet_id}:{range}")
+        if planned.completed:
+            value_ranges = planned.data["value_ranges"]
+        else:
+            # Always a fresh read: a cached snapshot misses edits made in the Sheets UI since it was loaded, and
+            # formulas must come back as formulas, or a literal equal to a formula's displayed value is skipped
+            snapshot = execute_request(service.spreadsheets().values().get(
+                spreadsheetId=spreadsheet_id,
+                range=range,
+                valueRenderOption='FORMULA'
+            )).get('values', [])
+            value_ranges = diff_value_ranges(range, snapshot, values)
+            planned.advance(total=1, value_ranges=value_ranges)
+        sent = self._batch_update(service, spreadsheet_id, value_ranges)
+
+        self.table_cache.invalidate(spreadsheet_id)
+        return {
+            "status": "success",
+            "message": f"Updated {sent['cells']} changed cells of {count_cells(values)} in {len(value_ranges)} range(s).",
+            "details": write_report("diff", sent["cells"], sent["bytes"], sent["requests"], sent["updated"])
+        }
+
+    # Tool: gsheet_query
+    def gsheet_query(
+        self,
+        spreadsheet_id: str,
+        range: str,
+        select: Optional[List[str]] = None,
+        filters: Optional[List[Dict[str, Any]]] = None,
+        group_by: Optional[List[str]] = None,
+        aggregates: Optional[List[Dict[str, Any]]] = None,
+        order_by: Optional[List[Dict[str, Any]]] = None,
+        limit: Optional[int] = None,
+        refresh: bool = False
+    ) -> Dict[str, Any]:
+        """Filters, groups and aggregates a sheet range locally and returns only the result rows.
+
+        The first row of the range is the header. filters: [{"column", "op", "value"}],
+        aggregates: [{"column", "func", "alias"}], order_by: [{"column", "direction"}].
+        """
+        try:
+            table = None if refresh else self.table_cache.get(spreadsheet_id, range)
+            cached = table is not None
+            if table is None:
+                service = self._get_service()
+                result = execute_request(service.spreadsheets().values().get(
+                    spreadsheetId=spreadsheet_id,
+                    range=range
+                ))
+                table = self.table_cache.put(spreadsheet_id, range, result.get('values', []))
+
+            query_result = self.query_engine.run(
+                table,
+                select=select,
+                filters=filters,
+                group_by=group_by,
+                aggregates=aggregates,
+                order_by=order_by,
+                limit=limit
+            )
+
+            return {
+                "status": "success",
+                "message": f"Query returned {len(query_result['rows'])} rows from {query_result['source_rows']} rows in range {range}.",
+                "columns": query_result["columns"],
+                "rows": query_result["rows"],
+                "details": {
+                    "truncated": query_result["truncated"],
+                    "source_rows": query_result["source_rows"],
+                    "cached": cached
+                }
+            }
+
+        except ValueError as e:
+            return {"status": "error", "message": f"Invalid query. Details: {str(e)}"}
+        except Exception as e:
+            logger.error(f"Failed to query sheet data: {e}")
+            return {"status": "error", "message": f"Failed to query sheet data. Details: {str(e)}"}
\ No newline at end of file
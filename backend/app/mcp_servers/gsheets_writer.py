@@ -0,0 +1,160 @@
+import json
+import re
+from typing import Dict, Any, List, Optional, Tuple
+
+from ..config import settings
+
+WRITE_MODES = ("overwrite", "chunked", "append", "diff")
+
+# Unchanged cells between two changed ones that are still sent to avoid splitting a row into many ranges
+DIFF_MERGE_GAP = 2
+
+_CELL_RE = re.compile(r"^([A-Za-z]{0,3})(\d*)$")
+
+
+def column_to_index(letters: str) -> int:
+    index = 0
+    for ch in letters.upper():
+        index = index * 26 + (ord(ch) - ord("A") + 1)
+    return index - 1
+
+
+def index_to_column(index: int) -> str:
+    letters = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(ord("A") + rem) + letters
+    return letters
+
+
+def parse_range_start(a1_range: str) -> Tuple[str, int, int]:
+    """Splits an A1 range into its sheet prefix and zero-based start column/row.
+
+    'Sheet1!B2:D10' -> ('Sheet1!', 1, 1); 'A:C' -> ('', 0, 0); 'Sheet1' -> ('Sheet1!', 0, 0); 'Jan' -> ('Jan!', 0, 0).
+    """
+    prefix, _, cells = a1_range.rpartition("!")
+    prefix = f"{prefix}!" if prefix else ""
+    start = cells.split(":", 1)[0]
+    match = _CELL_RE.match(start)
+    # Without a '!' or a ':' only a full cell like 'B2' is a reference; 'Jan' or 'Q' is the name of a sheet
+    is_cell = match and start and (prefix or ":" in cells or all(match.groups()))
+    if not is_cell:
+        # A bare sheet name such as 'Sheet1' refers to the whole sheet
+        return (f"{a1_range}!" if not prefix else prefix), 0, 0
+    letters, digits = match.groups()
+    return prefix, column_to_index(letters) if letters else 0, int(digits) - 1 if digits else 0
+
+
+def block_range(prefix: str, col: int, row: int, width: int, height: int) -> str:
+    start = f"{index_to_column(col)}{row + 1}"
+    end = f"{index_to_column(col + max(width, 1) - 1)}{row + max(height, 1)}"
+    return f"{prefix}{start}:{end}"
+
+
+def payload_size(body: Dict[str, Any]) -> int:
+    """Bytes of the JSON request body, which is what the request-size limit applies to."""
+    return len(json.dumps(body, separators=(",", ":")).encode("utf-8"))
+
+
+def count_cells(values: List[List[Any]]) -> int:
+    return sum(len(row) for row in values)
+
+
+def split_rows(values: List[List[Any]], max_rows: int = settings.SHEET_WRITE_MAX_CHUNK_ROWS, max_bytes: int = settings.SHEET_WRITE_MAX_REQUEST_BYTES) -> List[Tuple[int, List[List[Any]]]]:
+    """Splits rows into (row_offset, rows) blocks bounded by row count and serialized size."""
+    blocks, current, current_bytes, offset = [], [], 0, 0
+    for i, row in enumerate(values):
+        row_bytes = len(json.dumps(row, separators=(",", ":")).encode("utf-8")) + 1
+        if current and (len(current) >= max_rows or current_bytes + row_bytes > max_bytes):
+            blocks.append((offset, current))
+            current, current_bytes, offset = [], 0, i
+        current.append(row)
+        current_bytes += row_bytes
+    if current:
+        blocks.append((offset, current))
+    return blocks
+
+
+def group_value_ranges(value_ranges: List[Dict[str, Any]], max_bytes: int = settings.SHEET_WRITE_MAX_REQUEST_BYTES) -> List[List[Dict[str, Any]]]:
+    """Packs ValueRanges into batchUpdate requests that each stay under the request-size limit."""
+    batches, current, current_bytes = [], [], 0
+    for vr in value_ranges:
+        size = payload_size(vr)
+        if current and current_bytes + size > max_bytes:
+            batches.append(current)
+            current, current_bytes = [], 0
+        current.append(vr)
+        current_bytes += size
+    if current:
+        batches.append(current)
+    return batches
+
+
+def chunked_value_ranges(a1_range: str, values: List[List[Any]]) -> List[Dict[str, Any]]:
+    prefix, col, row = parse_range_start(a1_range)
+    return [
+        {"range": block_range(prefix, col, row + offset, max(len(r) for r in rows), len(rows)), "values": rows}
+        for offset, rows in split_rows(values)
+    ]
+
+
+def _cell(values: List[List[Any]], r: int, c: int) -> str:
+    if r < len(values) and c < len(values[r]) and values[r][c] is not None:
+        return str(values[r][c])
+    return ""
+
+
+def _raw_cell(values: List[List[Any]], r: int, c: int) -> Any:
+    if c < len(values[r]) and values[r][c] is not None:
+        return values[r][c]
+    return ""
+
+
+def diff_value_ranges(a1_range: str, snapshot: List[List[Any]], values: List[List[Any]]) -> List[Dict[str, Any]]:
+    """Builds ValueRanges covering only the cells of `values` that differ from `snapshot`.
+
+    Changed cells in a row are grouped into runs, and runs with the same columns in
+    consecutive rows are merged into one rectangular block.
+    """
+    prefix, start_col, start_row = parse_range_start(a1_range)
+
+    runs: List[Tuple[int, int, int]] = []
+    for r, row in enumerate(values):
+        changed = [c for c in range(len(row)) if _cell(values, r, c) != _cell(snapshot, r, c)]
+        if not changed:
+            continue
+        run_start = prev = changed[0]
+        for c in changed[1:]:
+            if c - prev - 1 > DIFF_MERGE_GAP:
+                runs.append((r, run_start, prev))
+                run_start = c
+            prev = c
+        runs.append((r, run_start, prev))
+
+    blocks: List[List[int]] = []  # [first_row, last_row, first_col, last_col]
+    for r, c0, c1 in runs:
+        last = blocks[-1] if blocks else None
+        if last and last[1] == r - 1 and last[2] == c0 and last[3] == c1:
+            last[1] = r
+        else:
+            blocks.append([r, r, c0, c1])
+
+    value_ranges = []
+    for r0, r1, c0, c1 in blocks:
+        rows = [[_raw_cell(values, r, c) for c in range(c0, c1 + 1)] for r in range(r0, r1 + 1)]
+        value_ranges.append({
+            "range": block_range(prefix, start_col + c0, start_row + r0, c1 - c0 + 1, r1 - r0 + 1),
+            "values": rows,
+        })
+    return value_ranges
+
+
+def write_report(mode: str, cells_sent: int, bytes_sent: int, requests: int, updated_cells: Optional[int] = None) -> Dict[str, Any]:
+    return {
+        "mode": mode,
+        "cellsSent": cells_sent,
+        "bytesSent": bytes_sent,
+        "requests": requests,
+        "updatedCells": cells_sent if updated_cells is None else updated_cells,
+    }
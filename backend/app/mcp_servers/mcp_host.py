@@ -0,0 +1,94 @@
+"""Runs one Workspace server class as a standalone MCP server speaking JSON-RPC over stdio.
+
+Usage (from backend/): python -m app.mcp_servers.mcp_host GSheetsMCPServer
+"""
+import importlib
+import json
+import os
+import sys
+from typing import Any
+
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Server class name (as used in mcp_server_config.json) -> module inside app.mcp_servers
+SERVER_MODULES = {
+    "GmailMCPServer": "gmail_server",
+    "GCalendarMCPServer": "gcalender_server",
+    "GDocsMCPServer": "gdocs_server",
+    "GSheetsMCPServer": "gsheets_server",
+    "GFormsMCPServer": "gforms_server",
+}
+
+
+def load_server_class(class_name: str) -> Any:
+    if class_name not in SERVER_MODULES:
+        raise ValueError(f"Unknown MCP server '{class_name}'. Known servers: {', '.join(SERVER_MODULES)}")
+    module = importlib.import_module(f".{SERVER_MODULES[class_name]}", package=__package__)
+    return getattr(module, class_name)
+
+
+def build_mcp_server(class_name: str):
+    """Wraps a server instance and its compiled tool registry in an mcp.server.Server."""
+    import anyio
+    import mcp.types as types
+    from mcp.server import Server
+
+    from ..services.tool_registry import ToolRegistry
+    from .quota import PRIORITY_ARG, quota_scope
+    from .resilience import tool_deadline
+
+    instance = load_server_class(class_name)()
+    registry = ToolRegistry.load({class_name: instance})
+    server = Server(f"agentic-workspace-{class_name}")
+
+    @server.list_tools()
+    async def list_tools():
+        return [
+            types.Tool(
+                name=name,
+                description=registry.get(name).definition["function"].get("description"),
+                inputSchema=registry.get(name).definition["function"].get("parameters", {"type": "object"})
+            )
+            for name in registry.names()
+        ]
+
+    @server.call_tool()
+    async def call_tool(name: str, arguments: dict):
+        tool = registry.get(name)
+        if tool is None:
+            raise ValueError(f"Unknown tool '{name}'")
+        arguments = dict(arguments or {})
+        # Bulk callers (jobs, prefetch) must stay behind interactive chats in this process's quota queues too
+        priority = arguments.pop(PRIORITY_ARG, None)
+        args = tool.validate(arguments)
+
+        def run():
+            with quota_scope(priority=priority), tool_deadline(name):
+                return tool.function(**args)
+
+        # Google client calls are blocking; run them off the event loop thread
+        result = await anyio.to_thread.run_sync(run)
+        return [types.TextContent(type="text", text=json.dumps(result, default=str))]
+
+    return server
+
+
+async def serve(class_name: str):
+    from mcp.server import stdio_server
+
+    server = build_mcp_server(class_name)
+    logger.info(f"MCP server {class_name} (pid {os.getpid()}) listening on stdio")
+    async with stdio_server() as (read_stream, write_stream):
+        await server.run(read_stream, write_stream, server.create_initialization_options())
+
+
+if __name__ == "__main__":
+    import anyio
+
+    if len(sys.argv) != 2:
+        sys.exit("usage: python -m app.mcp_servers.mcp_host <ServerClassName>")
+    anyio.run(serve, sys.argv[1])
+    # Do not wait on a Google call that may still be blocked in a worker thread once the client is gone
+    os._exit(0)
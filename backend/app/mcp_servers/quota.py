@@ -0,0 +1,318 @@
+"""Quota-aware scheduling of Google API requests.
+
+Every request takes tokens from two buckets before it is sent: the project-wide bucket of its API
+quota and the bucket of the calling user. Requests that have to wait are queued per quota, ordered
+by priority (interactive before bulk) and then by start-time fair queueing across users, so one
+heavy user cannot starve the others. Buckets refill continuously at a fraction of the published
+per-minute limits, which keeps throughput just under the ceiling instead of bursting into 429s.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional, Tuple
+
+from ..config import settings
+from ..utils.logger import get_logger
+from ..utils.metrics import CallbackGauge, Histogram
+
+logger = get_logger(__name__)
+
+PRIORITIES = ("interactive", "bulk")
+
+# api -> quota -> (project limit, per-user limit) per minute, from the Workspace API quota pages
+DEFAULT_QUOTAS: Dict[str, Dict[str, Tuple[int, int]]] = {
+    "gmail": {"units": (1_200_000, 15_000)},
+    "sheets": {"read": (300, 60), "write": (300, 60)},
+    "docs": {"read": (3000, 300), "write": (600, 60)},
+    "forms": {"read": (975, 390), "write": (375, 150)},
+    "calendar": {"requests": (10_000, 600)},
+}
+
+# API -> the server class that calls it; in subprocess mode each of its worker processes has its own scheduler
+API_SERVERS: Dict[str, str] = {
+    "gmail": "GmailMCPServer",
+    "sheets": "GSheetsMCPServer",
+    "docs": "GDocsMCPServer",
+    "forms": "GFormsMCPServer",
+    "calendar": "GCalendarMCPServer",
+}
+
+# Gmail charges quota units per method rather than per request
+GMAIL_UNIT_COSTS: Dict[str, int] = {
+    "gmail.users.messages.send": 100,
+    "gmail.users.messages.list": 5,
+    "gmail.users.messages.get": 5,
+}
+
+QUOTA_WAIT_SECONDS = Histogram("google_quota_wait_seconds", "Time Google API requests waited for quota.", ["quota", "priority"])
+
+# The Google account the calls are made as, not the app client: every call uses the one token at TOKEN_PATH
+_user: ContextVar[str] = ContextVar("quota_user", default="default")
+_priority: ContextVar[str] = ContextVar("quota_priority", default="interactive")
+
+# Reserved tool argument that carries the caller's priority to an MCP worker process
+PRIORITY_ARG = "_quota_priority"
+
+
+class QuotaTimeoutError(TimeoutError):
+    """Raised when a request is still queued for quota when its deadline passes."""
+
+
+@contextmanager
+def quota_scope(user: Optional[str] = None, priority: Optional[str] = None):
+    """Attributes the Google calls made inside the block to `user` and schedules them at `priority`."""
+    if priority is not None and priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority '{priority}'. Use one of: {', '.join(PRIORITIES)}")
+    tokens = []
+    if user is not None:
+        tokens.append((_user, _user.set(user)))
+    if priority is not None:
+        tokens.append((_priority, _priority.set(priority)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+def current_priority() -> str:
+    """Priority of the Google calls made in the current context."""
+    return _priority.get()
+
+
+def google_processes(api: str) -> int:
+    """Processes that call `api`, each pacing itself: every uvicorn worker, times the MCP worker pool of the
+    server owning the API when tools run in subprocess mode."""
+    processes = max(1, settings.WORKERS)
+    server = API_SERVERS.get(api)
+    if settings.MCP_SERVER_MODE == "subprocess" and server is not None:
+        processes *= max(1, settings.MCP_SERVER_WORKERS.get(server, settings.MCP_WORKERS_PER_SERVER))
+    return processes
+
+
+def quota_limits(api: str) -> Dict[str, Tuple[int, int]]:
+    limits = dict(DEFAULT_QUOTAS.get(api, {}))
+    for quota, (project, user) in settings.GOOGLE_QUOTAS.get(api, {}).items():
+        limits[quota] = (project, user)
+    # Each process paces to an equal share, so together they stay under the published limit
+    processes = google_processes(api)
+    return {quota: (max(1, project // processes), max(1, user // processes)) for quota, (project, user) in limits.items()}
+
+
+def classify(request) -> Tuple[str, Optional[str], int]:
+    """Maps a googleapiclient request to (api, quota, cost); quota is None for APIs without a known limit."""
+    method_id = getattr(request, "methodId", None) or "google"
+    api = method_id.split(".")[0]
+    limits = quota_limits(api)
+    if api == "gmail":
+        return api, "units", GMAIL_UNIT_COSTS.get(method_id, 5)
+    if "read" in limits:
+        return api, "read" if request.method == "GET" else "write", 1
+    if len(limits) == 1:
+        return api, next(iter(limits)), 1
+    return api, None, 1
+
+
+class TokenBucket:
+    """Continuously refilled bucket holding at most `burst_seconds` worth of the per-minute rate."""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute * settings.GOOGLE_QUOTA_HEADROOM / 60.0
+        self.capacity = max(1.0, self.rate * settings.GOOGLE_QUOTA_BURST_SECONDS)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, cost: float, now: float) -> float:
+        self._refill(now)
+        # Costs above the burst size would never fit; let them through once the bucket is full
+        needed = min(cost, self.capacity) - self.tokens
+        return 0.0 if needed <= 0 else needed / self.rate
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+    def take(self, cost: float):
+        self.tokens -= min(cost, self.capacity)
+
+    def drain(self):
+        self.tokens = min(self.tokens, 0.0)
+
+
+class _Waiter:
+    __slots__ = ("user", "priority", "cost", "tag", "seq", "enqueued_at", "granted")
+
+    def __init__(self, user: str, priority: str, cost: int, tag: float, seq: int):
+        self.user = user
+        self.priority = priority
+        self.cost = cost
+        self.tag = tag
+        self.seq = seq
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+
+    def order(self) -> Tuple[int, float, int]:
+        return PRIORITIES.index(self.priority), self.tag, self.seq
+
+
+class QuotaQueue:
+    """Fair, priority-ordered queue in front of one API quota (e.g. sheets/read)."""
+
+    def __init__(self, name: str, project_per_minute: int, user_per_minute: int):
+        self.name = name
+        self.project = TokenBucket(project_per_minute)
+        self.user_per_minute = user_per_minute
+        self.users: Dict[str, TokenBucket] = {}
+        self._waiters: List[_Waiter] = []
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._vtime = 0.0
+        self._user_finish: Dict[str, float] = {}
+        self.stats = {
+            priority: {"granted": 0, "queued": 0, "timeouts": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0}
+            for priority in PRIORITIES
+        }
+
+    def _user_bucket(self, user: str) -> TokenBucket:
+        if user not in self.users:
+            self.users[user] = TokenBucket(self.user_per_minute)
+        return self.users[user]
+
+    def _dispatch(self, now: float):
+        """Grants queued requests in order while the project bucket allows; callers hold the lock."""
+        for waiter in sorted(self._waiters, key=_Waiter.order):
+            # Project tokens are reserved for the first waiter in line, so lower priorities cannot jump it
+            if self.project.wait_time(waiter.cost, now) > 0:
+                break
+            user_bucket = self._user_bucket(waiter.user)
+            if user_bucket.wait_time(waiter.cost, now) > 0:
+                continue
+            self.project.take(waiter.cost)
+            user_bucket.take(waiter.cost)
+            self._vtime = max(self._vtime, waiter.tag)
+            waiter.granted = True
+            self._waiters.remove(waiter)
+            self._record(waiter, now)
+        self._cond.notify_all()
+
+    def _record(self, waiter: _Waiter, now: float):
+        stats = self.stats[waiter.priority]
+        waited = now - waiter.enqueued_at
+        stats["granted"] += 1
+        stats["wait_seconds_total"] += waited
+        stats["wait_seconds_max"] = max(stats["wait_seconds_max"], waited)
+        QUOTA_WAIT_SECONDS.observe(waited, quota=self.name, priority=waiter.priority)
+        if waited > 0.001:
+            stats["queued"] += 1
+
+    def _forget_idle(self, now: float):
+        """Drops the bucket and tag of users with nothing queued once they are back to what a new user gets."""
+        waiting = {w.user for w in self._waiters}
+        idle = [finish for user, finish in self._user_finish.items() if user not in waiting]
+        if idle and not self._waiters:
+            # Tags earned while nobody waited took no tokens from anyone, so the clock may pass them
+            self._vtime = max(self._vtime, max(idle))
+        for user, finish in list(self._user_finish.items()):
+            if finish <= self._vtime and user not in waiting:
+                del self._user_finish[user]
+        for user, bucket in list(self.users.items()):
+            if user not in waiting and bucket.is_full(now):
+                del self.users[user]
+
+    def acquire(self, cost: int, user: str, priority: str, deadline: float):
+        with self._cond:
+            # Start-time fair queueing: a user's tag advances by the cost of everything they already queued
+            tag = max(self._vtime, self._user_finish.get(user, 0.0))
+            self._user_finish[user] = tag + cost
+            self._seq += 1
+            waiter = _Waiter(user, priority, cost, tag, self._seq)
+            self._waiters.append(waiter)
+            while True:
+                now = time.monotonic()
+                self._dispatch(now)
+                if waiter.granted:
+                    self._forget_idle(now)
+                    return
+                if now >= deadline:
+                    self._waiters.remove(waiter)
+                    self.stats[priority]["timeouts"] += 1
+                    self._forget_idle(now)
+                    raise QuotaTimeoutError(f"Timed out waiting for Google {self.name} quota")
+                wake = max(self.project.wait_time(cost, now), self._user_bucket(user).wait_time(cost, now), 0.005)
+                self._cond.wait(min(wake, deadline - now))
+
+    def penalize(self, user: str):
+        """Google answered 429: empty both buckets so queued requests back off instead of piling on."""
+        with self._cond:
+            self.project.drain()
+            self._user_bucket(user).drain()
+
+    def status(self) -> Dict[str, Any]:
+        with self._cond:
+            by_priority = {}
+            for priority, stats in self.stats.items():
+                granted = stats["granted"]
+                by_priority[priority] = {
+                    "depth": sum(1 for w in self._waiters if w.priority == priority),
+                    "granted": granted,
+                    "queued": stats["queued"],
+                    "timeouts": stats["timeouts"],
+                    "avg_wait_seconds": round(stats["wait_seconds_total"] / granted, 4) if granted else 0.0,
+                    "max_wait_seconds": round(stats["wait_seconds_max"], 4),
+                }
+            return {
+                "depth": len(self._waiters),
+                "project_tokens": round(self.project.tokens, 2),
+                "users": len(self.users),
+                "priorities": by_priority,
+            }
+
+
+class QuotaScheduler:
+    """Holds one QuotaQueue per API quota; queues are created on first use."""
+
+    def __init__(self):
+        self._queues: Dict[str, QuotaQueue] = {}
+        self._lock = threading.Lock()
+
+    def _queue(self, api: str, quota: str) -> QuotaQueue:
+        name = f"{api}/{quota}"
+        with self._lock:
+            if name not in self._queues:
+                project, user = quota_limits(api)[quota]
+                self._queues[name] = QuotaQueue(name, project, user)
+            return self._queues[name]
+
+    def acquire(self, request, deadline: float):
+        """Blocks until `request` fits the quota of its API, or raises QuotaTimeoutError at `deadline`."""
+        if not settings.GOOGLE_QUOTA_ENABLED:
+            return
+        api, quota, cost = classify(request)
+        if quota is None:
+            return
+        self._queue(api, quota).acquire(cost, _user.get(), _priority.get(), deadline)
+
+    def penalize(self, request):
+        if not settings.GOOGLE_QUOTA_ENABLED:
+            return
+        api, quota, _ = classify(request)
+        if quota is not None:
+            self._queue(api, quota).penalize(_user.get())
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            queues = dict(self._queues)
+        return {name: queue.status() for name, queue in queues.items()}
+
+
+scheduler = QuotaScheduler()
+
+CallbackGauge(
+    "google_quota_queue_depth", "Google API requests currently waiting for quota.", ["quota"],
+    lambda: {(name,): status["depth"] for name, status in scheduler.status().items()}
+)
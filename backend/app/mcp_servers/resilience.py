@@ -0,0 +1,289 @@
+"""Shared resilience layer for the Google API calls made by the MCP servers.
+
+execute_request() replaces request.execute(): it enforces the deadline of the tool being run,
+retries 429/5xx responses with jittered exponential backoff, fails fast while the API's circuit
+breaker is open and can hedge slow idempotent reads. Every attempt first waits for quota from
+the quota scheduler.
+"""
+import copy
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from typing import Dict, Any, Optional
+
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.errors import HttpError
+
+from ..config import settings
+from ..utils.logger import get_logger
+from ..utils.metrics import CallbackGauge, Counter, Histogram
+from ..utils.tracing import span
+from .quota import scheduler
+
+logger = get_logger(__name__)
+
+# Tools that legitimately run long (pagination, chunked writes); everything else uses TOOL_DEADLINE_SECONDS
+DEFAULT_TOOL_DEADLINES: Dict[str, float] = {
+    "gsheet_update_sheet": 120.0,
+    "gforms_get_responses": 120.0,
+    "gforms_create_form": 90.0,
+    "gforms_clone_form": 90.0,
+    # Bounds the whole pipeline, including every sink call it makes
+    "pipeline_run": 600.0,
+}
+
+# Absolute (time.monotonic) deadline of the tool call running in this context
+_deadline: ContextVar[Optional[float]] = ContextVar("tool_deadline", default=None)
+_deadline_override: ContextVar[Optional[float]] = ContextVar("tool_deadline_override", default=None)
+
+# Attempts run on these threads so a hung socket can be abandoned once the deadline passes
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="google-api")
+_local = threading.local()
+
+
+class DeadlineExceededError(TimeoutError):
+    """Raised when a tool's deadline passes before its Google API call completes."""
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling Google while an API's circuit breaker is open."""
+
+
+def deadline_for(tool_name: str) -> float:
+    override = _deadline_override.get()
+    if override is not None:
+        return override
+    return settings.TOOL_DEADLINES.get(tool_name, DEFAULT_TOOL_DEADLINES.get(tool_name, settings.TOOL_DEADLINE_SECONDS))
+
+
+@contextmanager
+def deadline_override(seconds: float):
+    """Replaces every tool's deadline inside the block, e.g. for background jobs that may run for minutes."""
+    token = _deadline_override.set(seconds)
+    try:
+        yield
+    finally:
+        _deadline_override.reset(token)
+
+
+@contextmanager
+def tool_deadline(tool_name: str):
+    """Bounds every Google call made inside the block by the tool's deadline. Nested deadlines never extend an outer one."""
+    deadline = time.monotonic() + deadline_for(tool_name)
+    outer = _deadline.get()
+    token = _deadline.set(deadline if outer is None else min(outer, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: opens after `failure_threshold` failures, then lets one probe through after `reset_seconds`."""
+
+    def __init__(self, api: str, failure_threshold: int, reset_seconds: float):
+        self.api = api
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                self._probe_in_flight = False
+            if self.state == "half_open":
+                if self._probe_in_flight:
+                    return False
+                self._probe_in_flight = True
+                return True
+            return self.state == "closed"
+
+    def release_probe(self):
+        """Hands back a half-open probe that was allowed but never sent, so the next call can probe instead."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.reset_seconds - time.monotonic())
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.info(f"Circuit for {self.api} API closed")
+            self.state = "closed"
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+                logger.warning(f"Circuit for {self.api} API opened after {self.failures} failure(s)")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def status(self) -> Dict[str, Any]:
+        return {"state": self.state, "failures": self.failures, "retry_after_seconds": round(self.retry_after(), 1) if self.state == "open" else 0}
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(api: str) -> CircuitBreaker:
+    with _breakers_lock:
+        if api not in _breakers:
+            _breakers[api] = CircuitBreaker(api, settings.GOOGLE_CIRCUIT_FAILURE_THRESHOLD, settings.GOOGLE_CIRCUIT_RESET_SECONDS)
+        return _breakers[api]
+
+
+def circuit_status() -> Dict[str, Any]:
+    with _breakers_lock:
+        return {api: breaker.status() for api, breaker in _breakers.items()}
+
+
+def _circuit_samples() -> Dict[tuple, float]:
+    with _breakers_lock:
+        return {(api,): 1.0 if breaker.state == "open" else 0.0 for api, breaker in _breakers.items()}
+
+
+GOOGLE_SECONDS = Histogram("google_api_request_seconds", "Latency of individual Google API requests (each attempt).", ["api", "method"])
+GOOGLE_ERRORS = Counter("google_api_errors_total", "Failed Google API attempts by HTTP status or exception type.", ["api", "reason"])
+CallbackGauge("google_api_circuit_open", "1 while the circuit breaker of a Google API is open.", ["api"], _circuit_samples)
+
+
+def _thread_http(http):
+    """httplib2.Http is not thread-safe, so each executor thread gets its own authorized transport."""
+    credentials = getattr(http, "credentials", None)
+    if credentials is None:
+        return http
+    cached = getattr(_local, "http", None)
+    if cached is None or cached.credentials is not credentials:
+        _local.http = AuthorizedHttp(credentials, http=httplib2.Http(timeout=settings.GOOGLE_HTTP_TIMEOUT_SECONDS))
+    return _local.http
+
+
+def _attempt(request):
+    with GOOGLE_SECONDS.time(api=request.methodId.split(".")[0], method=request.methodId):
+        return request.execute(http=_thread_http(request.http))
+
+
+def _status(error: Exception) -> Optional[int]:
+    if isinstance(error, HttpError):
+        return int(error.resp.status)
+    return None
+
+
+def _is_transient(error: Exception) -> bool:
+    """Server-side or transport trouble, as opposed to a bad request."""
+    status = _status(error)
+    if status is not None:
+        return status >= 500
+    return not isinstance(error, DeadlineExceededError) and isinstance(error, (TimeoutError, ConnectionError, httplib2.HttpLib2Error))
+
+
+def _is_retryable(error: Exception, idempotent: bool) -> bool:
+    # A 429 is rejected before Google applies anything, so even writes can be retried safely
+    if _status(error) == 429:
+        return True
+    return idempotent and _is_transient(error)
+
+
+def _backoff(attempt: int, error: Exception) -> float:
+    delay = random.uniform(0, min(settings.GOOGLE_RETRY_MAX_DELAY_SECONDS, settings.GOOGLE_RETRY_BASE_DELAY_SECONDS * 2 ** (attempt - 1)))
+    if isinstance(error, HttpError):
+        try:
+            delay = max(delay, float(error.resp.get("retry-after", 0)))
+        except (TypeError, ValueError):
+            pass
+    return delay
+
+
+def _run_attempt(request, deadline: float, hedge: bool):
+    # Attempts run in the caller's context so their log lines keep the request ID
+    futures = {_executor.submit(copy_context().run, _attempt, request)}
+    hedge_after = settings.GOOGLE_HEDGE_AFTER_SECONDS
+    if hedge and 0 < hedge_after < deadline - time.monotonic():
+        done, _ = wait(futures, timeout=hedge_after)
+        if not done:
+            # Duplicate the request so the two executions do not share mutable headers
+            hedged = copy.copy(request)
+            hedged.headers = dict(request.headers)
+            futures.add(_executor.submit(copy_context().run, _attempt, hedged))
+            logger.info(f"Hedging slow {request.methodId} call")
+
+    error = None
+    while futures:
+        done, futures = wait(futures, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+        if not done:
+            raise DeadlineExceededError(f"{request.methodId} did not complete before the tool deadline")
+        for future in done:
+            if future.exception() is None:
+                # A loser that has not started is dropped; one already in flight is an idempotent read and finishes unseen
+                for other in futures:
+                    other.cancel()
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+def execute_request(request, idempotent: Optional[bool] = None) -> Any:
+    """Executes a googleapiclient HttpRequest with deadline, retries and the API's circuit breaker.
+
+    `idempotent` defaults to True for GET requests; non-idempotent requests are retried on 429 only
+    and are never hedged.
+    """
+    api = request.methodId.split(".")[0] if getattr(request, "methodId", None) else "google"
+    if idempotent is None:
+        idempotent = request.method == "GET"
+    with span(f"google.{getattr(request, 'methodId', api)}", kind="CLIENT", **{"google.api": api, "http.method": request.method}) as trace_span:
+        return _execute_request(request, api, idempotent, trace_span)
+
+
+def _execute_request(request, api: str, idempotent: bool, trace_span) -> Any:
+    deadline = _deadline.get() or time.monotonic() + settings.TOOL_DEADLINE_SECONDS
+    breaker = get_breaker(api)
+    attempt = 0
+    while True:
+        if time.monotonic() >= deadline:
+            raise DeadlineExceededError(f"Tool deadline passed before {request.methodId} could run")
+        # The breaker goes first: a call it rejects must not take, or queue for, a quota token
+        if not breaker.allow():
+            raise CircuitOpenError(f"Google {api} API is failing; calls are paused for {breaker.retry_after():.0f}s.")
+        try:
+            scheduler.acquire(request, deadline)
+        except BaseException:
+            breaker.release_probe()
+            raise
+        try:
+            result = _run_attempt(request, deadline, hedge=idempotent)
+        except Exception as e:
+            GOOGLE_ERRORS.inc(api=api, reason=str(_status(e) or type(e).__name__))
+            if _is_transient(e) or isinstance(e, DeadlineExceededError):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            if _status(e) == 429:
+                scheduler.penalize(request)
+            attempt += 1
+            trace_span.set_attribute("google.attempts", attempt)
+            if not _is_retryable(e, idempotent) or attempt >= settings.GOOGLE_RETRY_MAX_ATTEMPTS:
+                raise
+            delay = _backoff(attempt, e)
+            if time.monotonic() + delay >= deadline:
+                raise
+            logger.warning(f"{request.methodId} failed ({e!r}); retry {attempt} in {delay:.2f}s")
+            time.sleep(delay)
+            continue
+        breaker.record_success()
+        return result
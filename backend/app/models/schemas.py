@@ -17,6 +17,27 @@ class ChatResponse(BaseModel):
     tool_details:Optional[List[ToolDetail]] = None
 
 
+class JobProgress(BaseModel):
+    """Checkpointed progress of one step of a background job"""
+    completed:int
+    total:Optional[int] = None
+
+class JobStatus(BaseModel):
+    """State of a background job"""
+    id:str
+    tool_name:str
+    status:str
+    progress:Dict[str,JobProgress] = {}
+    result:Optional[Dict[str,Any]] = None
+    error:Optional[str] = None
+    attempts:int
+    cancel_requested:bool
+    created_at:float
+    started_at:Optional[float] = None
+    updated_at:float
+    finished_at:Optional[float] = None
+
+
 class FunctionCall(BaseModel):
     """LLM function call object"""
     name:str
@@ -0,0 +1,195 @@
+"""Admission control for the chat endpoint.
+
+At most CHAT_MAX_CONCURRENT chats run per worker process; up to CHAT_MAX_QUEUE more wait in a
+queue ordered by start-time fair queueing across users, so one user's burst cannot starve the
+others. A request is rejected up front, with Retry-After, instead of being queued when it could
+not start early enough to finish within its deadline:
+
+- 429 when the user already has CHAT_MAX_PER_USER chats running or queued,
+- 503 when the queue is full, the estimated wait exceeds the deadline, or the wait times out.
+
+The controller lives on the event loop and is only touched from coroutines, so it needs no lock.
+"""
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..config import settings
+from ..utils.logger import get_logger
+from ..utils.metrics import CallbackGauge, Counter, Histogram
+
+logger = get_logger(__name__)
+
+CHAT_ADMISSIONS = Counter("chat_admission_total", "Chat requests by admission outcome.", ["outcome"])
+CHAT_QUEUE_WAIT = Histogram("chat_queue_wait_seconds", "Time admitted chat requests waited for a slot.")
+
+
+class AdmissionRejected(Exception):
+    """Raised instead of admitting a request; carries the HTTP status and a Retry-After hint in seconds."""
+
+    def __init__(self, status_code: int, message: str, retry_after: float):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class _Ticket:
+    __slots__ = ("user", "tag", "seq", "future", "enqueued_at")
+
+    def __init__(self, user: str, tag: float, seq: int, future: asyncio.Future):
+        self.user = user
+        self.tag = tag
+        self.seq = seq
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+    def order(self) -> Tuple[float, int]:
+        return self.tag, self.seq
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent: int, max_queue: int, max_per_user: int, expected_seconds: float):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max_queue
+        self.max_per_user = max_per_user
+        # Moving average of chat duration, used to estimate how long a queued request will wait
+        self.service_seconds = expected_seconds
+        self.running = 0
+        self._active: Dict[str, int] = {}
+        self._waiters: List[_Ticket] = []
+        self._seq = 0
+        self._vtime = 0.0
+        self._user_finish: Dict[str, float] = {}
+
+    def estimated_wait(self, ahead: int) -> float:
+        """Seconds until a request with `ahead` requests in front of it gets a slot, assuming average chats."""
+        if self.running < self.max_concurrent and ahead == 0:
+            return 0.0
+        return (ahead // self.max_concurrent + 1) * self.service_seconds
+
+    def _reject(self, outcome: str, status_code: int, message: str, retry_after: float):
+        CHAT_ADMISSIONS.inc(outcome=outcome)
+        logger.warning(f"Chat request rejected ({outcome}): {message}")
+        raise AdmissionRejected(status_code, message, retry_after)
+
+    def _admit(self, user: str):
+        # Immediate admissions count towards the user's share too, so a burst that ran first queues last
+        self._user_finish[user] = max(self._vtime, self._user_finish.get(user, 0.0)) + 1
+        self.running += 1
+        self._active[user] = self._active.get(user, 0) + 1
+
+    def _dispatch(self):
+        while self.running < self.max_concurrent and self._waiters:
+            ticket = min(self._waiters, key=_Ticket.order)
+            self._waiters.remove(ticket)
+            if ticket.future.done():
+                continue
+            self._vtime = max(self._vtime, ticket.tag)
+            self.running += 1
+            ticket.future.set_result(None)
+
+    def _release(self, user: str, elapsed: Optional[float]):
+        self.running -= 1
+        self._active[user] -= 1
+        if not self._active[user]:
+            del self._active[user]
+        if elapsed is not None:
+            self.service_seconds += settings.CHAT_SERVICE_TIME_ALPHA * (elapsed - self.service_seconds)
+        self._dispatch()
+        self._forget_idle()
+
+    def _forget_idle(self):
+        """Drops the tags of idle users the virtual clock has passed; they would start at _vtime anyway."""
+        idle = [finish for user, finish in self._user_finish.items() if user not in self._active]
+        if idle and not self._waiters:
+            # Tags earned while nobody waited took no slot from anyone, so the clock may pass them;
+            # running users keep theirs whenever they are ahead of the idle ones
+            self._vtime = max(self._vtime, max(idle))
+        for user, finish in list(self._user_finish.items()):
+            if finish <= self._vtime and user not in self._active:
+                del self._user_finish[user]
+
+    async def _acquire(self, user: str, deadline_seconds: float):
+        if self.max_per_user and self._active.get(user, 0) >= self.max_per_user:
+            self._reject("user_limit", 429, f"Too many chat requests in progress for this user (limit {self.max_per_user}).", self.service_seconds)
+        if self.running < self.max_concurrent and not self._waiters:
+            self._admit(user)
+            CHAT_ADMISSIONS.inc(outcome="admitted")
+            CHAT_QUEUE_WAIT.observe(0.0)
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._reject("queue_full", 503, "The server is busy; the chat queue is full.", self.estimated_wait(len(self._waiters)))
+
+        # Start-time fair queueing with unit cost: a user's tag advances with every request they queue
+        tag = max(self._vtime, self._user_finish.get(user, 0.0))
+        self._seq += 1
+        ahead = sum(1 for w in self._waiters if w.order() < (tag, self._seq))
+        # A request must start early enough to finish, so the budget for waiting excludes one average chat
+        budget = deadline_seconds - self.service_seconds
+        wait = self.estimated_wait(ahead)
+        if wait > budget:
+            self._reject("deadline", 503, f"The server is busy; estimated wait {wait:.1f}s exceeds the request deadline.", wait)
+
+        self._user_finish[user] = tag + 1
+        ticket = _Ticket(user, tag, self._seq, asyncio.get_running_loop().create_future())
+        self._waiters.append(ticket)
+        self._active[user] = self._active.get(user, 0) + 1
+        try:
+            await asyncio.wait_for(asyncio.shield(ticket.future), timeout=max(budget, 0.0))
+        except asyncio.TimeoutError:
+            self._abandon(ticket)
+            self._reject("timeout", 503, "The server is busy; no chat slot freed up before the request deadline.", self.estimated_wait(len(self._waiters)))
+        except asyncio.CancelledError:
+            # The client went away while queued
+            self._abandon(ticket)
+            CHAT_ADMISSIONS.inc(outcome="cancelled")
+            raise
+        CHAT_ADMISSIONS.inc(outcome="admitted")
+        CHAT_QUEUE_WAIT.observe(time.monotonic() - ticket.enqueued_at)
+
+    def _abandon(self, ticket: _Ticket):
+        if ticket.future.done() and not ticket.future.cancelled():
+            # Granted in the same loop iteration the wait gave up; hand the slot on
+            self._release(ticket.user, None)
+            return
+        ticket.future.cancel()
+        if ticket in self._waiters:
+            self._waiters.remove(ticket)
+        self._active[ticket.user] -= 1
+        if not self._active[ticket.user]:
+            del self._active[ticket.user]
+        self._forget_idle()
+
+    @asynccontextmanager
+    async def slot(self, user: str, deadline_seconds: float):
+        """Holds one chat slot for the block; raises AdmissionRejected if none can be had in time."""
+        await self._acquire(user, deadline_seconds)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(user, time.monotonic() - started)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queued": len(self._waiters),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "users": len(self._active),
+            "avg_chat_seconds": round(self.service_seconds, 3),
+        }
+
+
+# Per worker process: each process has its own threads and sockets to protect
+admission = AdmissionController(
+    settings.CHAT_MAX_CONCURRENT, settings.CHAT_MAX_QUEUE,
+    settings.CHAT_MAX_PER_USER, settings.CHAT_EXPECTED_SECONDS
+)
+
+CHAT_ADMISSION_STATE = CallbackGauge(
+    "chat_admission", "Chat requests running and queued in this worker.", ["state"],
+    lambda: {("running",): admission.running, ("queued",): len(admission._waiters)}
+)
@@ -1,28 +1,107 @@
 # backend/app/services/agent_orchestrator.py
 
 import json
-from typing import Any, Dict
-from openai import OpenAI
-from anthropic import Anthropic
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Any, Dict, Optional, Set, Tuple
 
 from ..config import settings
 from ..models.schemas import ChatResponse
 from .llm_service import LLMService
 from .mcp_service import MCPService
+from .plan_executor import PLAN_TOOL, PLAN_TOOL_NAME, PlanExecutor
 from ..utils.logger import get_logger
+from ..utils.metrics import Counter, Histogram
+from ..utils.tracing import span
 
 logger = get_logger(__name__)
 
+STAGE_SECONDS = Histogram("agent_stage_seconds", "Time spent per orchestration stage (plan, tools, summary, total).", ["stage"])
+SPECULATION_SAVED = Counter("agent_speculation_saved_seconds_total", "Tool latency hidden behind the streaming planning call.")
+
+class _Speculation:
+    """A read-only tool started from a tool call that was still streaming."""
+    __slots__ = ("name", "args", "future", "started_at")
+
+    def __init__(self, name: str, args: Dict[str, Any], future, started_at: float):
+        self.name = name
+        self.args = args
+        self.future = future
+        self.started_at = started_at
+
+
 class AgentOrchestrator:
-    def __init__(self):
+    def __init__(self, mcp_service: Optional[MCPService] = None):
         self.llm_service = LLMService(settings.LLM_PROVIDER)
-        self.mcp_service = MCPService()
+        self.mcp_service = mcp_service or MCPService()
         self.tool_definitions = self.mcp_service.get_tool_definitions()
+        # execute_plan is handled here rather than by an MCP server
+        self.planning_tools = self.tool_definitions + [PLAN_TOOL] if settings.AGENT_MULTI_STEP else self.tool_definitions
+        self.plan_executor = PlanExecutor(self.mcp_service, self.llm_service)
+        self._speculation_pool = ThreadPoolExecutor(max_workers=settings.SPECULATIVE_MAX_WORKERS, thread_name_prefix="speculative-tool")
+        self._stats_lock = threading.Lock()
+        self.speculation_stats = {"started": 0, "used": 0, "discarded": 0, "saved_seconds": 0.0}
+
+    def _timed_execute(self, tool_name: str, tool_args: Dict[str, Any]) -> Tuple[Dict[str, Any], float]:
+        # Never deferred to a background job: the plan may still discard this call
+        result = self.mcp_service.execute_tool(tool_name, tool_args, allow_background=False)
+        return result, time.monotonic()
+
+    def _plan(self, user_message: str) -> Tuple[Dict[str, Any], Dict[int, _Speculation], float]:
+        """Runs the planning LLM call, starting read-only tools whose arguments complete mid-stream."""
+        speculations: Dict[int, _Speculation] = {}
+        if not settings.SPECULATIVE_TOOL_EXECUTION:
+            response = self.llm_service.get_chat_completion(user_message=user_message, tools=self.planning_tools)
+            return response, speculations, time.monotonic()
+
+        def on_tool_call(index: int, call_id: str, name: str, arguments: str):
+            # Write tools only ever run once the plan is final
+            if not self.mcp_service.is_read_only(name):
+                return
+            args = json.loads(arguments)
+            if not isinstance(args, dict):
+                return
+            logger.info(f"Speculatively starting {name} while the plan is still streaming")
+            # Run in this request's context so the tool's span and logs attach to it
+            future = self._speculation_pool.submit(copy_context().run, self._timed_execute, name, args)
+            speculations[index] = _Speculation(name, args, future, time.monotonic())
+
+        try:
+            response = self.llm_service.stream_chat_completion(
+                user_message=user_message,
+                tools=self.planning_tools,
+                on_tool_call=on_tool_call
+            )
+        except Exception:
+            # The router does not fail over once tool calls were announced; drop the ones not yet started
+            self._discard_speculations(speculations, set())
+            raise
+        return response, speculations, time.monotonic()
+
+    def _discard_speculations(self, speculations: Dict[int, _Speculation], used: Set[int]):
+        """Cancels speculative calls the final plan did not use.
+
+        Calls still queued never run; calls already running are read-only and bounded by their
+        tool deadline, so they finish in the background and their results are dropped.
+        """
+        for index, speculation in speculations.items():
+            if index not in used and speculation.future.cancel():
+                logger.info(f"Cancelled unused speculative {speculation.name} before it started")
+
+    def _record_speculation(self, started: int, used: int, saved: float):
+        with self._stats_lock:
+            self.speculation_stats["started"] += started
+            self.speculation_stats["used"] += used
+            self.speculation_stats["discarded"] += started - used
+            self.speculation_stats["saved_seconds"] = round(self.speculation_stats["saved_seconds"] + saved, 3)
+        SPECULATION_SAVED.inc(saved)
 
     def _format_function_call(self, tool_call: Any) -> Dict[str, Any]:
         """Formats the LLM's tool call into a standardized dictionary."""
         
-        # OpenAI format
+        # llm_providers normalizes every provider's tool calls to the OpenAI SDK type
         return {
             "id": tool_call.id,
             "function": {
@@ -31,6 +110,53 @@ class AgentOrchestrator:
             }
         }
 
+    def _orchestrate_plan(self, user_message: str, response: Dict[str, Any], started: float, plan_done: float) -> ChatResponse:
+        """Runs an execute_plan call locally, then makes the one summary call over its result."""
+        tool_calls = response["tool_calls"]
+        plan_call = next(c for c in tool_calls if c.function.name == PLAN_TOOL_NAME)
+        try:
+            plan = json.loads(plan_call.function.arguments or "{}")
+        except json.JSONDecodeError as e:
+            plan = {"steps": None}
+            logger.error(f"Unparseable execute_plan arguments: {e}")
+        # Tools called directly next to the plan become independent steps of it
+        direct = []
+        for index, call in enumerate(tool_calls):
+            if call is not plan_call:
+                try:
+                    args = json.loads(call.function.arguments or "{}")
+                except json.JSONDecodeError:
+                    args = {}
+                direct.append({"id": f"call_{index}", "tool": call.function.name, "args": args})
+        if direct and isinstance(plan.get("steps"), list):
+            plan["steps"] = plan["steps"] + direct
+
+        usage = response.get("usage") or {}
+        with span("agent.execute_plan"):
+            result = self.plan_executor.run(user_message, plan, usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0))
+        logger.info(f"Plan finished: {result['message']}")
+        tools_done = time.monotonic()
+        STAGE_SECONDS.observe(tools_done - plan_done, stage="tools")
+
+        with span("agent.summary", **{"agent.tool_outputs": 1}):
+            final_response = self.llm_service.get_final_response_with_tool_outputs(
+                user_message=user_message,
+                tool_calls=[plan_call],
+                tool_outputs=[{"tool_call_id": plan_call.id, "output": result}]
+            )
+        finished = time.monotonic()
+        STAGE_SECONDS.observe(finished - tools_done, stage="summary")
+        STAGE_SECONDS.observe(finished - started, stage="total")
+
+        return ChatResponse(
+            message=final_response.get('text', 'Could not generate a final response after tool execution.'),
+            tool_executed=True,
+            tool_details=[
+                {"tool_call_id": f"{plan_call.id}:{step_id}", "output": outcome.get("output", {"status": outcome["status"], "message": outcome.get("message")})}
+                for step_id, outcome in result["steps"].items()
+            ] or [{"tool_call_id": plan_call.id, "output": result}]
+        )
+
     def orchestrate_chat(self, user_message: str) -> ChatResponse:
         """
         The main orchestration loop for the agent.
@@ -40,38 +166,55 @@ class AgentOrchestrator:
         4. Returns final LLM response.
         """
         logger.info(f"Starting orchestration for: {user_message}")
+        started = time.monotonic()
         
-        # 1. Initial LLM call
-        response = self.llm_service.get_chat_completion(
-            user_message=user_message,
-            tools=self.tool_definitions
-        )
+        # 1. Initial LLM call (streamed, so read-only tools can start before it ends)
+        with span("agent.plan"):
+            response, speculations, plan_done = self._plan(user_message)
+        STAGE_SECONDS.observe(plan_done - started, stage="plan")
         
         # Check for tool calls
         tool_calls = response.get('tool_calls', [])
         
         # 2. If no tool is called, return the LLM's text response
         if not tool_calls:
+            self._discard_speculations(speculations, set())
+            self._record_speculation(len(speculations), 0, 0.0)
             logger.info("No tool call detected. Returning direct response.")
+            STAGE_SECONDS.observe(time.monotonic() - started, stage="total")
             return ChatResponse(
                 message=response.get('text', 'No response.'), 
                 tool_executed=False,
                 tool_details=None
             )
 
+        # A multi-step plan runs as a DAG; the model is not called between its steps
+        if any(c.function.name == PLAN_TOOL_NAME for c in tool_calls):
+            self._discard_speculations(speculations, set())
+            self._record_speculation(len(speculations), 0, 0.0)
+            return self._orchestrate_plan(user_message, response, started, plan_done)
+
         # 3. Process Tool Calls
         tool_outputs = []
-        for call in tool_calls:
+        used_indices: Set[int] = set()
+        saved = 0.0
+        for index, call in enumerate(tool_calls):
             formatted_call = self._format_function_call(call)
             tool_name = formatted_call["function"]["name"]
             tool_args_str = formatted_call["function"]["arguments"]
             
             try:
                 tool_args = json.loads(tool_args_str)
-                logger.info(f"Executing tool: {tool_name} with args: {tool_args}")
-                
-                # Execute tool via MCP
-                tool_result = self.mcp_service.execute_tool(tool_name, tool_args)
+                speculation = speculations.get(index)
+                if speculation is not None and speculation.name == tool_name and speculation.args == tool_args:
+                    tool_result, finished_at = speculation.future.result()
+                    used_indices.add(index)
+                    # Only the part that overlapped the stream is latency the user did not wait for
+                    saved += max(0.0, min(finished_at, plan_done) - speculation.started_at)
+                else:
+                    logger.info(f"Executing tool: {tool_name} with args: {tool_args}")
+                    # Execute tool via MCP
+                    tool_result = self.mcp_service.execute_tool(tool_name, tool_args)
                 
                 tool_outputs.append({
                     "tool_call_id": formatted_call["id"],
@@ -86,16 +229,29 @@ class AgentOrchestrator:
                     "output": {"status": "error", "message": error_output}
                 })
 
+        # Speculations the final plan did not confirm are discarded unread
+        self._discard_speculations(speculations, used_indices)
+        self._record_speculation(len(speculations), len(used_indices), saved)
+        if speculations:
+            logger.info(f"Speculative execution: {len(used_indices)}/{len(speculations)} result(s) used, {saved:.2f}s saved")
+
+        tools_done = time.monotonic()
+        STAGE_SECONDS.observe(tools_done - plan_done, stage="tools")
+
         # 4. Final LLM call with tool outputs
         logger.info("Calling LLM with tool outputs for final response.")
-        final_response = self.llm_service.get_final_response_with_tool_outputs(
-            user_message=user_message,
-            tool_calls=tool_calls,
-            tool_outputs=tool_outputs
-        )
+        with span("agent.summary", **{"agent.tool_outputs": len(tool_outputs)}):
+            final_response = self.llm_service.get_final_response_with_tool_outputs(
+                user_message=user_message,
+                tool_calls=tool_calls,
+                tool_outputs=tool_outputs
+            )
+        finished = time.monotonic()
+        STAGE_SECONDS.observe(finished - tools_done, stage="summary")
+        STAGE_SECONDS.observe(finished - started, stage="total")
         
         # Summarize tool execution for the user
-        tool_summary = f"Tool(s) executed: {', '.join([c['name'] for c in tool_calls])}."
+        tool_summary = f"Tool(s) executed: {', '.join([c.function.name for c in tool_calls])}."
         
         # Return final response
         return ChatResponse(
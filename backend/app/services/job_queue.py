@@ -0,0 +1,314 @@
+"""Background jobs for tool calls that take longer than a chat request should stay open.
+
+MCPService hands qualifying calls (large sheet writes, full form re-ingestion, anything listed in
+JOB_TOOLS) to the JobQueue, which stores them in the local database and returns a job ID at once.
+Worker threads claim jobs with a single atomic UPDATE, so several server processes can share the
+table. Running jobs heartbeat; a job whose heartbeat is older than JOB_LEASE_SECONDS belonged to a
+process that died and is re-queued, resuming from its checkpoints (see mcp_servers.checkpoint) if the
+tool is safe to repeat, or failed otherwise.
+"""
+import json
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from ..config import settings
+from ..mcp_servers.checkpoint import JobContext, job_context
+from ..mcp_servers.quota import quota_scope
+from ..mcp_servers.resilience import deadline_override
+from ..mcp_servers.gsheets_writer import count_cells
+from ..utils.db import sqlite_session
+from ..utils.logger import get_logger
+from ..utils.metrics import CallbackGauge, Counter
+from ..utils.tracing import request_span
+
+logger = get_logger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    tool_name TEXT NOT NULL,
+    args_json TEXT NOT NULL,
+    status TEXT NOT NULL,
+    checkpoints_json TEXT NOT NULL DEFAULT '{}',
+    result_json TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    claim TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    heartbeat_at REAL,
+    updated_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at);
+"""
+
+TERMINAL_STATUSES = ("succeeded", "failed", "cancelled")
+
+# Tools that checkpoint their progress and skip finished chunks when re-run
+CHECKPOINTED_TOOLS = frozenset({"gsheet_update_sheet", "pipeline_run"})
+
+# tool -> predicate on validated args deciding whether the call is big enough to run in the background
+BACKGROUND_RULES: Dict[str, Callable[[Dict[str, Any]], bool]] = {
+    "gsheet_update_sheet": lambda args: count_cells(args.get("values") or []) >= settings.JOB_MIN_SHEET_CELLS,
+    "gforms_get_responses": lambda args: bool(args.get("full_refresh")),
+    "pipeline_run": lambda args: bool(args.get("background")) and not args.get("dry_run"),
+}
+
+JOBS_FINISHED = Counter("jobs_finished_total", "Background jobs by tool and final status.", ["tool", "status"])
+
+# Store of the started queue, read by the gauge below at scrape time
+_metrics_store: Optional["JobStore"] = None
+
+
+def _job_counts() -> Dict[tuple, float]:
+    if _metrics_store is None:
+        return {}
+    return {(status,): n for status, n in _metrics_store.counts().items()}
+
+
+JOBS = CallbackGauge("jobs", "Background jobs in the database by status.", ["status"], _job_counts)
+
+
+class JobStore:
+    """The jobs table; every method is one short transaction so workers in other processes see changes at once."""
+
+    def __init__(self):
+        self._initialised = False
+
+    def _connect(self):
+        if not self._initialised:
+            with sqlite_session() as conn:
+                conn.executescript(SCHEMA)
+            self._initialised = True
+        return sqlite_session()
+
+    @staticmethod
+    def _to_dict(row) -> Dict[str, Any]:
+        checkpoints = json.loads(row["checkpoints_json"])
+        return {
+            "id": row["id"],
+            "tool_name": row["tool_name"],
+            "args": json.loads(row["args_json"]),
+            "status": row["status"],
+            "checkpoints": checkpoints,
+            "progress": {key: {"completed": state.get("completed", 0), "total": state.get("total")} for key, state in checkpoints.items()},
+            "result": json.loads(row["result_json"]) if row["result_json"] else None,
+            "error": row["error"],
+            "attempts": row["attempts"],
+            "cancel_requested": bool(row["cancel_requested"]),
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "updated_at": row["updated_at"],
+            "finished_at": row["finished_at"],
+        }
+
+    def submit(self, tool_name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, tool_name, args_json, status, created_at, updated_at) VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, tool_name, json.dumps(args, default=str), now, now)
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        query, params = "SELECT * FROM jobs", []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        with self._connect() as conn:
+            return [self._to_dict(row) for row in conn.execute(query, params).fetchall()]
+
+    def counts(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            return {row["status"]: row["n"] for row in conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")}
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """Atomically moves the oldest queued job to running and returns it, or None when the queue is empty."""
+        claim = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            # One statement, so two workers (or processes) can never claim the same job
+            conn.execute(
+                """UPDATE jobs SET status = 'running', claim = ?, attempts = attempts + 1, started_at = ?, heartbeat_at = ?, updated_at = ?
+                   WHERE id = (SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1) AND status = 'queued'""",
+                (claim, now, now, now)
+            )
+            row = conn.execute("SELECT * FROM jobs WHERE claim = ? AND status = 'running'", (claim,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def save_checkpoints(self, job_id: str, checkpoints: Dict[str, Any]) -> bool:
+        """Persists progress; returns False if the job has been cancelled meanwhile."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET checkpoints_json = ?, heartbeat_at = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(checkpoints, default=str), now, now, job_id)
+            )
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row is not None and not row["cancel_requested"]
+
+    def heartbeat(self, job_ids: List[str]):
+        if not job_ids:
+            return
+        with self._connect() as conn:
+            conn.executemany("UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = 'running'", [(time.time(), job_id) for job_id in job_ids])
+
+    def finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result_json = ?, error = ?, updated_at = ?, finished_at = ? WHERE id = ?",
+                (status, json.dumps(result, default=str) if result is not None else None, error, now, now, job_id)
+            )
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancels a queued job at once; a running job stops at its next checkpoint."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'cancelled', cancel_requested = 1, updated_at = ?, finished_at = ? WHERE id = ? AND status = 'queued'",
+                (now, now, job_id)
+            )
+            conn.execute("UPDATE jobs SET cancel_requested = 1, updated_at = ? WHERE id = ? AND status = 'running'", (now, job_id))
+        return self.get(job_id)
+
+    def recover_stale(self, lease_seconds: float, is_resumable: Callable[[str], bool]) -> int:
+        """Re-queues (or fails) running jobs whose worker stopped heartbeating. Returns how many were recovered."""
+        cutoff = time.time() - lease_seconds
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id, tool_name, attempts, cancel_requested FROM jobs WHERE status = 'running' AND heartbeat_at < ?", (cutoff,)).fetchall()
+            now = time.time()
+            for row in rows:
+                if row["cancel_requested"]:
+                    status, error = "cancelled", None
+                elif not is_resumable(row["tool_name"]):
+                    status, error = "failed", f"Interrupted by a restart; {row['tool_name']} is not safe to repeat, so it was not re-run."
+                elif row["attempts"] >= settings.JOB_MAX_ATTEMPTS:
+                    status, error = "failed", f"Interrupted {row['attempts']} time(s); giving up."
+                else:
+                    status, error = "queued", None
+                # The heartbeat condition is re-checked so a job that revived meanwhile is left alone
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, claim = NULL, updated_at = ?, finished_at = ? WHERE id = ? AND status = 'running' AND heartbeat_at < ?",
+                    (status, error, now, now if status != "queued" else None, row["id"], cutoff)
+                )
+        if rows:
+            logger.warning(f"Recovered {len(rows)} interrupted job(s)")
+        return len(rows)
+
+
+class JobQueue:
+    """Runs stored jobs on a small thread pool via `execute(tool_name, args)`."""
+
+    def __init__(self, store: JobStore, execute: Callable[[str, Dict[str, Any]], Dict[str, Any]], is_resumable: Callable[[str], bool], workers: int = settings.JOB_WORKERS):
+        self.store = store
+        self.execute = execute
+        self.is_resumable = is_resumable
+        self.workers = workers
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._running: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def should_defer(tool_name: str, args: Dict[str, Any]) -> bool:
+        if tool_name in settings.JOB_TOOLS:
+            return True
+        rule = BACKGROUND_RULES.get(tool_name)
+        return rule is not None and rule(args)
+
+    def submit(self, tool_name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+        job = self.store.submit(tool_name, args)
+        self._wake.set()
+        logger.info(f"Queued {tool_name} as background job {job['id']}")
+        return job
+
+    def start(self):
+        global _metrics_store
+        _metrics_store = self.store
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        heartbeat = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        heartbeat.start()
+        self._threads.append(heartbeat)
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        self._threads = []
+
+    def _heartbeat(self):
+        # Also reclaims jobs from dead workers, so a restart resumes them within about one lease
+        while not self._stop.wait(settings.JOB_LEASE_SECONDS / 3):
+            try:
+                with self._lock:
+                    running = list(self._running)
+                self.store.heartbeat(running)
+                self.store.recover_stale(settings.JOB_LEASE_SECONDS, self.is_resumable)
+            except Exception as e:
+                logger.error(f"Job heartbeat failed: {e}")
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                job = self.store.claim()
+            except Exception as e:
+                logger.error(f"Could not claim a job: {e}")
+                job = None
+            if job is None:
+                self._wake.wait(settings.JOB_POLL_SECONDS)
+                self._wake.clear()
+                continue
+            self._run(job)
+
+    def _run(self, job: Dict[str, Any]):
+        job_id, tool_name = job["id"], job["tool_name"]
+        checkpoints = dict(job["checkpoints"])
+
+        def save(key: str, state: Dict[str, Any]) -> bool:
+            checkpoints[key] = state
+            return self.store.save_checkpoints(job_id, checkpoints)
+
+        with self._lock:
+            self._running[job_id] = time.monotonic()
+        if job["attempts"] > 1:
+            logger.info(f"Resuming job {job_id} ({tool_name}), attempt {job['attempts']}")
+        try:
+            # Jobs yield Google quota to interactive requests and are not bound by the interactive tool deadlines
+            with request_span(f"job {tool_name}", request_id=job_id, kind="INTERNAL", **{"job.id": job_id, "job.attempt": job["attempts"]}), \
+                 quota_scope(priority="bulk"), \
+                 deadline_override(settings.JOB_DEADLINE_SECONDS), \
+                 job_context(JobContext(job_id, checkpoints, save)):
+                result = self.execute(tool_name, job["args"])
+            latest = self.store.get(job_id)
+            if latest is not None and latest["cancel_requested"]:
+                status = "cancelled"
+            else:
+                status = "failed" if result.get("status") == "error" else "succeeded"
+            self.store.finish(job_id, status, result, result.get("message") if status == "failed" else None)
+        except Exception as e:
+            status = "failed"
+            logger.error(f"Job {job_id} ({tool_name}) crashed: {e}", exc_info=True)
+            self.store.finish(job_id, status, error=str(e))
+        finally:
+            with self._lock:
+                self._running.pop(job_id, None)
+        JOBS_FINISHED.inc(tool=tool_name, status=status)
+        logger.info(f"Job {job_id} ({tool_name}) {status}")
@@ -0,0 +1,392 @@
+import json
+import random
+from abc import ABC, abstractmethod
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # The SDKs are imported when a provider is built or a tool call is first made, not at app import
+    from openai.types.chat import ChatCompletionMessageToolCall
+
+from ..config import settings
+from ..utils.logger import get_logger
+from ..utils.metrics import Counter, Histogram
+from ..utils.tracing import span
+
+logger = get_logger(__name__)
+
+LLM_SECONDS = Histogram("llm_request_seconds", "LLM call latency by provider, model and operation (plan/summarize/complete).", ["provider", "model", "operation"])
+LLM_TOKENS = Counter("llm_tokens_total", "Prompt and completion tokens reported by the LLM provider.", ["provider", "model", "kind"])
+LLM_ERRORS = Counter("llm_errors_total", "Failed LLM calls by provider, model and operation.", ["provider", "model", "operation"])
+
+# Called with (index, id, name, arguments) once a streamed tool call's arguments are complete
+ToolCallCallback = Callable[[int, str, str, str], None]
+
+EMPTY_RESPONSE = "I received an empty response. Please try rephrasing your request."
+
+
+def read_usage(usage: Any, prompt_key: str, completion_key: str) -> Optional[Dict[str, int]]:
+    """Token counts from an SDK usage object or dict, as {"prompt_tokens", "completion_tokens"}."""
+    if usage is None:
+        return None
+    get = usage.get if isinstance(usage, dict) else (lambda key: getattr(usage, key, None))
+    return {"prompt_tokens": get(prompt_key) or 0, "completion_tokens": get(completion_key) or 0}
+
+
+def make_tool_call(call_id: str, name: str, arguments: str) -> "ChatCompletionMessageToolCall":
+    """Tool calls from every provider are normalized to the OpenAI SDK type the orchestrator consumes."""
+    from openai.types.chat import ChatCompletionMessageToolCall
+    from openai.types.chat.chat_completion_message_tool_call import Function
+    return ChatCompletionMessageToolCall(id=call_id, type="function", function=Function(name=name, arguments=arguments))
+
+
+class LLMProvider(ABC):
+    """One vendor/model pair. Translates the agent's two calls (plan, summarize) into the vendor's tool-calling format."""
+
+    name = ""
+
+    def __init__(self, model: str):
+        self.model = model
+
+    @property
+    def label(self) -> str:
+        return f"{self.name}:{self.model}"
+
+    @abstractmethod
+    def plan(self, system: str, user_message: str, tools: List[Dict[str, Any]], on_tool_call: Optional[ToolCallCallback] = None) -> Dict[str, Any]:
+        """Returns {"tool_calls": [...]} or {"text": ...} plus "usage" when known; streams when on_tool_call is given."""
+
+    @abstractmethod
+    def summarize(self, system: str, user_message: str, tool_calls: List["ChatCompletionMessageToolCall"], tool_results: List[Tuple[str, str]]) -> Dict[str, Any]:
+        """Returns {"text": ...} given the tool calls made and (tool_call_id, content) results."""
+
+    @abstractmethod
+    def complete(self, system: str, user_message: str) -> Dict[str, Any]:
+        """Returns {"text": ...} for a plain completion without tools."""
+
+
+class OpenAIProvider(LLMProvider):
+    name = "openai"
+
+    def __init__(self, model: str):
+        super().__init__(model)
+        from openai import OpenAI
+
+        if not settings.OPENAI_API_KEY:
+            raise ValueError("OpenAI API key is not set in environment variables.")
+        self.client = OpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL or None)
+
+    def plan(self, system, user_message, tools, on_tool_call=None):
+        messages = [{"role": "system", "content": system}, {"role": "user", "content": user_message}]
+        if on_tool_call is None:
+            response = self.client.chat.completions.create(model=self.model, messages=messages, tools=tools, tool_choice="auto")
+            message = response.choices[0].message
+            usage = read_usage(response.usage, "prompt_tokens", "completion_tokens")
+            if message.tool_calls:
+                return {"tool_calls": message.tool_calls, "usage": usage}
+            return {"text": message.content or EMPTY_RESPONSE, "usage": usage}
+
+        calls: Dict[int, Dict[str, str]] = {}
+        announced = set()
+        text = []
+        usage = None
+        stream = self.client.chat.completions.create(
+            model=self.model, messages=messages, tools=tools, tool_choice="auto", stream=True,
+            # Ask for a final usage chunk; this SDK version has no typed parameter for it
+            extra_body={"stream_options": {"include_usage": True}}
+        )
+        for chunk in stream:
+            usage = read_usage(getattr(chunk, "usage", None), "prompt_tokens", "completion_tokens") or usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                text.append(delta.content)
+            for part in delta.tool_calls or []:
+                call = calls.setdefault(part.index, {"id": "", "name": "", "arguments": ""})
+                if part.id:
+                    call["id"] = part.id
+                if part.function is not None:
+                    call["name"] += part.function.name or ""
+                    call["arguments"] += part.function.arguments or ""
+                # A JSON object only parses once its closing brace has arrived
+                if part.index not in announced and call["name"] and call["arguments"].rstrip().endswith("}"):
+                    try:
+                        json.loads(call["arguments"])
+                    except ValueError:
+                        continue
+                    announced.add(part.index)
+                    on_tool_call(part.index, call["id"], call["name"], call["arguments"])
+
+        if calls:
+            return {"tool_calls": [make_tool_call(c["id"], c["name"], c["arguments"]) for _, c in sorted(calls.items())], "usage": usage}
+        return {"text": "".join(text) or EMPTY_RESPONSE, "usage": usage}
+
+    def summarize(self, system, user_message, tool_calls, tool_results):
+        messages = [
+            {"role": "system", "content": system},
+            {"role": "user", "content": user_message},
+            {"role": "assistant", "tool_calls": [call.model_dump() for call in tool_calls]},
+        ]
+        messages += [{"role": "tool", "tool_call_id": call_id, "content": content} for call_id, content in tool_results]
+        response = self.client.chat.completions.create(model=self.model, messages=messages)
+        return {"text": response.choices[0].message.content, "usage": read_usage(response.usage, "prompt_tokens", "completion_tokens")}
+
+    def complete(self, system, user_message):
+        messages = [{"role": "system", "content": system}, {"role": "user", "content": user_message}]
+        response = self.client.chat.completions.create(model=self.model, messages=messages)
+        return {"text": response.choices[0].message.content or EMPTY_RESPONSE, "usage": read_usage(response.usage, "prompt_tokens", "completion_tokens")}
+
+
+class AnthropicProvider(LLMProvider):
+    name = "anthropic"
+
+    def __init__(self, model: str):
+        super().__init__(model)
+        from anthropic import Anthropic
+
+        if not settings.ANTHROPIC_API_KEY:
+            raise ValueError("Anthropic API key is not set in environment variables.")
+        self.client = Anthropic(api_key=settings.ANTHROPIC_API_KEY)
+
+    @staticmethod
+    def _tools(tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """OpenAI function definitions -> Anthropic tool definitions."""
+        return [
+            {
+                "name": t["function"]["name"],
+                "description": t["function"].get("description", ""),
+                "input_schema": t["function"].get("parameters") or {"type": "object", "properties": {}},
+            }
+            for t in tools
+        ]
+
+    def plan(self, system, user_message, tools, on_tool_call=None):
+        kwargs = dict(
+            model=self.model,
+            max_tokens=settings.LLM_MAX_TOKENS,
+            system=system,
+            messages=[{"role": "user", "content": user_message}],
+            tools=self._tools(tools),
+        )
+        if on_tool_call is None:
+            response = self.client.messages.create(**kwargs)
+            usage = read_usage(response.usage, "input_tokens", "output_tokens")
+            calls = [make_tool_call(b.id, b.name, json.dumps(b.input)) for b in response.content if b.type == "tool_use"]
+            if calls:
+                return {"tool_calls": calls, "usage": usage}
+            return {"text": "".join(b.text for b in response.content if b.type == "text") or EMPTY_RESPONSE, "usage": usage}
+
+        blocks: Dict[int, Dict[str, str]] = {}
+        calls = []
+        text = []
+        usage = {"prompt_tokens": 0, "completion_tokens": 0}
+        for event in self.client.messages.create(stream=True, **kwargs):
+            if event.type == "message_start":
+                usage["prompt_tokens"] = event.message.usage.input_tokens
+            elif event.type == "message_delta":
+                usage["completion_tokens"] = event.usage.output_tokens
+            elif event.type == "content_block_start" and event.content_block.type == "tool_use":
+                blocks[event.index] = {"id": event.content_block.id, "name": event.content_block.name, "arguments": ""}
+            elif event.type == "content_block_delta":
+                if event.delta.type == "input_json_delta":
+                    blocks[event.index]["arguments"] += event.delta.partial_json
+                elif event.delta.type == "text_delta":
+                    text.append(event.delta.text)
+            elif event.type == "content_block_stop" and event.index in blocks:
+                # The block is closed, so its input is complete
+                block = blocks.pop(event.index)
+                arguments = block["arguments"] or "{}"
+                on_tool_call(len(calls), block["id"], block["name"], arguments)
+                calls.append(make_tool_call(block["id"], block["name"], arguments))
+        if calls:
+            return {"tool_calls": calls, "usage": usage}
+        return {"text": "".join(text) or EMPTY_RESPONSE, "usage": usage}
+
+    def summarize(self, system, user_message, tool_calls, tool_results):
+        tool_use = [
+            {"type": "tool_use", "id": c.id, "name": c.function.name, "input": json.loads(c.function.arguments or "{}")}
+            for c in tool_calls
+        ]
+        results = [{"type": "tool_result", "tool_use_id": call_id, "content": content} for call_id, content in tool_results]
+        response = self.client.messages.create(
+            model=self.model,
+            max_tokens=settings.LLM_MAX_TOKENS,
+            system=system,
+            messages=[
+                {"role": "user", "content": user_message},
+                {"role": "assistant", "content": tool_use},
+                {"role": "user", "content": results},
+            ],
+        )
+        return {
+            "text": "".join(b.text for b in response.content if b.type == "text"),
+            "usage": read_usage(response.usage, "input_tokens", "output_tokens")
+        }
+
+    def complete(self, system, user_message):
+        response = self.client.messages.create(
+            model=self.model,
+            max_tokens=settings.LLM_MAX_TOKENS,
+            system=system,
+            messages=[{"role": "user", "content": user_message}],
+        )
+        return {
+            "text": "".join(b.text for b in response.content if b.type == "text") or EMPTY_RESPONSE,
+            "usage": read_usage(response.usage, "input_tokens", "output_tokens")
+        }
+
+
+PROVIDERS = {
+    OpenAIProvider.name: OpenAIProvider,
+    AnthropicProvider.name: AnthropicProvider,
+}
+
+
+def default_routes(primary: str = settings.LLM_PROVIDER) -> List[str]:
+    """The configured provider first, then any other provider that has an API key."""
+    if settings.LLM_ROUTES:
+        return list(settings.LLM_ROUTES)
+    available = []
+    if settings.OPENAI_API_KEY:
+        available.append(f"openai:{settings.LLM_MODEL}")
+    if settings.ANTHROPIC_API_KEY:
+        available.append(f"anthropic:{settings.ANTHROPIC_MODEL}")
+    return sorted(available, key=lambda route: not route.startswith(f"{primary.lower()}:"))
+
+
+def build_provider(route: str) -> LLMProvider:
+    name, _, model = route.partition(":")
+    if name not in PROVIDERS:
+        raise ValueError(f"Unsupported LLM provider: {name}")
+    return PROVIDERS[name](model)
+
+
+class ProviderStats:
+    """Rolling window of call latencies and outcomes for one provider/model."""
+
+    def __init__(self, window: int):
+        self.samples = deque(maxlen=window)  # (latency seconds, ok)
+        self.consecutive_errors = 0
+        self.cooldown_until = 0.0
+
+    def record(self, latency: float, ok: bool):
+        self.samples.append((latency, ok))
+        if ok:
+            self.consecutive_errors = 0
+            return
+        self.consecutive_errors += 1
+        if self.consecutive_errors >= 3:
+            self.cooldown_until = time.monotonic() + settings.LLM_ROUTER_COOLDOWN_SECONDS
+
+    def percentile(self, q: float) -> Optional[float]:
+        latencies = sorted(latency for latency, ok in self.samples if ok)
+        if not latencies:
+            return None
+        return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))], 4)
+
+    def error_rate(self) -> float:
+        return sum(1 for _, ok in self.samples if not ok) / len(self.samples) if self.samples else 0.0
+
+    def healthy(self) -> bool:
+        # A single failure should not condemn a provider; the error rate only counts once the window has data
+        if time.monotonic() < self.cooldown_until:
+            return False
+        return len(self.samples) < settings.LLM_ROUTER_MIN_SAMPLES or self.error_rate() <= settings.LLM_ROUTER_MAX_ERROR_RATE
+
+
+class LLMRouter:
+    """Sends each call to the fastest healthy provider (by rolling p50) and fails over to the next one on errors."""
+
+    def __init__(self, routes: List[str]):
+        self.providers: List[LLMProvider] = []
+        for route in routes:
+            try:
+                self.providers.append(build_provider(route))
+            except Exception as e:
+                logger.error(f"Skipping LLM route '{route}': {e}")
+        if not self.providers:
+            raise ValueError("No usable LLM provider configured. Set OPENAI_API_KEY or ANTHROPIC_API_KEY.")
+        self._stats = {p.label: ProviderStats(settings.LLM_ROUTER_WINDOW) for p in self.providers}
+        self._lock = threading.Lock()
+
+    @property
+    def primary(self) -> LLMProvider:
+        return self.providers[0]
+
+    def ordered(self) -> List[LLMProvider]:
+        with self._lock:
+            def rank(item):
+                index, provider = item
+                stats = self._stats[provider.label]
+                p50 = stats.percentile(0.5) if len(stats.samples) >= settings.LLM_ROUTER_MIN_SAMPLES else None
+                # Unhealthy providers stay in the list as a last resort; untried ones keep their configured order
+                return (not stats.healthy(), p50 if p50 is not None else float("inf"), index)
+
+            ordered = [p for _, p in sorted(enumerate(self.providers), key=rank)]
+        healthy = [p for p in ordered if self._stats[p.label].healthy()]
+        if len(healthy) > 1 and random.random() < settings.LLM_ROUTER_EXPLORE_RATE:
+            # Occasionally try a slower provider so its latency estimate does not go stale
+            explore = random.choice(healthy[1:])
+            ordered.remove(explore)
+            ordered.insert(0, explore)
+        return ordered
+
+    def call(self, operation: str, *args, on_tool_call: Optional[ToolCallCallback] = None, **kwargs) -> Dict[str, Any]:
+        """Runs provider.<operation>(*args) on providers in routing order until one succeeds.
+
+        A streamed call stops failing over once it has announced a tool call through on_tool_call:
+        the caller may already be running it, and the next provider would announce a different
+        plan under the same indices.
+        """
+        last_error = None
+        announced = False
+        if on_tool_call is not None:
+            def announce(*tool_call):
+                nonlocal announced
+                announced = True
+                on_tool_call(*tool_call)
+            kwargs["on_tool_call"] = announce
+        for provider in self.ordered():
+            started = time.monotonic()
+            try:
+                with span(f"llm.{operation}", kind="CLIENT", **{"llm.provider": provider.name, "llm.model": provider.model}) as trace_span:
+                    result = getattr(provider, operation)(*args, **kwargs)
+                    usage = result.get("usage")
+                    if usage:
+                        trace_span.set_attribute("llm.prompt_tokens", usage["prompt_tokens"])
+                        trace_span.set_attribute("llm.completion_tokens", usage["completion_tokens"])
+            except Exception as e:
+                with self._lock:
+                    self._stats[provider.label].record(time.monotonic() - started, ok=False)
+                LLM_ERRORS.inc(provider=provider.name, model=provider.model, operation=operation)
+                if announced:
+                    logger.error(f"{operation} failed on {provider.label} after announcing tool calls: {e}; not failing over")
+                    raise
+                logger.error(f"{operation} failed on {provider.label}: {e}; failing over")
+                last_error = e
+                continue
+            elapsed = time.monotonic() - started
+            with self._lock:
+                self._stats[provider.label].record(elapsed, ok=True)
+            LLM_SECONDS.observe(elapsed, provider=provider.name, model=provider.model, operation=operation)
+            if usage:
+                LLM_TOKENS.inc(usage["prompt_tokens"], provider=provider.name, model=provider.model, kind="prompt")
+                LLM_TOKENS.inc(usage["completion_tokens"], provider=provider.name, model=provider.model, kind="completion")
+            return result
+        raise last_error
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                label: {
+                    "samples": len(stats.samples),
+                    "p50_seconds": stats.percentile(0.5),
+                    "p95_seconds": stats.percentile(0.95),
+                    "error_rate": round(stats.error_rate(), 4),
+                    "healthy": stats.healthy(),
+                }
+                for label, stats in self._stats.items()
+            }
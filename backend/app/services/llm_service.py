@@ -1,110 +1,89 @@
 import json
-from typing import Any,Dict,List
-from openai import OpenAI
+from typing import Any,Callable,Dict,List
 from ..config import settings
 from ..utils.logger import get_logger
+from .output_compactor import OutputCompactor
+from .llm_providers import LLMRouter, default_routes
 
 logger = get_logger(__name__)
 
+PLANNING_SYSTEM_PROMPT = "You are an expert assistant for Google Workspace. Your goal is to use the available tools (Gmail, Calendar, Docs, Sheets, Forms) to fulfill the user's request. If a tool is necessary, ONLY respond with a tool call. If not, respond directly."
+# Appended to the planning prompt when multi-step plans are enabled
+MULTI_STEP_HINT = "When later tool calls need the output of earlier ones (e.g. read a sheet, then email each row), call execute_plan once with the whole plan instead of calling the tools directly."
+REPLAN_SYSTEM_PROMPT = "You are repairing a multi-step Google Workspace plan. Some steps failed or were skipped. Call execute_plan with only the steps still needed to reach the user's goal, referencing completed steps by id, or respond with text if the goal cannot be reached."
+JUDGE_SYSTEM_PROMPT = "You are one step of an automated Google Workspace plan. Answer the request below directly and concisely, with only the requested content and no preamble."
+SUMMARY_SYSTEM_PROMPT = "You have just executed one or more Google Workspace actions. Your final response must clearly and concisely summarize the outcome of the action(s) for the user, drawing directly from the provided tool output results."
+
 class LLMService:
     def __init__(self,provider:str=settings.LLM_PROVIDER):
-        self.provider = provider.lower()
-        self.model = settings.LLM_MODEL
-        self.client = None 
-
-        if self.provider == "openai":
-            if not settings.OPENAI_API_KEY:
-                raise ValueError("OpenAI API key is not set in environment variables.")
-            self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        else:
-            raise ValueError(f"Unsupported LLM provider: {self.provider}")
+        # Every call goes through the router, which picks the fastest healthy provider/model and fails over on errors
+        self.router = LLMRouter(default_routes(provider))
+        self.provider = self.router.primary.name
+        self.model = self.router.primary.model
         
         # Placeholder for MCP Service instance to resolve potential circular dependency
         self.mcp_service = None 
+        self.compactor = OutputCompactor()
+        self.planning_prompt = f"{PLANNING_SYSTEM_PROMPT} {MULTI_STEP_HINT}" if settings.AGENT_MULTI_STEP else PLANNING_SYSTEM_PROMPT
 
-    def _format_messages(self,user_message:str,tool_outputs:List[Dict[str,Any]] |None = None)->List[Dict[str,str]]:
-        # This method seems unused based on the original structure, but kept for future refactoring.
-        messages = [{"role":"user","content":user_message}]
-        if tool_outputs:
-            for output in tool_outputs:
-                if self.provider == "openai":
-                    messages.append({
-                        "role":"tool",
-                        "tool_call_id":output["tool_call_id"],
-                        "content":json.dumps(output["output"])
-                    })
-        return messages
-    
     # Tool: get_chat_completion
     def get_chat_completion(self,user_message:str,tools:List[Dict[str,Any]]) ->Dict[str,Any]:
         """Performs the initial chat completion to determine if a tool call is necessary."""
-        messages = [
-            {"role": "system", "content": "You are an expert assistant for Google Workspace. Your goal is to use the available tools (Gmail, Calendar, Docs, Sheets, Forms) to fulfill the user's request. If a tool is necessary, ONLY respond with a tool call. If not, respond directly."},
-            {"role":"user","content":user_message}
-        ]
         try:
-            if self.provider == "openai":
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    tools=tools,
-                    tool_choice="auto"
-                )
-                
-                # Check for tool calls
-                if response.choices[0].message.tool_calls:
-                    return {"tool_calls": response.choices[0].message.tool_calls}
-                
-                # Check for direct text response
-                elif response.choices[0].message.content:
-                    return {"text": response.choices[0].message.content}
-                else:
-                    return {"text": "I received an empty response. Please try rephrasing your request."}
-            # Add other provider logic here (e.g., Anthropic)
-            else:
-                return {"text": f"Unsupported provider {self.provider} for chat completion."}
-        
+            return self.router.call("plan", self.planning_prompt, user_message, tools)
         except Exception as e:
             logger.error(f"Error getting initial chat completion: {e}")
             raise
     
+    # Tool: stream_chat_completion
+    def stream_chat_completion(self,user_message:str,tools:List[Dict[str,Any]],on_tool_call:Callable[[int,str,str,str],None]) ->Dict[str,Any]:
+        """Streaming variant of get_chat_completion.
+
+        Calls on_tool_call(index, id, name, arguments) as soon as a tool call's arguments are complete,
+        while the rest of the response is still streaming. Returns the same shape as get_chat_completion.
+        """
+        try:
+            return self.router.call("plan", self.planning_prompt, user_message, tools, on_tool_call=on_tool_call)
+        except Exception as e:
+            logger.error(f"Error streaming initial chat completion: {e}")
+            raise
+
     # Tool: get_final_response_with_tool_outputs
     def get_final_response_with_tool_outputs(self,user_message:str,tool_calls:List[Any],tool_outputs:List[Dict[str,Any]]) ->Dict[str,Any]:
         """Performs the second chat completion with tool results to generate a final, human-readable response."""
-        
-        messages = [
-            {"role": "system", "content": "You have just executed one or more Google Workspace actions. Your final response must clearly and concisely summarize the outcome of the action(s) for the user, drawing directly from the provided tool output results."},
-            {"role":"user","content":user_message}
+        # Tool results are shrunk to fit TOOL_OUTPUT_TOKEN_BUDGET
+        compacted, _ = self.compactor.compact([output["output"] for output in tool_outputs])
+        tool_results = [
+            (output["tool_call_id"], json.dumps(content, default=str))
+            for output, content in zip(tool_outputs, compacted)
         ]
-        
-        if self.provider == "openai":
-            # 1. Add the assistant's original tool call
-            messages.append({
-                "role":"assistant",
-                "tool_calls":[call for call in tool_calls]
-            })
-            
-            # 2. Add the tool results
-            for output in tool_outputs:
-                messages.append({ # Fix: messages.appened changed to messages.append
-                    "role":"tool",
-                    "tool_call_id":output["tool_call_id"],
-                    "content":json.dumps(output["output"])
-                })
-        
         try:
-            if self.provider == "openai":
-                # Removed tools and tool_choice as the model's job is now only to summarize the output
-                response = self.client.chat.completions.create(
-                    model = self.model,
-                    messages = messages,
-                )
-                return {"text":response.choices[0].message.content}
-            # Add other provider logic here
-            
+            return self.router.call("summarize", SUMMARY_SYSTEM_PROMPT, user_message, tool_calls, tool_results)
         except Exception as e:
             logger.error(f"Error getting final chat completion: {e}")
             raise
+
+    # Tool: replan
+    def replan(self,context:str,tools:List[Dict[str,Any]]) ->Dict[str,Any]:
+        """Asks for the remaining steps of a multi-step plan after some of its steps failed."""
+        try:
+            return self.router.call("plan", REPLAN_SYSTEM_PROMPT, context, tools)
+        except Exception as e:
+            logger.error(f"Error re-planning: {e}")
+            raise
+
+    # Tool: judge
+    def judge(self,prompt:str) ->Dict[str,Any]:
+        """Answers one "ask" step of a plan with plain text, e.g. drafting an email body from earlier results."""
+        try:
+            return self.router.call("complete", JUDGE_SYSTEM_PROMPT, prompt)
+        except Exception as e:
+            logger.error(f"Error answering plan step: {e}")
+            raise
+
+    def get_provider_status(self)->Dict[str,Any]:
+        """Rolling p50/p95 latency, error rate and health per provider/model."""
+        return self.router.status()
             
     def set_tool_definitions(self, tool_defs: List[Dict[str, Any]]):
         """Temporary method to resolve circular dependency for final call. (Kept for compatibility)"""
@@ -1,5 +1,8 @@
-import json
-from typing import Dict,Any,List
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict,Any,List,Tuple
 
 from ..mcp_servers.gmail_server import GmailMCPServer
 from ..mcp_servers.gdocs_server import GDocsMCPServer 
@@ -8,13 +11,51 @@ from ..mcp_servers.gsheets_server import GSheetsMCPServer
 from ..mcp_servers.gforms_server import GFormsMCPServer
 
 from ..config import settings
+from ..mcp_servers.resilience import tool_deadline, circuit_status
+from ..mcp_servers.quota import current_priority, scheduler
 from ..utils.logger import get_logger
+from ..utils.metrics import Counter, Histogram
+from ..utils.tracing import span
+from .tool_registry import ToolRegistry
+from .mcp_worker_pool import MCPWorkerPool
+from .tool_cache import build_tool_cache, canonical_args
+from .job_queue import CHECKPOINTED_TOOLS, JobQueue, JobStore
+from .pipeline import PipelineMCPServer
+from ..mcp_servers.checkpoint import current_job_id
 
 logger = get_logger(__name__)
 
+TOOL_SECONDS = Histogram("tool_execution_seconds", "Tool execution latency, excluding cache hits.", ["tool"])
+TOOL_CALLS = Counter("tool_calls_total", "Tool calls by outcome status (success, error, ...).", ["tool", "status"])
+TOOL_CACHE = Counter("tool_cache_requests_total", "Read-tool result cache lookups by result (hit, miss).", ["tool", "result"])
+
+# Tools that only read from Google, so running one speculatively or twice has no side effects
+READ_ONLY_TOOLS = frozenset({
+    "gmail_read_emails",
+    "calendar_list_events",
+    "gdocs_read_document",
+    "gsheet_read_sheet",
+    "gsheet_query",
+    "gforms_read_form",
+})
+
+# Tools that only read from Google but update local state (the form response store), so they are
+# never run speculatively, but running one again after an interruption is harmless
+RERUNNABLE_TOOLS = frozenset({
+    "gforms_get_responses",
+})
+
+# Reads of named documents remembered so the prefetcher can warm what the user touched recently
+RECENT_READ_TOOLS = frozenset({
+    "gdocs_read_document",
+    "gsheet_read_sheet",
+    "gsheet_query",
+    "gforms_read_form",
+})
+RECENT_READS_KEPT = 50
+
 class MCPService:
     def __init__(self):
-        self._tool_definitions= self._tool_definitions()
         self._mcp_servers = {
             "gmail":GmailMCPServer(),
             "gdocs":GDocsMCPServer(),
@@ -23,40 +64,160 @@ class MCPService:
             "gforms":GFormsMCPServer()
 
         }
+        # Pipelines always run in this process and reach other tools through execute_tool
+        self._pipeline = PipelineMCPServer(self._mcp_servers, self._execute_nested)
+        # Resolve every configured tool to its method once; raises ToolRegistryError on drift
+        servers = {type(s).__name__: s for s in self._mcp_servers.values()}
+        self._registry = ToolRegistry.load({**servers, type(self._pipeline).__name__: self._pipeline})
+        self._tool_definitions = self._registry.definitions()
+        self._worker_pool = None
+        if settings.MCP_SERVER_MODE == "subprocess":
+            self._worker_pool = MCPWorkerPool(list(servers))
+            self._worker_pool.start()
+        self._cache = build_tool_cache() if settings.TOOL_CACHE_ENABLED else None
+        self._recent_reads: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._recent_lock = threading.Lock()
+        self._jobs = None
+        if settings.JOBS_ENABLED:
+            self._jobs = JobQueue(JobStore(), self.execute_tool, self.is_resumable)
+            self._jobs.start()
 
-    def _tool_definitions(self)->List[Dict[str,Any]]:
-        """Load tool definitions from JSON file."""
-        try:
-            with open(settings.TOOL_DEFINITION_PATH,'r') as f:
-                data = json.load(f)
-                return data.get("tools",[])
-        except FileNotFoundError:
-            logger.error(f"Tool definition file not found at {settings.TOOL_DEFINITION_PATH}")
-            return []
-        except json.JSONDecodeError as e:
-            logger.error(f"Error decoding JSON from tool definition file: {e}")
-            return []
     def get_tool_definitions(self)->List[Dict[str,Any]]:
         return self._tool_definitions
-    def execute_tool(self,tool_name:str,args:Dict[str,Any])->Dict[str,Any]:
+
+    def is_read_only(self,tool_name:str)->bool:
+        return tool_name in READ_ONLY_TOOLS
+
+    def is_resumable(self,tool_name:str)->bool:
+        """Whether an interrupted background run of the tool can safely be run again."""
+        if tool_name in READ_ONLY_TOOLS or tool_name in RERUNNABLE_TOOLS:
+            return True
+        # Checkpoints are bound to the job in this process; a call sent to a worker process never saves
+        # any, so re-running it would repeat every chunk (appends included) from the start
+        tool = self._registry.get(tool_name)
+        return tool_name in CHECKPOINTED_TOOLS and tool is not None and self._runs_in_process(tool)
+
+    def _runs_in_process(self,tool)->bool:
+        return self._worker_pool is None or tool.server_name == type(self._pipeline).__name__
+    def execute_tool(self,tool_name:str,args:Dict[str,Any],allow_background:bool=True)->Dict[str,Any]:
+        with span(f"tool.{tool_name}", **{"tool.name": tool_name}) as trace_span:
+            result = self._execute_tool(tool_name, args, trace_span, allow_background)
+            trace_span.set_attribute("tool.status", str(result.get("status", "unknown")))
+            if result.get("status") == "error":
+                trace_span.record_error(RuntimeError(result.get("message", "")))
+            # Bulk reads (jobs, prefetches) are not what the user is looking at
+            elif tool_name in RECENT_READ_TOOLS and result.get("status") == "success" and current_priority() == "interactive":
+                self._remember_read(tool_name, args)
+            return result
+
+    def _remember_read(self,tool_name:str,args:Dict[str,Any]):
+        key = (tool_name, canonical_args(args))
+        with self._recent_lock:
+            self._recent_reads.pop(key, None)
+            self._recent_reads[key] = args
+            while len(self._recent_reads) > RECENT_READS_KEPT:
+                self._recent_reads.popitem(last=False)
+
+    def recent_reads(self,limit:int)->List[Tuple[str,Dict[str,Any]]]:
+        """The most recent distinct document reads made by users, newest first, as (tool name, args)."""
+        with self._recent_lock:
+            return [(tool_name, dict(args)) for (tool_name, _), args in reversed(self._recent_reads.items())][:limit]
+
+    def warm_services(self)->Dict[str,str]:
+        """Loads the token and builds every server's Google service object ahead of the first tool call."""
+        if self._worker_pool is not None:
+            # Worker processes build their own services; the first prefetched read warms each of them
+            return {"mode": "subprocess"}
+        warmed = {}
+        for name, server in self._mcp_servers.items():
+            try:
+                server._get_service()
+                warmed[name] = "ok"
+            except Exception as e:
+                logger.warning(f"Could not warm the {name} service: {e}")
+                warmed[name] = f"error: {e}"
+        return warmed
+
+    def _execute_nested(self,tool_name:str,args:Dict[str,Any])->Dict[str,Any]:
+        # A pipeline waits for each call it makes, so those calls must never be deferred to a job
+        return self.execute_tool(tool_name, args, allow_background=False)
+
+    def _execute_tool(self,tool_name:str,args:Dict[str,Any],trace_span,allow_background:bool=True)->Dict[str,Any]:
        
+        # Unknown names are not used as label values so a confused model cannot grow the metric set
+        label = tool_name if self._registry.get(tool_name) is not None else "unknown"
         try:
-           parts = tool_name.split("_",1)
-           if len(parts) <2:
-               raise ValueError("Invalid tool name format.")
-           server_name,action = parts
-           server = self._mcp_servers.get(server_name)
-           if not server:
-               raise ValueError(f"No MCP server found for {server_name}")
-           
-           #get the function/method on the server object
-           tool_function = getattr(server,action,None)
-           if not tool_function:
-               raise ValueError(f"No action '{action}' found on server '{server_name}'")
-           result = tool_function(**args)
-           logger.info(f"Executed tool {tool_name} with args {args}, result: {result}")
+           tool = self._registry.get(tool_name)
+           if tool is None:
+               raise ValueError(f"Unknown tool '{tool_name}'")
+           args = tool.validate(args)
+           # Long calls become background jobs; the job itself runs with current_job_id() set and lands below
+           if allow_background and self._jobs is not None and current_job_id() is None and self._jobs.should_defer(tool_name, args):
+               job = self._jobs.submit(tool_name, args)
+               trace_span.set_attribute("tool.job_id", job["id"])
+               return {
+                   "status": "accepted",
+                   "message": f"{tool_name} is running in the background as job {job['id']}. Progress: {settings.API_V1_STR}/jobs/{job['id']}",
+                   "details": {"job_id": job["id"], "job_status": job["status"]}
+               }
+           since = None
+           if self._cache is not None and self._cache.is_cacheable(tool_name):
+               cached = self._cache.get(tool_name, args)
+               if cached is not None:
+                   TOOL_CACHE.inc(tool=label, result="hit")
+                   trace_span.set_attribute("tool.cache_hit", True)
+                   logger.info(f"Served tool {tool_name} from cache")
+                   return cached
+               TOOL_CACHE.inc(tool=label, result="miss")
+               since = self._cache.begin_read()
+           started = time.perf_counter()
+           try:
+               if not self._runs_in_process(tool):
+                   result = self._worker_pool.call(tool.server_name, tool_name, args)
+               else:
+                   with tool_deadline(tool_name):
+                       result = tool.function(**args)
+           finally:
+               # A failed write may still have been applied, so evict before anyone reads it back
+               if self._cache is not None:
+                   self._cache.invalidate_for(tool_name, args)
+               TOOL_SECONDS.observe(time.perf_counter() - started, tool=label)
+           TOOL_CALLS.inc(tool=label, status=str(result.get("status", "unknown")))
+           if self._cache is not None:
+               self._cache.put(tool_name, args, result, since)
+           # Results can be megabytes; the payload is only rendered when DEBUG is on, and truncated even then
+           logger.info(f"Executed tool {tool_name}: {result.get('status')}", extra={"tool": tool_name, "tool_args": args})
+           if logger.isEnabledFor(logging.DEBUG):
+               logger.debug(f"Tool {tool_name} result", extra={"tool": tool_name, "result": result})
            return result
         except Exception as e:
+            TOOL_CALLS.inc(tool=label, status="error")
             logger.error(f"Failed to execute tool '{tool_name}': {e}", exc_info=True)
             return {"status": "error", "message": f"Tool execution failed: {str(e)}"}
-            
\ No newline at end of file
+
+    def get_worker_status(self)->Dict[str,Any]:
+        """Per-server worker process health when running in subprocess mode."""
+        if self._worker_pool is None:
+            return {"mode": settings.MCP_SERVER_MODE}
+        return {"mode": settings.MCP_SERVER_MODE, "servers": self._worker_pool.status()}
+
+    def get_circuit_status(self)->Dict[str,Any]:
+        """Circuit breaker state per Google API (in-process mode; worker processes keep their own)."""
+        return circuit_status()
+
+    def get_quota_status(self)->Dict[str,Any]:
+        """Queue depth, grants and wait times per Google API quota (in-process mode; worker processes keep their own)."""
+        return scheduler.status()
+
+    def get_cache_stats(self)->Dict[str,Any]:
+        """Per-tool hit/miss counts and hit rates of the read-tool result cache."""
+        if self._cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self._cache.stats()}
+
+    def close(self):
+        if self._jobs is not None:
+            self._jobs.stop()
+        if self._worker_pool is not None:
+            self._worker_pool.stop()
+            self._worker_pool = None
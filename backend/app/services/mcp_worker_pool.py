@@ -0,0 +1,222 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+from ..config import settings, BASE_DIR
+from ..mcp_servers.quota import PRIORITY_ARG, current_priority
+from ..mcp_servers.resilience import deadline_for
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class WorkerUnavailableError(Exception):
+    """Raised when no healthy worker process could serve a tool call."""
+
+
+class _Worker:
+    """One MCP server process plus the client session talking to it over stdio."""
+
+    def __init__(self, server_name: str, index: int):
+        self.server_name = server_name
+        self.index = index
+        self.session = None
+        self.healthy = False
+        self.restarts = -1
+        self.calls = 0
+        self.started_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._ready: Optional[asyncio.Event] = None
+        self._stop: Optional[asyncio.Event] = None
+
+    def _params(self):
+        from mcp.client.stdio import StdioServerParameters
+
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(BASE_DIR), env.get("PYTHONPATH")]))
+        return StdioServerParameters(
+            command=sys.executable,
+            args=["-m", "app.mcp_servers.mcp_host", self.server_name],
+            env=env
+        )
+
+    async def _run(self):
+        from mcp import ClientSession
+        from mcp.client.stdio import stdio_client
+
+        try:
+            async with stdio_client(self._params()) as (read_stream, write_stream):
+                async with ClientSession(read_stream, write_stream) as session:
+                    await session.initialize()
+                    self.session = session
+                    self.healthy = True
+                    self._ready.set()
+                    await self._stop.wait()
+        except Exception as e:
+            logger.error(f"MCP worker {self.server_name}#{self.index} exited: {e}")
+        finally:
+            self.healthy = False
+            self.session = None
+            self._ready.set()
+
+    async def start(self):
+        self._ready, self._stop = asyncio.Event(), asyncio.Event()
+        self.restarts += 1
+        self.started_at = time.monotonic()
+        self._task = asyncio.create_task(self._run())
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=settings.MCP_WORKER_START_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            logger.error(f"MCP worker {self.server_name}#{self.index} did not start in time")
+        if not self.healthy:
+            await self.stop()
+
+    async def stop(self):
+        if self._stop is not None:
+            self._stop.set()
+        if self._task is not None and not self._task.done():
+            # Cancelling the transport kills the process if it does not exit on stdin close
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self.healthy = False
+        self.session = None
+
+    async def restart(self):
+        await self.stop()
+        await self.start()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "index": self.index,
+            "healthy": self.healthy,
+            "restarts": max(self.restarts, 0),
+            "calls": self.calls,
+            "uptime_seconds": round(time.monotonic() - self.started_at, 1) if self.started_at and self.healthy else 0
+        }
+
+
+class MCPWorkerPool:
+    """Pools of out-of-process MCP servers, driven from a private event loop thread.
+
+    Each server class gets its own set of worker processes; a call borrows an idle worker, so
+    one slow Google API call never blocks other servers or the FastAPI workers. Hung or dead
+    workers are restarted, and idle workers are pinged periodically.
+    """
+
+    def __init__(self, server_names: List[str]):
+        self.server_names = server_names
+        self._workers: Dict[str, List[_Worker]] = {}
+        self._idle: Dict[str, asyncio.Queue] = {}
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="mcp-worker-pool", daemon=True)
+        self._health_task: Optional[asyncio.Future] = None
+
+    def _worker_count(self, server_name: str) -> int:
+        return max(1, settings.MCP_SERVER_WORKERS.get(server_name, settings.MCP_WORKERS_PER_SERVER))
+
+    def _submit(self, coro, timeout: Optional[float] = None):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    def start(self):
+        self._thread.start()
+        self._submit(self._start_all())
+        self._health_task = asyncio.run_coroutine_threadsafe(self._health_loop(), self._loop)
+
+    async def _start_all(self):
+        for name in self.server_names:
+            workers = [_Worker(name, i) for i in range(self._worker_count(name))]
+            self._workers[name] = workers
+            self._idle[name] = asyncio.Queue()
+            await asyncio.gather(*(w.start() for w in workers))
+            for w in workers:
+                self._idle[name].put_nowait(w)
+            healthy = sum(w.healthy for w in workers)
+            logger.info(f"Started {healthy}/{len(workers)} MCP worker process(es) for {name}")
+
+    async def _call(self, server_name: str, tool_name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+        idle = self._idle.get(server_name)
+        if idle is None:
+            raise WorkerUnavailableError(f"No worker pool for server '{server_name}'")
+        worker = await idle.get()
+        try:
+            if not worker.healthy:
+                await worker.restart()
+                if not worker.healthy:
+                    raise WorkerUnavailableError(f"MCP worker for {server_name} could not be restarted")
+            worker.calls += 1
+            # The tool's own deadline fires first; this only catches a worker that stopped responding
+            timeout = max(settings.MCP_TOOL_CALL_TIMEOUT_SECONDS, deadline_for(tool_name) + 5)
+            try:
+                result = await asyncio.wait_for(
+                    worker.session.call_tool(tool_name, args),
+                    timeout=timeout
+                )
+            except asyncio.TimeoutError:
+                # A hung Google call would keep this process busy forever; replace it
+                logger.error(f"{tool_name} timed out on {server_name}#{worker.index}; restarting worker")
+                await worker.restart()
+                return {"status": "error", "message": f"Tool '{tool_name}' timed out after {timeout}s."}
+            except Exception as e:
+                logger.error(f"{tool_name} failed on {server_name}#{worker.index}: {e!r}; restarting worker")
+                await worker.restart()
+                raise WorkerUnavailableError(f"MCP worker for {server_name} crashed: {e!r}")
+
+            text = "".join(c.text for c in result.content if getattr(c, "type", None) == "text")
+            if result.isError:
+                return {"status": "error", "message": text}
+            return json.loads(text)
+        finally:
+            idle.put_nowait(worker)
+
+    def call(self, server_name: str, tool_name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Runs a tool on an idle worker of its server; blocks the calling thread until it finishes."""
+        # The pool enforces the tool timeout itself; the margin covers queueing and a restart
+        timeout = max(settings.MCP_TOOL_CALL_TIMEOUT_SECONDS, deadline_for(tool_name) + 5)
+        # The pool's event loop does not share the caller's context, so the quota priority travels with the call
+        args = {**args, PRIORITY_ARG: current_priority()}
+        return self._submit(self._call(server_name, tool_name, args), timeout=timeout * 3)
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(settings.MCP_HEALTH_CHECK_INTERVAL_SECONDS)
+            for name, idle in self._idle.items():
+                # Only idle workers are pinged; busy ones are covered by the call timeout
+                for _ in range(idle.qsize()):
+                    worker = idle.get_nowait()
+                    try:
+                        if worker.healthy:
+                            await asyncio.wait_for(worker.session.send_ping(), timeout=5)
+                        else:
+                            await worker.restart()
+                    except Exception as e:
+                        logger.error(f"Health check failed for {name}#{worker.index}: {e}; restarting worker")
+                        await worker.restart()
+                    finally:
+                        idle.put_nowait(worker)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            name: {
+                "idle": self._idle[name].qsize(),
+                "workers": [w.status() for w in workers]
+            }
+            for name, workers in self._workers.items()
+        }
+
+    def stop(self):
+        async def _stop_all():
+            if self._health_task is not None:
+                self._health_task.cancel()
+            for workers in self._workers.values():
+                await asyncio.gather(*(w.stop() for w in workers))
+        try:
+            self._submit(_stop_all(), timeout=30)
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
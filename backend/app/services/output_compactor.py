@@ -0,0 +1,170 @@
+import json
+from typing import Dict, Any, List, Tuple
+
+from ..config import settings
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Rough OpenAI tokenizer ratio for JSON-heavy English text; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+# Successively tighter (max list items, max string chars) passes, tried until an output fits its budget
+SHRINK_LEVELS: List[Tuple[int, int]] = [(50, 2000), (20, 500), (10, 200), (5, 80), (3, 40)]
+
+
+def to_json(value: Any) -> str:
+    return json.dumps(value, default=str, separators=(",", ":"))
+
+
+def estimate_tokens(value: Any) -> int:
+    text = value if isinstance(value, str) else to_json(value)
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def allocate_budget(sizes: List[int], budget: int, floor: int) -> List[int]:
+    """Splits `budget` across outputs so small ones keep everything and the rest share what is left evenly."""
+    shares = [0] * len(sizes)
+    remaining = budget
+    pending = sorted(range(len(sizes)), key=lambda i: sizes[i])
+    while pending:
+        share = max(floor, remaining // len(pending))
+        if sizes[pending[0]] <= share:
+            i = pending.pop(0)
+            shares[i] = sizes[i]
+            remaining -= sizes[i]
+            continue
+        for i in pending:
+            shares[i] = share
+        break
+    return shares
+
+
+def sample_indices(total: int, keep: int, pinned: int = 0) -> List[int]:
+    """Keeps the first `pinned` items, then spreads the rest evenly over the list including its last item."""
+    if total <= keep:
+        return list(range(total))
+    picks = list(range(pinned))
+    span, slots = total - pinned, keep - pinned
+    if slots == 1:
+        return picks + [total - 1]
+    picks += sorted({pinned + round(i * (span - 1) / (slots - 1)) for i in range(slots)})
+    return picks
+
+
+def _is_table(value: List[Any]) -> bool:
+    return len(value) >= 2 and all(isinstance(row, list) for row in value) and all(isinstance(c, str) for c in value[0])
+
+
+def _is_records(value: List[Any]) -> bool:
+    if len(value) < 3 or not all(isinstance(item, dict) for item in value):
+        return False
+    keys = list(value[0])
+    return bool(keys) and all(list(item) == keys for item in value)
+
+
+def _to_number(cell: Any):
+    if isinstance(cell, bool):
+        return None
+    if isinstance(cell, (int, float)):
+        return cell
+    try:
+        return float(str(cell).replace(",", ""))
+    except ValueError:
+        return None
+
+
+def table_schema(rows: List[List[Any]]) -> Dict[str, Any]:
+    """Column names plus min/max/mean of numeric columns, computed over every row before sampling."""
+    header, body = rows[0], rows[1:]
+    numeric = {}
+    for index, column in enumerate(header):
+        numbers = [_to_number(row[index]) for row in body if index < len(row) and row[index] not in ("", None)]
+        if numbers and all(n is not None for n in numbers):
+            numeric[column] = {"min": min(numbers), "max": max(numbers), "mean": round(sum(numbers) / len(numbers), 4)}
+    return {"rows": len(body), "columns": header, "numeric": numeric}
+
+
+class CompactionReport:
+    """Collects what was dropped, aggregated per JSON path so list items do not repeat the same note."""
+
+    def __init__(self):
+        self.truncated: Dict[str, int] = {}
+        self.sampled: Dict[str, Tuple[int, int]] = {}
+        self.collapsed: Dict[str, int] = {}
+        self.schemas: Dict[str, Any] = {}
+
+    def notes(self) -> List[str]:
+        notes = [f"{path}: kept {kept} of {total} items (evenly sampled)" for path, (kept, total) in self.sampled.items()]
+        notes += [f"{path}: {count} record(s) collapsed into columns/rows" for path, count in self.collapsed.items()]
+        notes += [f"{path}: {count} long string(s) truncated" for path, count in self.truncated.items()]
+        return notes
+
+
+class OutputCompactor:
+    """Shrinks tool outputs to fit a token budget before they are sent to the summary LLM call."""
+
+    def __init__(self, budget_tokens: int = settings.TOOL_OUTPUT_TOKEN_BUDGET, min_tokens_per_output: int = settings.TOOL_OUTPUT_MIN_TOKENS):
+        self.budget_tokens = budget_tokens
+        self.min_tokens_per_output = min_tokens_per_output
+
+    def _shrink(self, value: Any, path: str, max_items: int, max_chars: int, report: CompactionReport) -> Any:
+        if isinstance(value, str):
+            if len(value) <= max_chars:
+                return value
+            report.truncated[path] = report.truncated.get(path, 0) + 1
+            return f"{value[:max_chars]}…[+{len(value) - max_chars} chars]"
+        if isinstance(value, dict):
+            return {k: self._shrink(v, f"{path}.{k}" if path else k, max_items, max_chars, report) for k, v in value.items()}
+        if not isinstance(value, list):
+            return value
+
+        pinned = 0
+        if _is_records(value):
+            # Same-shape records repeat every key; a header row plus value rows says the same for less
+            report.collapsed[path] = len(value)
+            keys = list(value[0])
+            value = [keys] + [[item[k] for k in keys] for item in value]
+        if _is_table(value):
+            report.schemas[path] = table_schema(value)
+            pinned = 1
+        if len(value) > max_items:
+            report.sampled[path] = (max_items - pinned, len(value) - pinned)
+            value = [value[i] for i in sample_indices(len(value), max_items, pinned)]
+        return [self._shrink(item, f"{path}[]", max_items, max_chars, report) for item in value]
+
+    def compact_output(self, output: Any, budget: int) -> Tuple[Any, Dict[str, Any]]:
+        original = estimate_tokens(output)
+        if original <= budget:
+            return output, {}
+        for max_items, max_chars in SHRINK_LEVELS:
+            report = CompactionReport()
+            compacted = self._shrink(output, "", max_items, max_chars, report)
+            tokens = estimate_tokens(compacted)
+            if tokens <= budget:
+                break
+        summary = {
+            "original_tokens": original,
+            "tokens": tokens,
+            "over_budget": tokens > budget,
+            "dropped": report.notes(),
+        }
+        if report.schemas:
+            summary["schemas"] = report.schemas
+        return compacted, summary
+
+    def compact(self, outputs: List[Any]) -> Tuple[List[Any], List[Dict[str, Any]]]:
+        """Returns the compacted outputs and, per output, a record of what was dropped (empty if untouched)."""
+        sizes = [estimate_tokens(output) for output in outputs]
+        budgets = allocate_budget(sizes, self.budget_tokens, self.min_tokens_per_output)
+        compacted, reports = [], []
+        for output, budget in zip(outputs, budgets):
+            result, report = self.compact_output(output, budget)
+            if report:
+                # The model sees the note too, so it can say the data was sampled instead of presenting it as complete
+                result = {**result, "_compaction": report} if isinstance(result, dict) else {"value": result, "_compaction": report}
+            compacted.append(result)
+            reports.append(report)
+        if any(reports):
+            logger.info(f"Compacted tool outputs from {sum(sizes)} to ~{sum(estimate_tokens(c) for c in compacted)} tokens")
+        return compacted, reports
@@ -0,0 +1,334 @@
+"""Server-side data pipelines: source -> steps -> sink without routing the data through the LLM.
+
+The model calls pipeline_run with a declarative spec; records flow through generators, so at most
+one source page and one sink batch are in memory at a time, and only a short summary goes back.
+
+    {"source": {"tool": "gforms_get_responses", "args": {"form_id": "..."}},
+     "steps": [{"filter": {"field": "Score", "op": ">=", "value": 8}}, {"select": ["Name", "Email"]}],
+     "sink": {"tool": "gsheet_update_sheet", "args": {"spreadsheet_id": "...", "range": "Sheet1!A1"}}}
+
+Sink calls go through MCPService.execute_tool, so they are validated, traced, metered and
+invalidate cached reads like any other tool call. Inside a background job, the keys of the records
+each finished sink call covered (form response ID or sheet row number) are checkpointed, and those
+records are skipped when the job resumes, wherever they now fall in the source.
+"""
+import hashlib
+import json
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ..config import settings
+from ..mcp_servers.checkpoint import checkpoint_scope, progress
+from ..mcp_servers.gsheets_writer import block_range, index_to_column, parse_range_start
+from ..mcp_servers.resilience import execute_request
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+Record = Dict[str, Any]
+# A record with the stable source key it is checkpointed under
+Keyed = Tuple[str, Record]
+ToolExecutor = Callable[[str, Dict[str, Any]], Dict[str, Any]]
+
+
+class PipelineError(ValueError):
+    """Raised for an invalid pipeline spec or an oversized run, before anything is written."""
+
+
+# --- Sources -------------------------------------------------------------------------------------
+
+def _sheet_records(sheets_server: Any, args: Dict[str, Any], header: bool = True) -> Iterator[Keyed]:
+    """Reads a sheet range in row pages, keyed by row number; the first row names the fields unless header is false."""
+    spreadsheet_id, a1_range = args["spreadsheet_id"], args["range"]
+    prefix, col, row = parse_range_start(a1_range)
+    width = settings.PIPELINE_SHEET_MAX_COLUMNS
+    page_rows = settings.PIPELINE_PAGE_ROWS
+    service = sheets_server._get_service()
+    names: Optional[List[str]] = None
+    while True:
+        page = execute_request(service.spreadsheets().values().get(
+            spreadsheetId=spreadsheet_id,
+            range=block_range(prefix, col, row, width, page_rows)
+        )).get("values", [])
+        for offset, values in enumerate(page):
+            if names is None:
+                names = [str(v) for v in values] if header else [index_to_column(col + i) for i in range(width)]
+                if header:
+                    continue
+            yield str(row + offset), {name: values[i] if i < len(values) else "" for i, name in enumerate(names)}
+        if len(page) < page_rows:
+            return
+        row += page_rows
+
+
+def _answer_text(answer: Dict[str, Any]) -> str:
+    return ", ".join(a.get("value", "") for a in answer.get("textAnswers", {}).get("answers", []))
+
+
+def _form_records(forms_server: Any, execute: ToolExecutor, args: Dict[str, Any]) -> Iterator[Keyed]:
+    """Ingests new responses through the tool (incremental), then streams them from the local store."""
+    form_id = args["form_id"]
+    ingest = execute("gforms_get_responses", {"form_id": form_id})
+    if ingest.get("status") != "success":
+        raise RuntimeError(f"Could not ingest responses of form {form_id}: {ingest.get('message')}")
+    questions = forms_server.response_store.load_state(form_id)["questions"]
+    # Every record carries every question, in form order, so a question the first respondent skipped still gets a column
+    blank = {meta.get("title", question_id): "" for question_id, meta in questions.items()}
+    for response in forms_server.response_store.iter_responses(form_id, settings.PIPELINE_PAGE_ROWS):
+        record = {"response_id": response.get("responseId"), "submitted": response.get("lastSubmittedTime"), "email": response.get("respondentEmail", ""), **blank}
+        for question_id, answer in response.get("answers", {}).items():
+            record[questions.get(question_id, {}).get("title", question_id)] = _answer_text(answer)
+        yield record["response_id"], record
+
+
+# --- Steps ---------------------------------------------------------------------------------------
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _compare(left: Any, op: str, right: Any) -> bool:
+    if op == "not_empty":
+        return left not in (None, "")
+    if op == "contains":
+        return str(right).lower() in str(left).lower()
+    if op == "in":
+        return str(left) in [str(v) for v in right]
+    # Compare numerically when both sides are numbers, so "10" > "9"
+    a, b = _number(left), _number(right)
+    if a is None or b is None:
+        a, b = str(left), str(right)
+    return {"==": a == b, "!=": a != b, ">": a > b, ">=": a >= b, "<": a < b, "<=": a <= b}[op]
+
+
+FILTER_OPS = ("==", "!=", ">", ">=", "<", "<=", "contains", "in", "not_empty")
+
+
+class _Defaults(dict):
+    def __missing__(self, key):
+        return ""
+
+
+def render(template: str, record: Record) -> str:
+    """Fills {Field} placeholders from the record; unknown fields render empty."""
+    return template.format_map(_Defaults(record))
+
+
+def _apply_step(records: Iterable[Record], step: Dict[str, Any]) -> Iterator[Record]:
+    if "filter" in step:
+        rule = step["filter"]
+        return (r for r in records if _compare(r.get(rule["field"]), rule.get("op", "=="), rule.get("value")))
+    if "select" in step:
+        fields = step["select"]
+        return ({f: r.get(f, "") for f in fields} for r in records)
+    if "rename" in step:
+        mapping = step["rename"]
+        return ({mapping.get(k, k): v for k, v in r.items()} for r in records)
+    if "set" in step:
+        templates = step["set"]
+        return ({**r, **{f: render(t, r) for f, t in templates.items()}} for r in records)
+    if "limit" in step:
+        limit = int(step["limit"])
+        return (r for i, r in zip(range(limit), records))
+    raise PipelineError(f"Unknown step {json.dumps(step)}")
+
+
+def validate_steps(steps: List[Dict[str, Any]]):
+    for step in steps:
+        if not isinstance(step, dict) or len(step) != 1 or next(iter(step)) not in ("filter", "select", "rename", "set", "limit"):
+            raise PipelineError(f"Each step must be one of filter/select/rename/set/limit, got {json.dumps(step)}")
+        rule = step.get("filter")
+        if rule is not None and (not isinstance(rule, dict) or "field" not in rule or rule.get("op", "==") not in FILTER_OPS):
+            raise PipelineError(f"filter needs a field and an op in {', '.join(FILTER_OPS)}")
+
+
+# --- Sinks ---------------------------------------------------------------------------------------
+
+def _batches(records: Iterable[Keyed], size: int) -> Iterator[List[Keyed]]:
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class _SinkStats:
+    def __init__(self):
+        self.written = 0
+        self.calls = 0
+        self.skipped = 0
+        self.errors: List[str] = []
+
+    def record(self, result: Dict[str, Any], count: int) -> bool:
+        """Counts one sink call; returns whether it succeeded."""
+        self.calls += 1
+        if result.get("status") == "success":
+            self.written += count
+            return True
+        if len(self.errors) < 5:
+            self.errors.append(str(result.get("message", "unknown error"))[:300])
+        return False
+
+
+def _unsent(records: Iterable[Keyed], sent: set, stats: _SinkStats) -> Iterator[Keyed]:
+    for key, record in records:
+        if key in sent:
+            stats.skipped += 1
+        else:
+            yield key, record
+
+
+def _sheet_sink(execute: ToolExecutor, args: Dict[str, Any], records: Iterable[Keyed], spec: Dict[str, Any], stats: _SinkStats):
+    done = progress("pipeline.sink")
+    keys: List[str] = list(done.data.get("keys", []))
+    sent = set(keys)
+    columns: Optional[List[str]] = spec.get("columns") or done.data.get("columns")
+    header = spec.get("header", True) and not keys
+    for batch in _batches(_unsent(records, sent, stats), settings.PIPELINE_BATCH_ROWS):
+        if columns is None:
+            # Union of the first batch's fields in first-seen order; saved below so a resumed job keeps the layout
+            columns = list(dict.fromkeys(field for _, r in batch for field in r))
+        rows = [[str(r.get(c, "")) for c in columns] for _, r in batch]
+        if header:
+            rows.insert(0, list(columns))
+            header = False
+        batch_keys = [key for key, _ in batch]
+        # Named after its records, so only the same batch re-formed after a restart resumes its append chunks
+        batch_id = hashlib.sha1("\n".join(batch_keys).encode()).hexdigest()[:16]
+        with checkpoint_scope(f"pipeline.sink.{batch_id}"):
+            result = execute("gsheet_update_sheet", {"spreadsheet_id": args["spreadsheet_id"], "range": args["range"], "values": rows, "mode": "append"})
+        if not stats.record(result, len(batch)):
+            # Not checkpointed, so a rerun retries this batch; later ones would land out of order
+            return
+        keys.extend(batch_keys)
+        sent.update(batch_keys)
+        done.advance(keys=keys, columns=columns)
+
+
+def _email_sink(execute: ToolExecutor, args: Dict[str, Any], records: Iterable[Keyed], spec: Dict[str, Any], stats: _SinkStats):
+    # Reads one record past the cap before sending anything, so an oversized run sends no email at all
+    records = list(islice(records, settings.PIPELINE_MAX_EMAILS + 1))
+    if len(records) > settings.PIPELINE_MAX_EMAILS:
+        raise PipelineError(f"Refusing to send more than {settings.PIPELINE_MAX_EMAILS} emails from one pipeline; add a filter or limit step.")
+    done = progress("pipeline.sink")
+    keys: List[str] = list(done.data.get("keys", []))
+    for key, record in _unsent(records, set(keys), stats):
+        message = {field: render(args[field], record) for field in ("recipient", "subject", "body")}
+        if not stats.record(execute("gmail_send_email", message), 1):
+            # Stop at the first failure; it is not checkpointed, so a rerun retries it
+            return
+        keys.append(key)
+        done.advance(keys=keys)
+
+
+SOURCES = ("gsheet_read_sheet", "gforms_get_responses")
+SINKS = {"gsheet_update_sheet": ("spreadsheet_id", "range"), "gmail_send_email": ("recipient", "subject", "body")}
+
+
+class PipelineMCPServer:
+    """Runs pipeline_run server-side over the other Workspace servers."""
+
+    def __init__(self, servers: Dict[str, Any], execute: ToolExecutor):
+        self.servers = servers
+        self.execute = execute
+
+    def _source(self, spec: Dict[str, Any]) -> Iterator[Keyed]:
+        tool, args = spec.get("tool"), spec.get("args", {})
+        if tool == "gsheet_read_sheet":
+            if "spreadsheet_id" not in args or "range" not in args:
+                raise PipelineError("gsheet_read_sheet source needs args.spreadsheet_id and args.range")
+            return _sheet_records(self.servers["gsheets"], args, spec.get("header", True))
+        if tool == "gforms_get_responses":
+            if "form_id" not in args:
+                raise PipelineError("gforms_get_responses source needs args.form_id")
+            return _form_records(self.servers["gforms"], self.execute, args)
+        raise PipelineError(f"Unsupported source '{tool}'. Use one of: {', '.join(SOURCES)}")
+
+    def pipeline_run(self, source: Dict[str, Any], sink: Dict[str, Any], steps: Optional[List[Dict[str, Any]]] = None, dry_run: bool = False, background: bool = False) -> Dict[str, Any]:
+        """Moves records from a source tool to a sink tool server-side and returns only a summary; use it instead of
+        reading data and pasting it into another tool. source: {"tool": "gsheet_read_sheet", "args": {"spreadsheet_id", "range"}, "header": true} or
+        {"tool": "gforms_get_responses", "args": {"form_id"}} (fields are question titles plus response_id, submitted, email).
+        steps, applied in order: {"filter": {"field", "op": ==|!=|>|>=|<|<=|contains|in|not_empty, "value"}},
+        {"select": [fields]}, {"rename": {old: new}}, {"set": {field: "template with {Field}"}}, {"limit": n}.
+        sink: {"tool": "gsheet_update_sheet", "args": {"spreadsheet_id", "range"}, "columns": [...], "header": true} appends rows;
+        {"tool": "gmail_send_email", "args": {"recipient", "subject", "body"}} sends one email per record, each a {Field} template.
+        dry_run returns a sample of the transformed records without writing; background runs the pipeline as a job.
+
+        Records are streamed, so memory stays bounded by one source page and one sink batch.
+        """
+        try:
+            steps = steps or []
+            validate_steps(steps)
+            sink_tool, sink_args = sink.get("tool"), sink.get("args", {})
+            if sink_tool not in SINKS:
+                raise PipelineError(f"Unsupported sink '{sink_tool}'. Use one of: {', '.join(SINKS)}")
+            missing = [a for a in SINKS[sink_tool] if a not in sink_args]
+            if missing:
+                raise PipelineError(f"{sink_tool} sink needs args: {', '.join(missing)}")
+
+            counts = {"read": 0, "kept": 0}
+            current = {"key": None}
+
+            def read(pairs: Iterable[Keyed]) -> Iterator[Record]:
+                for key, record in pairs:
+                    counts["read"] += 1
+                    current["key"] = key
+                    yield record
+
+            def kept(records: Iterable[Record]) -> Iterator[Keyed]:
+                # Steps never hold records back, so the record just kept is the last one read from the source
+                for record in records:
+                    counts["kept"] += 1
+                    yield current["key"], record
+
+            records: Iterable[Record] = read(self._source(source))
+            for step in steps:
+                records = _apply_step(records, step)
+            keyed = kept(records)
+
+            if dry_run:
+                sample = [r for _, (_, r) in zip(range(settings.PIPELINE_SAMPLE_RECORDS), keyed)]
+                return {
+                    "status": "success",
+                    "message": f"Dry run: {len(sample)} sample record(s) after {len(steps)} step(s); nothing was written.",
+                    "details": {"sample": sample}
+                }
+
+            stats = _SinkStats()
+            try:
+                if sink_tool == "gsheet_update_sheet":
+                    _sheet_sink(self.execute, sink_args, keyed, sink, stats)
+                else:
+                    _email_sink(self.execute, sink_args, keyed, sink, stats)
+            except Exception as e:
+                if not stats.calls:
+                    raise
+                # Some records already landed, so report what was written rather than a bare error
+                logger.error(f"Pipeline stopped after {stats.calls} sink call(s): {e}", exc_info=True)
+                stats.errors.append(f"Stopped early: {str(e)[:300]}")
+
+            details = {
+                "read": counts["read"],
+                "filtered_out": counts["read"] - counts["kept"],
+                "written": stats.written,
+                "sink_calls": stats.calls,
+                "resumed_past": stats.skipped,
+                "errors": stats.errors,
+            }
+            status = "success" if not stats.errors else ("partial" if stats.written else "error")
+            return {
+                "status": status,
+                "message": f"Pipeline {source.get('tool')} -> {sink_tool}: read {counts['read']} record(s), wrote {stats.written} in {stats.calls} call(s).",
+                "details": details
+            }
+        except PipelineError as e:
+            return {"status": "error", "message": f"Invalid pipeline: {e}"}
+        except Exception as e:
+            logger.error(f"Pipeline failed: {e}", exc_info=True)
+            return {"status": "error", "message": f"Pipeline failed. Details: {str(e)}"}
@@ -0,0 +1,370 @@
+"""Plan-then-execute: runs a model-written DAG of tool calls with one LLM round trip for the plan.
+
+The model calls execute_plan with steps like
+
+    [{"id": "rows", "tool": "gsheet_read_sheet", "args": {"spreadsheet_id": "S", "range": "A2:B"}},
+     {"id": "mails", "tool": "gmail_send_email", "for_each": "${rows.values}",
+      "args": {"recipient": "${item.1}", "subject": "Hello ${item.0}", "body": "..."}}]
+
+`${step.path}` references an earlier step's output (dots index into dicts and lists); a value
+that is a single reference keeps its type, references inside longer strings are formatted as text.
+Dependencies come from the references plus an optional "after" list. Steps whose inputs are ready
+run in parallel and references are resolved locally, so the LLM only sees the plan and the final
+results. It is called again only for "ask" steps, which need judgement (e.g. drafting text), and
+to re-plan when steps fail, within the step, token and time budgets from settings.
+"""
+import json
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import copy_context
+from typing import Any, Dict, List, Optional, Set
+
+from ..config import settings
+from ..utils.logger import get_logger
+from ..utils.metrics import Counter
+from ..utils.tracing import span
+
+logger = get_logger(__name__)
+
+PLAN_TOOL_NAME = "execute_plan"
+
+PLAN_TOOL = {
+    "type": "function",
+    "function": {
+        "name": PLAN_TOOL_NAME,
+        "description": (
+            "Runs a multi-step plan of tool calls server-side. Each step has a unique id and either a tool with args, "
+            "or an ask prompt answered by the assistant (for drafting text from earlier results). "
+            "Use ${step_id.path} in args or ask to insert an earlier step's output, e.g. ${rows.values.0.1}; "
+            "steps that reference others run after them, independent steps run in parallel. "
+            "for_each: a reference to a list; the step then runs once per element, with ${item} and ${index} available. "
+            "after: ids of steps that must finish first without being referenced."
+        ),
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "steps": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "id": {"type": "string"},
+                            "tool": {"type": "string"},
+                            "args": {"type": "object"},
+                            "ask": {"type": "string"},
+                            "for_each": {"type": "string"},
+                            "after": {"type": "array", "items": {"type": "string"}},
+                        },
+                        "required": ["id"],
+                    },
+                }
+            },
+            "required": ["steps"],
+        },
+    },
+}
+
+PLAN_STEPS = Counter("agent_plan_steps_total", "Plan steps by final status (success, error, skipped).", ["status"])
+PLAN_LLM_CALLS = Counter("agent_plan_llm_calls_total", "LLM calls made while executing plans, by reason (ask, replan).", ["reason"])
+
+_REF = re.compile(r"\$\{([A-Za-z_][\w-]*)((?:\.[\w-]+)*)\}")
+# Names bound per for_each element rather than by a step
+_LOCALS = ("item", "index")
+# Output characters per step shown to the LLM when re-planning
+_REPLAN_OUTPUT_CHARS = 1500
+
+
+class PlanError(ValueError):
+    """An invalid plan or a reference that cannot be resolved."""
+
+
+def references(value: Any) -> Set[str]:
+    """Step ids referenced anywhere inside `value`."""
+    if isinstance(value, str):
+        return {m.group(1) for m in _REF.finditer(value)} - set(_LOCALS)
+    if isinstance(value, dict):
+        return set().union(*(references(v) for v in value.values())) if value else set()
+    if isinstance(value, list):
+        return set().union(*(references(v) for v in value)) if value else set()
+    return set()
+
+
+def _lookup(match: "re.Match[str]", scope: Dict[str, Any]) -> Any:
+    root, path = match.group(1), match.group(2)
+    if root not in scope:
+        raise PlanError(f"Reference {match.group(0)} names no finished step")
+    value = scope[root]
+    for key in path.split(".")[1:]:
+        try:
+            value = value[int(key)] if isinstance(value, list) else value[key]
+        except (KeyError, IndexError, ValueError, TypeError):
+            raise PlanError(f"Reference {match.group(0)} does not exist in the output of '{root}'")
+    return value
+
+
+def resolve(value: Any, scope: Dict[str, Any]) -> Any:
+    """Replaces ${...} references in `value` with data from `scope`."""
+    if isinstance(value, str):
+        whole = _REF.fullmatch(value)
+        if whole:
+            return _lookup(whole, scope)
+
+        def text(match):
+            found = _lookup(match, scope)
+            return found if isinstance(found, str) else json.dumps(found, default=str)
+        return _REF.sub(text, value)
+    if isinstance(value, dict):
+        return {k: resolve(v, scope) for k, v in value.items()}
+    if isinstance(value, list):
+        return [resolve(v, scope) for v in value]
+    return value
+
+
+class PlanStep:
+    __slots__ = ("id", "tool", "args", "ask", "for_each", "deps")
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.id: str = spec["id"]
+        self.tool: Optional[str] = spec.get("tool")
+        self.args: Dict[str, Any] = spec.get("args") or {}
+        self.ask: Optional[str] = spec.get("ask")
+        self.for_each: Optional[str] = spec.get("for_each")
+        self.deps: Set[str] = (references(self.args) | references(self.ask or "") | references(self.for_each or "")
+                               | set(spec.get("after") or []))
+
+    @property
+    def label(self) -> str:
+        return self.tool or "ask"
+
+
+def parse_plan(specs: Any, known_tools: Set[str], finished: Set[str]) -> List[PlanStep]:
+    """Validates a plan against the served tools and the steps already finished; raises PlanError."""
+    if not isinstance(specs, list) or not specs:
+        raise PlanError("steps must be a non-empty list")
+    steps, ids = [], set()
+    for spec in specs:
+        if not isinstance(spec, dict) or not isinstance(spec.get("id"), str) or not _REF.fullmatch(f"${{{spec.get('id')}}}"):
+            raise PlanError(f"Every step needs an id made of letters, digits, '_' or '-': {json.dumps(spec, default=str)[:200]}")
+        step = PlanStep(spec)
+        if step.id in ids or step.id in finished or step.id in _LOCALS:
+            raise PlanError(f"Step id '{step.id}' is used twice")
+        if (step.tool is None) == (step.ask is None):
+            raise PlanError(f"Step '{step.id}' needs exactly one of tool or ask")
+        if step.tool is not None and step.tool not in known_tools:
+            raise PlanError(f"Step '{step.id}' uses unknown tool '{step.tool}'")
+        ids.add(step.id)
+        steps.append(step)
+    for step in steps:
+        missing = step.deps - ids - finished
+        if missing:
+            raise PlanError(f"Step '{step.id}' depends on unknown step(s): {', '.join(sorted(missing))}")
+    # Kahn's algorithm; whatever cannot be ordered is part of a cycle
+    remaining = {s.id: s.deps & ids for s in steps}
+    while remaining:
+        ready = [i for i, deps in remaining.items() if not deps]
+        if not ready:
+            raise PlanError(f"Steps form a cycle: {', '.join(sorted(remaining))}")
+        for i in ready:
+            del remaining[i]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    return steps
+
+
+class PlanBudget:
+    """Steps, LLM tokens and wall time one chat's plan may still use; shared by the steps running in parallel."""
+
+    def __init__(self, tokens_used: int = 0):
+        self.steps_left = settings.PLAN_MAX_STEPS
+        self.tokens_left = settings.PLAN_TOKEN_BUDGET - tokens_used
+        self.deadline = time.monotonic() + settings.PLAN_TIME_BUDGET_SECONDS
+        self.replans_left = settings.PLAN_MAX_REPLANS
+        self.llm_calls = 0
+        self._lock = threading.Lock()
+
+    def time_left(self) -> float:
+        return self.deadline - time.monotonic()
+
+    def take_steps(self, count: int) -> bool:
+        with self._lock:
+            if count > self.steps_left:
+                return False
+            self.steps_left -= count
+            return True
+
+    def charge(self, usage: Optional[Dict[str, int]]):
+        with self._lock:
+            self.llm_calls += 1
+            if usage:
+                self.tokens_left -= usage["prompt_tokens"] + usage["completion_tokens"]
+
+    def exhausted(self) -> Optional[str]:
+        if self.time_left() <= 0:
+            return "time budget exhausted"
+        if self.steps_left <= 0:
+            return "step budget exhausted"
+        return None
+
+
+class PlanExecutor:
+    def __init__(self, mcp_service, llm_service):
+        self.mcp_service = mcp_service
+        self.llm_service = llm_service
+        # Shared by every chat; each plan still runs at most PLAN_MAX_PARALLEL steps at once (see _execute)
+        self._pool = ThreadPoolExecutor(max_workers=settings.PLAN_MAX_PARALLEL * settings.CHAT_MAX_CONCURRENT, thread_name_prefix="plan-step")
+        # Separate from the step pool: a step waiting on its elements must never hold the threads they need
+        self._item_pool = ThreadPoolExecutor(max_workers=settings.PLAN_FOR_EACH_PARALLEL, thread_name_prefix="plan-item")
+
+    def _known_tools(self) -> Set[str]:
+        return {d["function"]["name"] for d in self.mcp_service.get_tool_definitions()}
+
+    def _run_step(self, step: PlanStep, scope: Dict[str, Any], budget: PlanBudget) -> Dict[str, Any]:
+        with span(f"agent.plan_step.{step.label}", **{"plan.step": step.id}):
+            if step.ask is not None:
+                if budget.tokens_left <= 0:
+                    return {"status": "error", "message": "Token budget exhausted before this ask step."}
+                response = self.llm_service.judge(resolve(step.ask, scope))
+                budget.charge(response.get("usage"))
+                PLAN_LLM_CALLS.inc(reason="ask")
+                return {"status": "success", "text": response.get("text", "")}
+            if step.for_each is None:
+                return self.mcp_service.execute_tool(step.tool, resolve(step.args, scope), allow_background=False)
+
+            items = resolve(step.for_each, scope)
+            if not isinstance(items, list):
+                raise PlanError(f"for_each of '{step.id}' is not a list")
+            # The step itself was charged once; each further element is another tool call
+            if not budget.take_steps(max(0, len(items) - 1)):
+                return {"status": "error", "message": f"for_each over {len(items)} items exceeds the remaining step budget."}
+            calls = [resolve(step.args, {**scope, "item": item, "index": index}) for index, item in enumerate(items)]
+            futures = [self._item_pool.submit(copy_context().run, self.mcp_service.execute_tool, step.tool, args, allow_background=False)
+                       for args in calls]
+            results = []
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    results.append({"status": "error", "message": str(e)})
+            failed = [index for index, r in enumerate(results) if r.get("status") == "error"]
+            ok = len(results) - len(failed)
+            status = "success" if not failed else ("partial" if ok else "error")
+            message = f"{ok}/{len(results)} call(s) succeeded." + (f" Failed item indexes: {failed}." if failed else "")
+            return {"status": status, "message": message, "results": results}
+
+    def _execute(self, steps: List[PlanStep], scope: Dict[str, Any], outcomes: Dict[str, Dict[str, Any]], budget: PlanBudget):
+        """Runs steps as their dependencies finish; fills `scope` with outputs and `outcomes` with per-step status."""
+        pending = {s.id: s for s in steps}
+        running = {}
+        while pending or running:
+            for step in list(pending.values()):
+                blocked = [d for d in step.deps if d in outcomes and outcomes[d]["status"] != "success"]
+                if blocked:
+                    outcomes[step.id] = {"tool": step.label, "status": "skipped", "message": f"Depends on step '{blocked[0]}', which did not succeed."}
+                    del pending[step.id]
+                elif all(d in scope for d in step.deps):
+                    if len(running) >= settings.PLAN_MAX_PARALLEL:
+                        continue
+                    reason = budget.exhausted()
+                    if reason is not None:
+                        outcomes[step.id] = {"tool": step.label, "status": "skipped", "message": f"Not started: {reason}."}
+                    else:
+                        budget.take_steps(1)
+                        # Run in this request's context so each step's spans and logs attach to the chat
+                        running[self._pool.submit(copy_context().run, self._run_step, step, dict(scope), budget)] = step
+                    del pending[step.id]
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                step = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"status": "error", "message": str(e)}
+                # A for_each with failed items is not a success: it is re-planned, and its dependents do not run on half the data
+                status = result.get("status") if result.get("status") in ("error", "partial") else "success"
+                if status == "success":
+                    scope[step.id] = result
+                outcomes[step.id] = {"tool": step.label, "status": status, "output": result}
+                logger.info(f"Plan step {step.id} ({step.label}): {outcomes[step.id]['status']}")
+
+    def _replan_context(self, user_message: str, outcomes: Dict[str, Dict[str, Any]]) -> str:
+        lines = [f"User goal: {user_message}", "", "Step results so far:"]
+        for step_id, outcome in outcomes.items():
+            if outcome["status"] == "success":
+                output = json.dumps(outcome["output"], default=str)
+                lines.append(f"- {step_id} ({outcome['tool']}) succeeded; reference as ${{{step_id}...}}. Output: {output[:_REPLAN_OUTPUT_CHARS]}")
+            else:
+                detail = outcome.get("output", {}).get("message") if "output" in outcome else outcome.get("message")
+                if outcome["status"] == "partial":
+                    detail += " The other items already ran; retry only the failed ones."
+                lines.append(f"- {step_id} ({outcome['tool']}) {outcome['status']}: {detail}")
+        return "\n".join(lines)
+
+    def run(self, user_message: str, plan: Dict[str, Any], tokens_used: int = 0) -> Dict[str, Any]:
+        """Executes an execute_plan call, re-planning failed parts within budget. Returns a tool-style result."""
+        budget = PlanBudget(tokens_used)
+        known = self._known_tools()
+        scope: Dict[str, Any] = {}
+        outcomes: Dict[str, Dict[str, Any]] = {}
+        note = None
+        try:
+            steps = parse_plan(plan.get("steps"), known, set())
+        except PlanError as e:
+            steps, note = [], f"Invalid plan: {e}"
+        while steps:
+            self._execute(steps, scope, outcomes, budget)
+            if all(o["status"] == "success" for o in outcomes.values()):
+                break
+            stop = ("no re-plans left" if budget.replans_left <= 0 else
+                    "token budget exhausted" if budget.tokens_left <= 0 else budget.exhausted())
+            if stop:
+                note = f"Not re-planned: {stop}."
+                break
+            budget.replans_left -= 1
+            try:
+                with span("agent.replan"):
+                    response = self.llm_service.replan(self._replan_context(user_message, outcomes), [PLAN_TOOL])
+            except Exception as e:
+                # The steps that did run are still worth reporting
+                logger.warning(f"Re-plan failed: {e}")
+                note = f"Not re-planned: the re-plan call failed ({e})."
+                break
+            budget.charge(response.get("usage"))
+            PLAN_LLM_CALLS.inc(reason="replan")
+            calls = [c for c in response.get("tool_calls") or [] if c.function.name == PLAN_TOOL_NAME]
+            if not calls:
+                note = response.get("text")
+                break
+            try:
+                specs = json.loads(calls[0].function.arguments or "{}").get("steps")
+            except (ValueError, AttributeError) as e:
+                note = f"Invalid re-plan: arguments are not a JSON object ({e})."
+                break
+            try:
+                steps = parse_plan(specs, known, set(scope))
+            except PlanError as e:
+                # The failures stay in the result, so an unusable re-plan cannot turn them into a success
+                note = f"Invalid re-plan: {e}"
+                break
+            # Failed steps may be retried under the same id
+            for step_id in [i for i, o in outcomes.items() if o["status"] != "success"]:
+                del outcomes[step_id]
+
+        for outcome in outcomes.values():
+            PLAN_STEPS.inc(status=outcome["status"])
+        counts = {status: sum(1 for o in outcomes.values() if o["status"] == status) for status in ("success", "partial", "error", "skipped")}
+        status = "success" if outcomes and counts["success"] == len(outcomes) else ("partial" if counts["success"] or counts["partial"] else "error")
+        message = (f"Ran {len(outcomes)} step(s): {counts['success']} succeeded, {counts['partial']} partly failed, {counts['error']} failed, "
+                   f"{counts['skipped']} skipped; "
+                   f"{budget.llm_calls} extra LLM call(s).")
+        result = {"status": status, "message": message, "steps": outcomes}
+        if note:
+            result["note"] = note
+        return result
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+        self._item_pool.shutdown(wait=False)
@@ -0,0 +1,142 @@
+"""Background prefetch of the reads a user's first questions are likely to need.
+
+After login (and every PREFETCH_INTERVAL_SECONDS while a token exists, in whichever worker process
+holds the prefetch lock) the prefetcher loads the token, builds the Google service objects, then
+reads today's calendar (UTC), the inbox and the
+documents and sheets the user read most recently into the tool result cache. The reads use the
+argument shapes the agent itself sends for "what's on today" or "any unread mail", so those
+questions are served from the cache. Everything runs at bulk quota priority behind interactive
+chats, with at most PREFETCH_MAX_PARALLEL reads at a time.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..config import settings
+from ..mcp_servers.quota import quota_scope
+from ..utils.locks import interprocess_lock
+from ..utils.logger import get_logger
+from ..utils.metrics import Counter, Histogram
+from ..utils.tracing import span
+
+logger = get_logger(__name__)
+
+PREFETCH_READS = Counter("prefetch_reads_total", "Prefetched tool reads by outcome status.", ["tool", "status"])
+PREFETCH_SECONDS = Histogram("prefetch_run_seconds", "Duration of prefetch runs by trigger (login, periodic).", ["reason"])
+
+# Held by the worker process running the periodic loop; the loops of the other workers wait on it
+LOOP_LOCK_PATH = settings.CREDENTIALS_DIR / "prefetch.lock"
+
+
+def standing_reads() -> List[Tuple[str, Dict[str, Any]]]:
+    """Reads worth having warm for any user: the calendar for today and upcoming, and the inbox."""
+    # The same UTC day the Z-suffixed bounds below describe, whatever the server's local timezone
+    today = datetime.now(timezone.utc).date()
+    reads = []
+    if settings.PREFETCH_CALENDAR:
+        reads += [
+            ("calendar_list_events", {"time_min": f"{today.isoformat()}T00:00:00Z", "time_max": f"{(today + timedelta(days=1)).isoformat()}T00:00:00Z"}),
+            ("calendar_list_events", {}),
+        ]
+    if settings.PREFETCH_INBOX:
+        reads += [
+            ("gmail_read_emails", {"query": "is:unread"}),
+            ("gmail_read_emails", {}),
+        ]
+    return reads
+
+
+class Prefetcher:
+    def __init__(self):
+        self._get_mcp_service: Optional[Callable[[], Any]] = None
+        # Held for the length of a run, so a login during a periodic run does not start a second one
+        self._running = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_run: Optional[Dict[str, Any]] = None
+
+    def start(self, get_mcp_service: Callable[[], Any]):
+        """Binds the MCP service (built lazily by the callable) and starts the periodic loop."""
+        self._get_mcp_service = get_mcp_service
+        if settings.PREFETCH_ENABLED and settings.PREFETCH_INTERVAL_SECONDS > 0:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="prefetch", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def trigger(self, reason: str) -> bool:
+        """Starts a run in the background; False when prefetching is off, unbound or already running."""
+        if not settings.PREFETCH_ENABLED or self._get_mcp_service is None or not self._running.acquire(blocking=False):
+            return False
+
+        def run():
+            try:
+                self._run(reason)
+            finally:
+                self._running.release()
+        threading.Thread(target=run, name=f"prefetch-{reason}", daemon=True).start()
+        return True
+
+    def _loop(self):
+        # One loop per deployment, not per worker: the others block here and take over if its process exits
+        with interprocess_lock(LOOP_LOCK_PATH):
+            # The first run covers a restart with a token already stored; later ones refresh what has expired
+            while not self._stop.is_set():
+                if self._running.acquire(blocking=False):
+                    try:
+                        self._run("periodic")
+                    finally:
+                        self._running.release()
+                self._stop.wait(settings.PREFETCH_INTERVAL_SECONDS)
+
+    def _read(self, mcp_service, tool_name: str, args: Dict[str, Any], deadline: float) -> str:
+        if time.monotonic() > deadline:
+            return "skipped"
+        # A cache hit costs nothing; a miss refreshes the entry
+        result = mcp_service.execute_tool(tool_name, args, allow_background=False)
+        status = str(result.get("status", "unknown"))
+        PREFETCH_READS.inc(tool=tool_name, status=status)
+        return status
+
+    def _run(self, reason: str) -> Dict[str, Any]:
+        if not settings.TOKEN_PATH.exists():
+            return {"status": "skipped", "message": "No stored token."}
+        started = time.monotonic()
+        deadline = started + settings.PREFETCH_DEADLINE_SECONDS
+        try:
+            with span("prefetch.run", **{"prefetch.reason": reason}), quota_scope(priority="bulk"):
+                mcp_service = self._get_mcp_service()
+                services = mcp_service.warm_services()
+                reads = (standing_reads() + mcp_service.recent_reads(settings.PREFETCH_RECENT_DOCUMENTS))[:settings.PREFETCH_MAX_READS]
+                with ThreadPoolExecutor(max_workers=settings.PREFETCH_MAX_PARALLEL, thread_name_prefix="prefetch-read") as pool:
+                    # Each read runs in this context, so it keeps the bulk priority and the trace
+                    futures = [pool.submit(copy_context().run, self._read, mcp_service, tool_name, args, deadline) for tool_name, args in reads]
+                    statuses = [future.result() for future in futures]
+        except Exception as e:
+            # A prefetch is only an optimisation; the chat that needs the data will surface the error
+            logger.warning(f"Prefetch ({reason}) failed: {e}")
+            self.last_run = {"status": "error", "reason": reason, "message": str(e), "finished_at": time.time()}
+            return self.last_run
+        seconds = time.monotonic() - started
+        PREFETCH_SECONDS.observe(seconds, reason=reason)
+        self.last_run = {
+            "status": "success",
+            "reason": reason,
+            "services": services,
+            "reads": {status: statuses.count(status) for status in set(statuses)},
+            "seconds": round(seconds, 3),
+            "finished_at": time.time(),
+        }
+        logger.info(f"Prefetch ({reason}) finished in {seconds:.2f}s: {self.last_run['reads']}")
+        return self.last_run
+
+    def status(self) -> Dict[str, Any]:
+        return {"enabled": settings.PREFETCH_ENABLED, "running": self._running.locked(), "last_run": self.last_run}
+
+
+prefetcher = Prefetcher()
@@ -0,0 +1,359 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from ..config import settings
+from ..utils.db import connect_sqlite
+
+# Read tools: tool -> (resource type, argument naming the resource or None for the whole type, default TTL seconds)
+READ_TOOL_POLICIES: Dict[str, Tuple[str, Optional[str], int]] = {
+    "gmail_read_emails": ("gmail", None, 30),
+    "calendar_list_events": ("calendar", None, 60),
+    "gdocs_read_document": ("document", "document_id", 300),
+    "gsheet_read_sheet": ("spreadsheet", "spreadsheet_id", 120),
+    "gsheet_query": ("spreadsheet", "spreadsheet_id", 120),
+    "gforms_read_form": ("form", "form_id", 300),
+}
+
+# Write tools: tool -> (resource type, argument naming the resource or None to evict the whole type)
+WRITE_TOOL_INVALIDATIONS: Dict[str, Tuple[str, Optional[str]]] = {
+    "gmail_send_email": ("gmail", None),
+    "calendar_schedule_meeting": ("calendar", None),
+    "calendar_cancel_event": ("calendar", None),
+    "gdocs_update_document": ("document", "document_id"),
+    "gsheet_update_sheet": ("spreadsheet", "spreadsheet_id"),
+}
+
+# Arguments that ask a read tool to skip caches; they force a miss and are left out of the key
+BYPASS_ARGS = ("refresh",)
+
+# Writes remembered per resource so a read that overlapped one does not store its stale result.
+# Reads that started before the oldest remembered write are not stored at all.
+MAX_TRACKED_WRITES = 10_000
+WRITE_LOG_SECONDS = 3600
+
+
+def canonical_args(args: Dict[str, Any]) -> str:
+    keyed = {k: v for k, v in args.items() if k not in BYPASS_ARGS}
+    return json.dumps(keyed, sort_keys=True, separators=(",", ":"), default=str)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tool_result_cache (
+    tool_name TEXT NOT NULL,
+    args_key TEXT NOT NULL,
+    resource_type TEXT NOT NULL,
+    resource_id TEXT,
+    payload TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (tool_name, args_key)
+);
+CREATE INDEX IF NOT EXISTS idx_tool_result_cache_resource ON tool_result_cache (resource_type, resource_id);
+CREATE INDEX IF NOT EXISTS idx_tool_result_cache_last_used ON tool_result_cache (last_used);
+CREATE TABLE IF NOT EXISTS tool_cache_writes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    resource_type TEXT NOT NULL,
+    resource_id TEXT,
+    written_at REAL NOT NULL
+);
+"""
+
+
+def _ttl_for(tool_name: str) -> int:
+    return settings.TOOL_CACHE_TTLS.get(tool_name, READ_TOOL_POLICIES[tool_name][2])
+
+
+def _resource_of(tool_name: str, args: Dict[str, Any]) -> Tuple[str, Optional[str]]:
+    resource_type, id_arg, _ = READ_TOOL_POLICIES[tool_name]
+    return resource_type, args.get(id_arg) if id_arg else None
+
+
+def _per_tool_stats(stats: Dict[str, Dict[str, int]]) -> Dict[str, Dict[str, Any]]:
+    per_tool = {}
+    for tool_name, counts in stats.items():
+        lookups = counts["hits"] + counts["misses"]
+        per_tool[tool_name] = {**counts, "hit_rate": round(counts["hits"] / lookups, 4) if lookups else 0.0}
+    return per_tool
+
+
+class _Entry:
+    __slots__ = ("payload", "size", "expires_at", "tool_name", "resource")
+
+    def __init__(self, payload: str, expires_at: float, tool_name: str, resource: Tuple[str, Optional[str]]):
+        self.payload = payload
+        self.size = len(payload)
+        self.expires_at = expires_at
+        self.tool_name = tool_name
+        self.resource = resource
+
+
+class ToolResultCache:
+    """LRU cache of read-tool results with per-tool TTLs, a memory bound and resource-scoped invalidation.
+
+    Results are stored as JSON so every hit hands out an independent copy and the memory
+    accounting matches what is actually held.
+    """
+
+    def __init__(self, max_entries: int = settings.TOOL_CACHE_MAX_ENTRIES, max_bytes: int = settings.TOOL_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        # Write sequence numbers: the latest overall, per resource type (any write, type-wide write) and per resource
+        self._write_seq = 0
+        self._write_floor = 0
+        self._type_writes: Dict[str, Tuple[int, int]] = {}
+        self._resource_writes: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+
+    @staticmethod
+    def is_cacheable(tool_name: str) -> bool:
+        return tool_name in READ_TOOL_POLICIES
+
+    def _stat(self, tool_name: str, field: str, amount: int = 1):
+        stats = self._stats.setdefault(tool_name, {"hits": 0, "misses": 0, "stores": 0, "stale": 0, "evictions": 0, "invalidations": 0})
+        stats[field] += amount
+
+    def _remove(self, key: Tuple[str, str]) -> _Entry:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        return entry
+
+    def get(self, tool_name: str, args: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if tool_name not in READ_TOOL_POLICIES:
+            return None
+        key = (tool_name, canonical_args(args))
+        with self._lock:
+            entry = None if any(args.get(arg) for arg in BYPASS_ARGS) else self._entries.get(key)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self._stat(tool_name, "misses")
+                return None
+            self._entries.move_to_end(key)
+            self._stat(tool_name, "hits")
+            payload = entry.payload
+        return json.loads(payload)
+
+    def begin_read(self) -> Any:
+        """Token to pass to put() for a read about to run, so writes made meanwhile are detected."""
+        with self._lock:
+            return self._write_seq
+
+    def _written_since(self, resource: Tuple[str, Optional[str]], since: int) -> bool:
+        if since < self._write_floor:
+            return True
+        resource_type, resource_id = resource
+        any_write, type_wide_write = self._type_writes.get(resource_type, (0, 0))
+        if resource_id is None:
+            return any_write > since
+        return type_wide_write > since or self._resource_writes.get((resource_type, resource_id), 0) > since
+
+    def _record_write(self, resource_type: str, resource_id: Optional[str]):
+        self._write_seq += 1
+        seq = self._write_seq
+        self._type_writes[resource_type] = (seq, seq if resource_id is None else self._type_writes.get(resource_type, (0, 0))[1])
+        if resource_id is not None:
+            key = (resource_type, resource_id)
+            self._resource_writes.pop(key, None)
+            self._resource_writes[key] = seq
+            if len(self._resource_writes) > MAX_TRACKED_WRITES:
+                _, forgotten = self._resource_writes.popitem(last=False)
+                self._write_floor = forgotten
+
+    def put(self, tool_name: str, args: Dict[str, Any], result: Dict[str, Any], since: Any = None):
+        """Stores a read result; `since` is the begin_read() token taken before the read ran."""
+        policy = READ_TOOL_POLICIES.get(tool_name)
+        # Errors are never cached: the next call should retry against Google
+        if policy is None or result.get("status") != "success":
+            return
+        ttl = _ttl_for(tool_name)
+        if ttl <= 0:
+            return
+        payload = json.dumps(result, default=str)
+        if len(payload) > self.max_bytes:
+            return
+        key = (tool_name, canonical_args(args))
+        entry = _Entry(payload, time.monotonic() + ttl, tool_name, _resource_of(tool_name, args))
+        with self._lock:
+            # A write that landed while the read ran may not be reflected in its result
+            if since is not None and self._written_since(entry.resource, since):
+                self._stat(tool_name, "stale")
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            self._stat(tool_name, "stores")
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self._stat(evicted.tool_name, "evictions")
+
+    def invalidate_for(self, tool_name: str, args: Dict[str, Any]) -> int:
+        """Evicts cached reads of the resource a write tool touches. Returns the number of evicted entries."""
+        rule = WRITE_TOOL_INVALIDATIONS.get(tool_name)
+        if rule is None:
+            return 0
+        resource_type, id_arg = rule
+        resource_id = args.get(id_arg) if id_arg else None
+        with self._lock:
+            self._record_write(resource_type, resource_id)
+            doomed = [
+                key for key, entry in self._entries.items()
+                if entry.resource[0] == resource_type and (resource_id is None or entry.resource[1] in (resource_id, None))
+            ]
+            for key in doomed:
+                self._stat(self._remove(key).tool_name, "invalidations")
+        return len(doomed)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes, "backend": "memory", "tools": _per_tool_stats(self._stats)}
+
+
+class SQLiteToolResultCache(ToolResultCache):
+    """ToolResultCache kept in the local SQLite database (WAL), so every worker process shares one cache.
+
+    Entries, TTLs, the LRU bound and invalidations are shared; hit/miss counters are per process.
+    Expiry uses wall-clock time because monotonic clocks are not comparable across processes.
+    """
+
+    def __init__(self, max_entries: int = settings.TOOL_CACHE_MAX_ENTRIES, max_bytes: int = settings.TOOL_CACHE_MAX_BYTES):
+        super().__init__(max_entries, max_bytes)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self):
+        # One connection per thread: sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = connect_sqlite()
+        return conn
+
+    def get(self, tool_name: str, args: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if tool_name not in READ_TOOL_POLICIES:
+            return None
+        row = None
+        if not any(args.get(arg) for arg in BYPASS_ARGS):
+            now = time.time()
+            with self._conn() as conn:
+                row = conn.execute(
+                    "SELECT payload FROM tool_result_cache WHERE tool_name = ? AND args_key = ? AND expires_at > ?",
+                    (tool_name, canonical_args(args), now)
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE tool_result_cache SET last_used = ? WHERE tool_name = ? AND args_key = ?",
+                        (now, tool_name, canonical_args(args))
+                    )
+        with self._lock:
+            self._stat(tool_name, "hits" if row is not None else "misses")
+        return json.loads(row["payload"]) if row is not None else None
+
+    def begin_read(self) -> Any:
+        with self._conn() as conn:
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'tool_cache_writes'").fetchone()
+        return (row["seq"] if row is not None else 0, time.time())
+
+    def put(self, tool_name: str, args: Dict[str, Any], result: Dict[str, Any], since: Any = None):
+        if tool_name not in READ_TOOL_POLICIES or result.get("status") != "success":
+            return
+        ttl = _ttl_for(tool_name)
+        if ttl <= 0:
+            return
+        payload = json.dumps(result, default=str)
+        if len(payload) > self.max_bytes:
+            return
+        resource_type, resource_id = _resource_of(tool_name, args)
+        now = time.time()
+        since_seq, started_at = since if since is not None else (None, now)
+        if now - started_at > WRITE_LOG_SECONDS:
+            # The writes it overlapped may already be pruned from the log
+            with self._lock:
+                self._stat(tool_name, "stale")
+            return
+        with self._conn() as conn:
+            # Checked in the same statement as the insert, so a write from any worker cannot slip in between
+            stored = conn.execute(
+                """INSERT OR REPLACE INTO tool_result_cache
+                   SELECT ?, ?, ?, ?, ?, ?, ?, ?
+                   WHERE ? IS NULL OR NOT EXISTS (
+                       SELECT 1 FROM tool_cache_writes
+                       WHERE seq > ? AND resource_type = ? AND (resource_id IS NULL OR ? IS NULL OR resource_id = ?)
+                   )""",
+                (tool_name, canonical_args(args), resource_type, resource_id, payload, len(payload), now + ttl, now,
+                 since_seq, since_seq, resource_type, resource_id, resource_id)
+            ).rowcount
+            conn.execute("DELETE FROM tool_result_cache WHERE expires_at <= ?", (now,))
+            evicted = self._evict(conn) if stored else {}
+        with self._lock:
+            self._stat(tool_name, "stores" if stored else "stale")
+            for evicted_tool, count in evicted.items():
+                self._stat(evicted_tool, "evictions", count)
+
+    def _evict(self, conn) -> Dict[str, int]:
+        """Drops least recently used entries until both bounds hold; returns evictions per tool."""
+        evicted: Dict[str, int] = {}
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM tool_result_cache").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return evicted
+        for row in conn.execute("SELECT tool_name, args_key, size FROM tool_result_cache ORDER BY last_used").fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM tool_result_cache WHERE tool_name = ? AND args_key = ?", (row["tool_name"], row["args_key"]))
+            count -= 1
+            total -= row["size"]
+            evicted[row["tool_name"]] = evicted.get(row["tool_name"], 0) + 1
+        return evicted
+
+    def invalidate_for(self, tool_name: str, args: Dict[str, Any]) -> int:
+        rule = WRITE_TOOL_INVALIDATIONS.get(tool_name)
+        if rule is None:
+            return 0
+        resource_type, id_arg = rule
+        resource_id = args.get(id_arg) if id_arg else None
+        where, params = "resource_type = ?", [resource_type]
+        if resource_id is not None:
+            where += " AND (resource_id = ? OR resource_id IS NULL)"
+            params.append(resource_id)
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute("INSERT INTO tool_cache_writes (resource_type, resource_id, written_at) VALUES (?, ?, ?)", (resource_type, resource_id, now))
+            conn.execute("DELETE FROM tool_cache_writes WHERE written_at < ?", (now - WRITE_LOG_SECONDS,))
+            doomed = conn.execute(f"SELECT tool_name FROM tool_result_cache WHERE {where}", params).fetchall()
+            conn.execute(f"DELETE FROM tool_result_cache WHERE {where}", params)
+        with self._lock:
+            for row in doomed:
+                self._stat(row["tool_name"], "invalidations")
+        return len(doomed)
+
+    def clear(self):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM tool_result_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._conn() as conn:
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM tool_result_cache").fetchone()
+        with self._lock:
+            return {"entries": count, "bytes": total, "max_bytes": self.max_bytes, "backend": "sqlite", "tools": _per_tool_stats(self._stats)}
+
+
+def build_tool_cache() -> ToolResultCache:
+    """The configured cache backend; "auto" shares the cache through SQLite once there is more than one worker."""
+    backend = settings.TOOL_CACHE_BACKEND
+    if backend == "auto":
+        backend = "sqlite" if settings.WORKERS > 1 else "memory"
+    return SQLiteToolResultCache() if backend == "sqlite" else ToolResultCache()
@@ -0,0 +1,224 @@
+import inspect
+import json
+import typing
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+from ..config import settings
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean", dict: "object", list: "array"}
+# Python types accepted for each JSON schema type once arguments are parsed from JSON
+_PY_TYPES = {
+    "string": (str,),
+    "integer": (int,),
+    "number": (int, float),
+    "boolean": (bool,),
+    "object": (dict,),
+    "array": (list,),
+}
+
+
+class ToolRegistryError(Exception):
+    """Raised at startup when tool definitions and server methods disagree."""
+
+
+def schema_for_annotation(annotation: Any) -> Tuple[Dict[str, Any], bool]:
+    """Returns (JSON schema, nullable) for a type annotation."""
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+
+    if origin is typing.Union:
+        non_null = [a for a in args if a is not type(None)]
+        schema, _ = schema_for_annotation(non_null[0]) if len(non_null) == 1 else ({}, False)
+        return schema, type(None) in args
+    if annotation in _JSON_TYPES:
+        return {"type": _JSON_TYPES[annotation]}, False
+    if origin in (list, List):
+        schema = {"type": "array"}
+        if args:
+            item_schema, _ = schema_for_annotation(args[0])
+            if item_schema:
+                schema["items"] = item_schema
+        return schema, False
+    if origin in (dict, Dict):
+        return {"type": "object"}, False
+    # Any or anything we cannot express: accept whatever the model sends
+    return {}, False
+
+
+def _describe(function: Callable) -> str:
+    doc = inspect.getdoc(function) or ""
+    return " ".join(doc.split("\n\n", 1)[0].split())
+
+
+class RegisteredTool:
+    """A tool name bound to its server method, JSON schema and compiled argument validator."""
+
+    __slots__ = ("name", "server_name", "function", "definition", "validate")
+
+    def __init__(self, name: str, server_name: str, function: Callable, definition: Dict[str, Any], validate: Callable[[Dict[str, Any]], Dict[str, Any]]):
+        self.name = name
+        self.server_name = server_name
+        self.function = function
+        self.definition = definition
+        self.validate = validate
+
+
+def compile_validator(tool_name: str, parameters: Dict[str, Any], required: List[str], nullable: set) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """Builds a closure that checks argument names and top-level types against a schema.
+
+    All the schema walking happens here, once; the returned function only does set and
+    isinstance checks on the hot path.
+    """
+    required_set = frozenset(required)
+    allowed = frozenset(parameters)
+    checks = tuple(
+        (name, _PY_TYPES[schema["type"]], schema["type"], name in nullable)
+        for name, schema in parameters.items()
+        if schema.get("type") in _PY_TYPES
+    )
+
+    def validate(args: Dict[str, Any]) -> Dict[str, Any]:
+        if not isinstance(args, dict):
+            raise ValueError(f"Arguments for '{tool_name}' must be a JSON object.")
+        keys = args.keys()
+        missing = required_set - keys
+        if missing:
+            raise ValueError(f"Missing required argument(s) for '{tool_name}': {', '.join(sorted(missing))}")
+        unknown = keys - allowed
+        if unknown:
+            raise ValueError(f"Unknown argument(s) for '{tool_name}': {', '.join(sorted(unknown))}")
+        for name, py_types, json_type, is_nullable in checks:
+            if name not in args:
+                continue
+            value = args[name]
+            if value is None:
+                if is_nullable:
+                    continue
+            # bool is a subclass of int, so reject it explicitly for numeric parameters
+            elif isinstance(value, py_types) and not (isinstance(value, bool) and json_type in ("integer", "number")):
+                continue
+            raise ValueError(f"Argument '{name}' for '{tool_name}' must be of type {json_type}, got {type(value).__name__}.")
+        return args
+
+    return validate
+
+
+def load_server_tools(config_path: Path = settings.MCP_CONFIG_PATH) -> Dict[str, List[str]]:
+    """Reads the server class name -> tool names mapping from the MCP server config."""
+    with open(config_path, 'r') as f:
+        return json.load(f).get("servers", {})
+
+
+class ToolRegistry:
+    """Tool name -> RegisteredTool table built once from the server config and method signatures."""
+
+    def __init__(self, servers: Dict[str, Any], server_tools: Dict[str, List[str]], definitions: Optional[List[Dict[str, Any]]] = None):
+        self._tools: Dict[str, RegisteredTool] = {}
+        errors: List[str] = []
+        declared = {d.get("function", {}).get("name"): d for d in definitions or []}
+
+        for server_name, tool_names in server_tools.items():
+            server = servers.get(server_name)
+            if server is None:
+                errors.append(f"Server '{server_name}' in {settings.MCP_CONFIG_PATH.name} is not available.")
+                continue
+            for tool_name in tool_names:
+                function = self._resolve_method(server, tool_name)
+                if function is None:
+                    errors.append(f"Tool '{tool_name}' has no matching method on {server_name}.")
+                    continue
+                parameters, required, nullable = self._signature_schema(function)
+                definition = declared.pop(tool_name, None)
+                if definition is not None:
+                    errors.extend(self._check_definition(tool_name, definition, parameters, required))
+                else:
+                    definition = {
+                        "type": "function",
+                        "function": {
+                            "name": tool_name,
+                            "description": _describe(function),
+                            "parameters": {"type": "object", "properties": parameters, "required": required}
+                        }
+                    }
+                self._tools[tool_name] = RegisteredTool(
+                    tool_name, server_name, function, definition,
+                    compile_validator(tool_name, parameters, required, nullable)
+                )
+
+        for orphan in declared:
+            errors.append(f"Tool '{orphan}' is defined in {settings.TOOL_DEFINITION_PATH.name} but not served by any server.")
+        if errors:
+            raise ToolRegistryError("Tool registry drift detected:\n- " + "\n- ".join(errors))
+        logger.info(f"Tool registry compiled with {len(self._tools)} tools.")
+
+    @staticmethod
+    def _resolve_method(server: Any, tool_name: str) -> Optional[Callable]:
+        # Most methods carry the full tool name; some (e.g. gmail) drop the service prefix
+        function = getattr(server, tool_name, None)
+        if function is None and "_" in tool_name:
+            function = getattr(server, tool_name.split("_", 1)[1], None)
+        return function if callable(function) else None
+
+    @staticmethod
+    def _signature_schema(function: Callable) -> Tuple[Dict[str, Any], List[str], set]:
+        hints = typing.get_type_hints(function)
+        parameters, required, nullable = {}, [], set()
+        for name, param in inspect.signature(function).parameters.items():
+            if param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+                continue
+            schema, is_nullable = schema_for_annotation(hints.get(name, Any))
+            parameters[name] = schema
+            if is_nullable or param.default is None:
+                nullable.add(name)
+            if param.default is inspect.Parameter.empty:
+                required.append(name)
+        return parameters, required, nullable
+
+    @staticmethod
+    def _check_definition(tool_name: str, definition: Dict[str, Any], parameters: Dict[str, Any], required: List[str]) -> List[str]:
+        errors = []
+        declared = definition.get("function", {}).get("parameters", {})
+        properties = declared.get("properties", {})
+        for name in properties:
+            if name not in parameters:
+                errors.append(f"Tool '{tool_name}' declares argument '{name}' that the method does not accept.")
+        for name in required:
+            if name not in properties:
+                errors.append(f"Tool '{tool_name}' does not declare required argument '{name}'.")
+        for name in declared.get("required", []):
+            if name not in parameters:
+                errors.append(f"Tool '{tool_name}' requires argument '{name}' that the method does not accept.")
+        return errors
+
+    @classmethod
+    def load(cls, servers: Dict[str, Any], config_path: Path = settings.MCP_CONFIG_PATH, definitions_path: Path = settings.TOOL_DEFINITION_PATH) -> "ToolRegistry":
+        """Builds the registry from the server config and, if present, the hand-written tool definitions.
+
+        Only servers present in `servers` are registered, so a single-server process can compile its own slice.
+        """
+        configured = load_server_tools(config_path)
+        server_tools = {name: tools for name, tools in configured.items() if name in servers}
+        definitions = None
+        if definitions_path.exists():
+            with open(definitions_path, 'r') as f:
+                definitions = json.load(f).get("tools", [])
+            if len(server_tools) < len(configured):
+                # Definitions of tools served elsewhere are not drift for a partial registry
+                served = {tool for tools in server_tools.values() for tool in tools}
+                definitions = [d for d in definitions if d.get("function", {}).get("name") in served]
+        else:
+            logger.info(f"{definitions_path.name} not found; deriving tool schemas from method signatures.")
+        return cls(servers, server_tools, definitions)
+
+    def get(self, tool_name: str) -> Optional[RegisteredTool]:
+        return self._tools.get(tool_name)
+
+    def definitions(self) -> List[Dict[str, Any]]:
+        return [tool.definition for tool in self._tools.values()]
+
+    def names(self) -> List[str]:
+        return list(self._tools)
@@ -0,0 +1,37 @@
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from ..config import settings
+
+SQLITE_PREFIX = "sqlite:///"
+
+
+def get_sqlite_path(database_url: Optional[str] = None) -> Path:
+    """Resolves the file path of the configured SQLite database."""
+    url = database_url or settings.DATABASE_URL
+    if not url.startswith(SQLITE_PREFIX):
+        raise ValueError(f"Local stores require a SQLite DATABASE_URL ({SQLITE_PREFIX}path/to/file.db), got '{url}'.")
+    return Path(url[len(SQLITE_PREFIX):])
+
+
+def connect_sqlite(path: Optional[Path] = None) -> sqlite3.Connection:
+    """Opens a connection to the local database. WAL lets readers run alongside a writer."""
+    db_path = path or get_sqlite_path()
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+@contextmanager
+def sqlite_session(path: Optional[Path] = None):
+    """Yields a connection inside a transaction that is committed on success and always closed."""
+    conn = connect_sqlite(path)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
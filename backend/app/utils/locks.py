@@ -0,0 +1,21 @@
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: multi-worker mode is not supported there, so a no-op lock is enough
+    fcntl = None
+
+
+@contextmanager
+def interprocess_lock(path: Path):
+    """Exclusive advisory lock on `path`, held across every worker process (and every thread) until exit."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
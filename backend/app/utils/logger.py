@@ -1,33 +1,179 @@
-import logging 
-from logging.handlers import RotatingFileHandler
+import atexit
+import json
+import logging
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
+from typing import Any, Dict, List
+
+from ..config import settings
+from .tracing import current_request_id
 
 #configuration
-LOG_DIR  = Path("logs")
-LOG_FILE = LOG_DIR/"app.log"
+LOG_FILE = Path(settings.LOG_FILE)
+LOG_DIR  = LOG_FILE.parent
 MAX_BYTES = 5*1024*1024
 BACKUP_COUNT = 5
-LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] - %(message)s'
+
+# Attributes every LogRecord has; anything else on a record came from `extra=` and is a structured field
+_RESERVED_ATTRS = frozenset(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime", "request_id"}
+
+
+def truncate(value: Any, limit: int) -> Any:
+    """Shortens long strings (and the repr of large containers) to `limit` characters."""
+    if limit <= 0 or isinstance(value, (bool, int, float)) or value is None:
+        return value
+    text = value if isinstance(value, str) else repr(value)
+    if len(text) <= limit:
+        return value
+    return f"{text[:limit]}... [{len(text) - limit} more chars]"
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps every record with the ID of the request being served ('-' outside requests)."""
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = current_request_id()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps only a fraction of INFO-and-below records from noisy loggers; warnings and errors always pass.
+
+    `rates` maps a logger name (or a dotted prefix of one) to the fraction to keep.
+    """
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._resolved: Dict[str, float] = {}
+
+    def _rate(self, name: str) -> float:
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate = 1.0
+            # Longest matching prefix wins so a module can override its package
+            for prefix in sorted(self.rates, key=len, reverse=True):
+                if name == prefix or name.startswith(prefix + "."):
+                    rate = self.rates[prefix]
+                    break
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO or not self.rates:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class TruncationFilter(logging.Filter):
+    """Renders the message once and cuts it, and any structured fields, down to `limit` characters."""
+    def __init__(self, limit: int):
+        super().__init__()
+        self.limit = limit
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.msg = truncate(record.getMessage(), self.limit)
+        record.args = None
+        for key, value in _extra_fields(record).items():
+            setattr(record, key, truncate(value, self.limit))
+        return True
+
+
+def _extra_fields(record: logging.LogRecord) -> Dict[str, Any]:
+    return {key: value for key, value in record.__dict__.items() if key not in _RESERVED_ATTRS}
+
+
+class TextFormatter(logging.Formatter):
+    """LOG_FORMAT lines with any `extra=` fields appended as key=value pairs."""
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        line = super().formatMessage(record)
+        fields = _extra_fields(record)
+        if not fields:
+            return line
+        return line + " | " + " ".join(f"{key}={value}" for key, value in fields.items())
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; fields passed with `extra=` are emitted as top-level keys."""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _PreparedQueueHandler(QueueHandler):
+    """Queues the record with its traceback rendered, leaving the message formatting to the listener thread."""
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _build_handlers() -> List[logging.Handler]:
+    formatter = JsonFormatter() if settings.LOG_FORMAT == "json" else TextFormatter(LOG_FORMAT)
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(formatter)
+
+    #file handler (the file is opened on the first record, not at import)
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    file_handler = RotatingFileHandler(
+        LOG_FILE,maxBytes=MAX_BYTES,backupCount=BACKUP_COUNT,encoding='utf-8',delay=True
+    )
+    file_handler.setFormatter(formatter)
+    return [console_handler, file_handler]
+
+
+_handlers: List[logging.Handler] = []
+_listener = None
+# Logger-level, so they run once per record in the calling thread (where the request ID is visible);
+# sampling goes first so dropped records skip the rest
+_filters: List[logging.Filter] = [
+    SamplingFilter(settings.LOG_SAMPLE_RATES),
+    RequestIdFilter(),
+    TruncationFilter(settings.LOG_MAX_FIELD_CHARS),
+]
+
+
+def _shared_handlers() -> List[logging.Handler]:
+    """Handlers shared by every named logger, so there is one file handle and (in async mode) one writer thread."""
+    global _listener
+    if not _handlers:
+        sinks = _build_handlers()
+        if settings.LOG_ASYNC:
+            # Request threads only enqueue; a listener thread does the formatting and disk writes
+            _listener = QueueListener(queue.SimpleQueue(), *sinks, respect_handler_level=True)
+            _listener.start()
+            atexit.register(_listener.stop)
+            _handlers.append(_PreparedQueueHandler(_listener.queue))
+        else:
+            _handlers.extend(sinks)
+    return _handlers
 
-LOG_DIR.mkdir(exist_ok=True)
 
 def get_logger(name:str = "agentic workspace")-> logging.Logger:
     """Returns a configured logger instance."""
     logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
+    logger.setLevel(settings.LOG_LEVEL.upper())
     if not logger.handlers:
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(logging.Formatter(LOG_FORMAT))
-        logger.addHandler(console_handler)
-
-        #file handler
-        file_handler = RotatingFileHandler(
-            LOG_FILE,maxBytes=MAX_BYTES,backupCount=BACKUP_COUNT,encoding='utf-8'
-        )
-        file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
-        logger.addHandler(file_handler)
+        for handler in _shared_handlers():
+            logger.addHandler(handler)
+        for log_filter in _filters:
+            logger.addFilter(log_filter)
 
     return logger
 
 
-root_logger = get_logger()
\ No newline at end of file
+root_logger = get_logger()
@@ -0,0 +1,85 @@
+"""Fast JSON encoding for API responses, with size-aware summaries of tool outputs."""
+import json
+from typing import Any, Dict, Iterator, List
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional: the stdlib encoder is slower on large outputs but produces the same JSON
+    orjson = None
+
+JSON_MEDIA_TYPE = "application/json"
+
+# Fields of a summarised output that stay verbatim, however the rest is reduced
+_SUMMARY_KEEP = ("status", "message", "error")
+
+
+def _default(value: Any) -> str:
+    # ISO 8601 for dates, as orjson writes them natively, so both encoders agree
+    isoformat = getattr(value, "isoformat", None)
+    return isoformat() if callable(isoformat) else str(value)
+
+
+def dumps(value: Any) -> bytes:
+    """Compact UTF-8 JSON; values JSON cannot represent (dates, sets, ...) are written as strings."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # e.g. integers beyond 64 bits, which only the stdlib encoder accepts
+            pass
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def exceeds(value: Any, limit: int) -> bool:
+    """Whether `value` serialises to roughly more than `limit` bytes; stops walking once it knows."""
+    pending, size = [value], 0
+    while pending:
+        item = pending.pop()
+        if isinstance(item, str):
+            size += len(item) + 3
+        elif isinstance(item, dict):
+            size += 2 + 4 * len(item) + sum(len(str(k)) for k in item)
+            pending.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            size += 2 + len(item)
+            pending.extend(item)
+        else:
+            size += 8
+        if size > limit:
+            return True
+    return False
+
+
+def summarize_output(value: Any, depth: int = 2) -> Any:
+    """Shape of a tool output without its bulk: scalars stay, lists become their length, nesting is cut at `depth`."""
+    if isinstance(value, dict):
+        if depth <= 0:
+            return {"keys": len(value)}
+        return {
+            k: (v if k in _SUMMARY_KEEP else summarize_output(v, depth - 1))
+            for k, v in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return {"count": len(value)}
+    if isinstance(value, str) and len(value) > 200:
+        return f"{value[:200]}…[+{len(value) - 200} chars]"
+    return value
+
+
+def iter_json_object(head: Dict[str, Any], key: str, items: List[Any]) -> Iterator[bytes]:
+    """Yields `{**head, key: items}` as JSON in pieces, one per item, so no single buffer holds all of it."""
+    yield dumps(head)[:-1] + (b"," if head else b"") + dumps(key) + b":["
+    for index, item in enumerate(items):
+        yield (b"," if index else b"") + dumps(item)
+    yield b"]}"
+
+
+class FastJSONResponse(Response):
+    """JSONResponse that encodes with `dumps` instead of the default json module."""
+    media_type = JSON_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
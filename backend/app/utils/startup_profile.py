@@ -0,0 +1,108 @@
+"""Startup profiling: where import time goes, and how long a fresh server takes to answer.
+
+Run from the backend directory:
+
+    python -m app.utils.startup_profile                      # import-time breakdown of app.main
+    python -m app.utils.startup_profile --first-request      # also time spawn -> first 200 from uvicorn
+    python -m app.utils.startup_profile --first-request --max-seconds 2.5
+
+With --max-seconds the command exits non-zero when time-to-first-request exceeds the limit, so it
+can run in CI as a regression check. Both measurements use fresh interpreters, so nothing already
+imported by this process skews them.
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+
+def _group(module: str) -> str:
+    # The app's own modules are reported individually; third-party packages are rolled up
+    parts = module.split(".")
+    return ".".join(parts[:3]) if parts[0] == "app" else parts[0]
+
+
+def import_breakdown(target: str = "app.main") -> Tuple[float, List[Tuple[str, float]]]:
+    """Imports `target` under -X importtime and returns (total seconds, [(package, self seconds)]) slowest first."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {target} failed:\n{proc.stderr[-2000:]}")
+    totals: Dict[str, float] = defaultdict(float)
+    total = 0.0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        totals[_group(name)] += int(self_us) / 1e6
+        if name == target:
+            total = int(cumulative_us) / 1e6
+    return total, sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_first_request(path: str = "/", timeout: float = 60.0) -> float:
+    """Seconds from spawning uvicorn until `path` returns 200."""
+    port = _free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=os.environ.copy(), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"Server exited during startup:\n{server.stderr.read().decode()[-2000:]}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.02)
+        raise TimeoutError(f"No 200 from {path} within {timeout:.0f}s")
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", default="app.main", help="module to import")
+    parser.add_argument("--top", type=int, default=15, help="rows of the breakdown to print")
+    parser.add_argument("--first-request", action="store_true", help="also measure time-to-first-request")
+    parser.add_argument("--path", default="/", help="path requested by --first-request")
+    parser.add_argument("--max-seconds", type=float, help="fail if time-to-first-request exceeds this")
+    args = parser.parse_args(argv)
+
+    total, rows = import_breakdown(args.target)
+    print(f"import {args.target}: {total:.3f}s")
+    for name, seconds in rows[:args.top]:
+        print(f"  {seconds:8.3f}s  {name}")
+
+    if args.first_request or args.max_seconds is not None:
+        elapsed = time_to_first_request(args.path)
+        print(f"time to first request ({args.path}): {elapsed:.3f}s")
+        if args.max_seconds is not None and elapsed > args.max_seconds:
+            print(f"FAIL: exceeds the {args.max_seconds:.2f}s budget")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""Request-scoped tracing.
+
+The HTTP middleware opens a root span per request; span() nests child spans under whatever span is
+current in the calling context. The request ID and the current span live in contextvars, so they
+follow the request into helper threads that are started with contextvars.copy_context().run.
+
+Sampling is decided once per request (TRACE_SAMPLE_RATE). Unsampled requests still get a request
+ID for log correlation, but their spans are a shared no-op object and cost nothing to create.
+Finished spans are written by a background thread to TRACE_FILE as JSON lines in the OpenTelemetry
+span shape (traceId, spanId, parentSpanId, startTimeUnixNano, attributes, status, ...).
+"""
+import json
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from ..config import settings
+
+_request_id: ContextVar[str] = ContextVar("request_id", default="-")
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+def new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+def current_request_id() -> str:
+    return _request_id.get()
+
+
+def _otel_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_span_id", "name", "kind", "start_ns", "end_ns", "attributes", "status", "status_message")
+
+    def __init__(self, trace_id: str, parent_span_id: str, name: str, kind: str, attributes: Dict[str, Any]):
+        self.trace_id = trace_id
+        self.span_id = new_id(8)
+        self.parent_span_id = parent_span_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.status = "STATUS_CODE_UNSET"
+        self.status_message = ""
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException):
+        self.status = "STATUS_CODE_ERROR"
+        self.status_message = f"{type(error).__name__}: {error}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id,
+            "name": self.name,
+            "kind": f"SPAN_KIND_{self.kind}",
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": k, "value": _otel_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": self.status, "message": self.status_message} if self.status_message else {"code": self.status},
+        }
+
+
+class _NoopSpan:
+    """Stand-in for spans of unsampled requests."""
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def record_error(self, error: BaseException):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class JsonLinesExporter:
+    """Appends finished spans to a file from a daemon thread so request threads never wait on disk."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._queue: "queue.SimpleQueue[Optional[Span]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                    self._thread.start()
+        self._queue.put(span)
+
+    def _run(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                span = self._queue.get()
+                lines = [json.dumps(span.to_dict())]
+                # Drain whatever else is ready so a burst becomes one write
+                while True:
+                    try:
+                        lines.append(json.dumps(self._queue.get_nowait().to_dict()))
+                    except queue.Empty:
+                        break
+                f.write("\n".join(lines) + "\n")
+                f.flush()
+
+
+exporter = JsonLinesExporter(settings.TRACE_FILE)
+
+
+@contextmanager
+def _activate(span: Span):
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end_ns = time.time_ns()
+        exporter.export(span)
+
+
+@contextmanager
+def request_span(name: str, request_id: Optional[str] = None, kind: str = "SERVER", **attributes):
+    """Starts a new trace for one request (or background job) and makes its ID the log correlation ID."""
+    trace_id = new_id(16)
+    request_id = request_id or trace_id[:16]
+    token = _request_id.set(request_id)
+    try:
+        if not settings.TRACE_ENABLED or random.random() >= settings.TRACE_SAMPLE_RATE:
+            span_token = _current_span.set(None)
+            try:
+                yield NOOP_SPAN
+            finally:
+                _current_span.reset(span_token)
+            return
+        attributes["request.id"] = request_id
+        attributes.setdefault("service.name", settings.PROJECT_NAME)
+        with _activate(Span(trace_id, "", name, kind, attributes)) as span:
+            yield span
+    finally:
+        _request_id.reset(token)
+
+
+@contextmanager
+def span(name: str, kind: str = "INTERNAL", **attributes):
+    """Child span of the current span; a no-op outside a sampled request."""
+    parent = _current_span.get()
+    if parent is None:
+        yield NOOP_SPAN
+        return
+    with _activate(Span(parent.trace_id, parent.span_id, name, kind, attributes)) as child:
+        yield child
@@ -0,0 +1,234 @@
+"""Local fake of the Gmail, Calendar, Docs, Sheets and Forms REST endpoints the MCP servers call.
+
+The app talks to it when GOOGLE_API_ENDPOINT points here: every API is then served from
+{endpoint}/{api}/ with the request paths of the bundled discovery documents. Latency, error rate
+and payload sizes are configurable so workloads can exercise slow, flaky or very large accounts.
+Data is generated deterministically from the ids in the request; writes are accepted and counted
+but not stored.
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+from .fake_openai import Behaviour
+
+
+class GoogleData:
+    """Sizes of the generated account."""
+
+    def __init__(self, inbox: int = 200, events: int = 20, doc_paragraphs: int = 50, sheet_rows: int = 1000, sheet_cols: int = 10, form_responses: int = 500, form_questions: int = 5, page_size: int = 100):
+        self.inbox = inbox
+        self.events = events
+        self.doc_paragraphs = doc_paragraphs
+        self.sheet_rows = sheet_rows
+        self.sheet_cols = sheet_cols
+        self.form_responses = form_responses
+        self.form_questions = form_questions
+        self.page_size = page_size
+
+
+def _column_index(letters: str) -> int:
+    index = 0
+    for ch in letters.upper():
+        index = index * 26 + (ord(ch) - ord("A") + 1)
+    return index - 1
+
+
+def _cell_window(a1_range: str, data: GoogleData) -> Tuple[int, int, int, int]:
+    """(first row, last row, first col, last col), zero-based and inclusive, clipped to the sheet."""
+    cells = unquote(a1_range).rpartition("!")[2]
+    bounds = [re.match(r"^([A-Za-z]{0,3})(\d*)$", part) for part in cells.split(":")[:2]]
+    # A bare sheet name such as 'Sheet1' is the whole sheet; a single cell is its own end
+    groups = [m.groups() for m in bounds] if all(bounds) else [("", "")]
+    (l0, d0), (l1, d1) = groups[0], groups[-1]
+    c0 = _column_index(l0) if l0 else 0
+    r0 = int(d0) - 1 if d0 else 0
+    c1 = _column_index(l1) if l1 else data.sheet_cols - 1
+    r1 = int(d1) - 1 if d1 else data.sheet_rows - 1
+    return r0, min(r1, data.sheet_rows - 1), c0, min(c1, data.sheet_cols - 1)
+
+
+def _form(form_id: str, data: GoogleData) -> Dict[str, Any]:
+    items = [
+        {"itemId": f"i{q}", "title": f"Question {q + 1}",
+         "questionItem": {"question": {"questionId": f"q{q}", **({"scaleQuestion": {"low": 1, "high": 10}} if q % 2 else {"textQuestion": {}})}}}
+        for q in range(data.form_questions)
+    ]
+    return {"formId": form_id, "info": {"title": f"Form {form_id}"}, "items": items, "responderUri": f"https://forms.example/{form_id}"}
+
+
+def _form_response(form_id: str, n: int, data: GoogleData) -> Dict[str, Any]:
+    submitted = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(1700000000 + n * 60)) + "Z"
+    answers = {
+        f"q{q}": {"questionId": f"q{q}", "textAnswers": {"answers": [{"value": str((n * 7 + q) % 10 + 1) if q % 2 else f"answer {n}-{q}"}]}}
+        for q in range(data.form_questions)
+    }
+    return {"responseId": f"{form_id}-r{n:06d}", "createTime": submitted, "lastSubmittedTime": submitted, "answers": answers}
+
+
+def _page(items: List[Any], query: Dict[str, str], size: int, key: str) -> Dict[str, Any]:
+    offset = int(query.get("pageToken") or 0)
+    body = {key: items[offset:offset + size]}
+    if offset + size < len(items):
+        body["nextPageToken"] = str(offset + size)
+    return body
+
+
+Route = Tuple[str, "re.Pattern[str]", Callable[..., Any]]
+
+
+class FakeGoogle:
+    def __init__(self, behaviour: Optional[Behaviour] = None, data: Optional[GoogleData] = None):
+        self.behaviour = behaviour or Behaviour()
+        self.data = data or GoogleData()
+        self.requests: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._ids = 0
+        self.routes: List[Route] = [
+            ("POST", re.compile(r"^/gmail/gmail/v1/users/[^/]+/messages/send$"), self.gmail_send),
+            ("GET", re.compile(r"^/gmail/gmail/v1/users/[^/]+/messages$"), self.gmail_list),
+            ("GET", re.compile(r"^/gmail/gmail/v1/users/[^/]+/messages/(?P<id>[^/]+)$"), self.gmail_get),
+            ("GET", re.compile(r"^/calendar/calendars/[^/]+/events$"), self.calendar_list),
+            ("POST", re.compile(r"^/calendar/calendars/[^/]+/events$"), self.calendar_insert),
+            ("DELETE", re.compile(r"^/calendar/calendars/[^/]+/events/[^/]+$"), lambda query, body: {}),
+            ("POST", re.compile(r"^/docs/v1/documents$"), self.docs_create),
+            ("GET", re.compile(r"^/docs/v1/documents/(?P<id>[^/:]+)$"), self.docs_get),
+            ("POST", re.compile(r"^/docs/v1/documents/[^/]+:batchUpdate$"), lambda query, body: {"replies": []}),
+            ("POST", re.compile(r"^/sheets/v4/spreadsheets$"), self.sheets_create),
+            ("GET", re.compile(r"^/sheets/v4/spreadsheets/[^/]+/values/(?P<a1>[^/:]+)$"), self.sheets_get),
+            ("PUT", re.compile(r"^/sheets/v4/spreadsheets/[^/]+/values/(?P<a1>[^/:]+)$"), self.sheets_update),
+            ("POST", re.compile(r"^/sheets/v4/spreadsheets/[^/]+/values/(?P<a1>[^/:]+):append$"), self.sheets_update),
+            ("POST", re.compile(r"^/sheets/v4/spreadsheets/[^/]+/values:batchUpdate$"), self.sheets_batch_update),
+            ("POST", re.compile(r"^/forms/v1/forms$"), self.forms_create),
+            ("GET", re.compile(r"^/forms/v1/forms/(?P<id>[^/:]+)$"), lambda query, body, id: _form(id, self.data)),
+            ("POST", re.compile(r"^/forms/v1/forms/[^/]+:batchUpdate$"), lambda query, body: {"replies": []}),
+            ("GET", re.compile(r"^/forms/v1/forms/(?P<id>[^/]+)/responses$"), self.forms_responses),
+        ]
+
+    def _next_id(self, prefix: str) -> str:
+        with self._lock:
+            self._ids += 1
+            return f"{prefix}{self._ids}"
+
+    # --- Gmail ---
+    def gmail_list(self, query, body):
+        limit = min(int(query.get("maxResults", 100)), self.data.inbox)
+        return {"messages": [{"id": f"m{n}", "threadId": f"t{n}"} for n in range(limit)], "resultSizeEstimate": self.data.inbox}
+
+    def gmail_get(self, query, body, id):
+        return {
+            "id": id, "threadId": id, "snippet": f"Snippet of message {id} " + "lorem ipsum " * 10,
+            "payload": {"headers": [{"name": "Subject", "value": f"Subject {id}"}, {"name": "From", "value": f"sender-{id}@example.com"}]}
+        }
+
+    def gmail_send(self, query, body):
+        return {"id": self._next_id("sent"), "labelIds": ["SENT"]}
+
+    # --- Calendar ---
+    def calendar_list(self, query, body):
+        limit = min(int(query.get("maxResults", 250)), self.data.events)
+        items = [
+            {"id": f"e{n}", "summary": f"Meeting {n}", "location": "Room 1",
+             "start": {"dateTime": f"2030-01-01T{9 + n % 8:02d}:00:00Z"}, "end": {"dateTime": f"2030-01-01T{10 + n % 8:02d}:00:00Z"}}
+            for n in range(limit)
+        ]
+        return {"items": items}
+
+    def calendar_insert(self, query, body):
+        event_id = self._next_id("e")
+        return {**(body or {}), "id": event_id, "htmlLink": f"https://calendar.example/{event_id}"}
+
+    # --- Docs ---
+    def docs_create(self, query, body):
+        return {"documentId": self._next_id("doc"), "title": (body or {}).get("title", "")}
+
+    def docs_get(self, query, body, id):
+        content = [
+            {"endIndex": n + 2, "paragraph": {"elements": [{"textRun": {"content": f"Paragraph {n} of {id}. " + "Text " * 20 + "\n"}}]}}
+            for n in range(self.data.doc_paragraphs)
+        ]
+        return {"documentId": id, "title": f"Document {id}", "body": {"content": content}}
+
+    # --- Sheets ---
+    def sheets_create(self, query, body):
+        spreadsheet_id = self._next_id("sheet")
+        return {"spreadsheetId": spreadsheet_id, "spreadsheetUrl": f"https://sheets.example/{spreadsheet_id}"}
+
+    def sheets_get(self, query, body, a1):
+        r0, r1, c0, c1 = _cell_window(a1, self.data)
+        values = [[f"r{r}c{c}" if r else f"Column {c}" for c in range(c0, c1 + 1)] for r in range(r0, r1 + 1)]
+        return {"range": unquote(a1), "majorDimension": "ROWS", "values": values}
+
+    def sheets_update(self, query, body, a1):
+        values = (body or {}).get("values", [])
+        cells = sum(len(row) for row in values)
+        updates = {"updatedRange": unquote(a1), "updatedRows": len(values), "updatedCells": cells}
+        return {**updates, "updates": updates}
+
+    def sheets_batch_update(self, query, body):
+        cells = sum(len(row) for vr in (body or {}).get("data", []) for row in vr.get("values", []))
+        return {"totalUpdatedCells": cells, "responses": []}
+
+    # --- Forms ---
+    def forms_create(self, query, body):
+        form_id = self._next_id("form")
+        return {"formId": form_id, "info": (body or {}).get("info", {}), "responderUri": f"https://forms.example/{form_id}"}
+
+    def forms_responses(self, query, body, id):
+        responses = [_form_response(id, n, self.data) for n in range(self.data.form_responses)]
+        watermark = re.match(r"timestamp >= (\S+)", query.get("filter", ""))
+        if watermark:
+            responses = [r for r in responses if r["lastSubmittedTime"] >= watermark.group(1)]
+        return _page(responses, query, int(query.get("pageSize", self.data.page_size)), "responses")
+
+    def handle(self, method: str, path: str, query: Dict[str, str], body: Any) -> Tuple[int, Any]:
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(path) if route_method == method else None
+            if match:
+                with self._lock:
+                    self.requests[pattern.pattern] = self.requests.get(pattern.pattern, 0) + 1
+                return 200, handler(query, body, **match.groupdict())
+        return 404, {"error": {"code": 404, "message": f"No fake for {method} {path}", "status": "NOT_FOUND"}}
+
+
+def _handler(fake: FakeGoogle):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _serve(self):
+            url = urlparse(self.path)
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            fake.behaviour.delay()
+            status, body = fake.behaviour.injected_error()
+            if status is None:
+                query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                try:
+                    status, body = fake.handle(self.command, url.path, query, json.loads(raw) if raw else None)
+                except Exception as e:
+                    status, body = 500, {"error": {"code": 500, "message": f"Fake failed: {e}", "status": "INTERNAL"}}
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=UTF-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        do_GET = do_POST = do_PUT = do_DELETE = _serve
+
+    return Handler
+
+
+def serve(fake: FakeGoogle, port: int = 0) -> ThreadingHTTPServer:
+    """Starts the fake on a daemon thread and returns the server; its URL is http://127.0.0.1:{server.server_port}."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), _handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-google", daemon=True).start()
+    return server
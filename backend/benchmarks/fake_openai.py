@@ -0,0 +1,165 @@
+"""Local stub of the OpenAI chat completions API, scripted by the prompt.
+
+The app talks to it when OPENAI_BASE_URL points at {url}/v1. A user message of the form
+
+    BENCH {"tools": [{"name": "gsheet_read_sheet", "arguments": {...}}, ...], "answer": "..."}
+
+makes the planning call return exactly those tool calls (streamed or not, as requested), and the
+follow-up call that carries the tool results return `answer`. Any other message gets a plain text
+reply, so the stub also serves chats that need no tools.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+SCRIPT_PREFIX = "BENCH "
+
+
+class Behaviour:
+    """Latency and failure injection shared by the fakes."""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0, error_status: int = 503, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self):
+        with self._lock:
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        seconds = max(0.0, self.latency_ms + jitter) / 1000
+        if seconds:
+            time.sleep(seconds)
+
+    def injected_error(self) -> Tuple[Optional[int], Any]:
+        with self._lock:
+            failed = self.error_rate and self._random.random() < self.error_rate
+        if not failed:
+            return None, None
+        return self.error_status, {"error": {"code": self.error_status, "message": "Injected failure", "status": "UNAVAILABLE"}}
+
+
+def script_of(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    user = next((m.get("content") or "" for m in messages if m.get("role") == "user"), "")
+    if isinstance(user, str) and user.startswith(SCRIPT_PREFIX):
+        return json.loads(user[len(SCRIPT_PREFIX):])
+    return {"tools": [], "answer": f"Echo: {user}"[:200]}
+
+
+def _usage(messages: List[Dict[str, Any]], completion: str) -> Dict[str, int]:
+    # Roughly four characters per token, which is all a benchmark needs
+    prompt = sum(len(json.dumps(m)) for m in messages) // 4
+    return {"prompt_tokens": prompt, "completion_tokens": len(completion) // 4 + 1, "total_tokens": prompt + len(completion) // 4 + 1}
+
+
+class FakeOpenAI:
+    def __init__(self, behaviour: Optional[Behaviour] = None):
+        self.behaviour = behaviour or Behaviour()
+        self.calls = {"plan": 0, "summary": 0, "text": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, kind: str):
+        with self._lock:
+            self.calls[kind] += 1
+
+    def complete(self, request: Dict[str, Any]) -> Tuple[Optional[List[Dict[str, Any]]], str, Dict[str, int]]:
+        """Returns (tool calls or None, text, usage) for a chat completion request."""
+        messages = request.get("messages", [])
+        script = script_of(messages)
+        if any(m.get("role") == "tool" for m in messages):
+            self._count("summary")
+            text = script.get("answer", "Done.")
+            return None, text, _usage(messages, text)
+        if script.get("tools") and request.get("tools"):
+            self._count("plan")
+            calls = [
+                {"id": f"call_{i}", "type": "function", "function": {"name": t["name"], "arguments": json.dumps(t.get("arguments", {}))}}
+                for i, t in enumerate(script["tools"])
+            ]
+            return calls, "", _usage(messages, json.dumps(calls))
+        self._count("text")
+        text = script.get("answer", "Done.")
+        return None, text, _usage(messages, text)
+
+
+def _completion(model: str, tool_calls, text: str, usage: Dict[str, int]) -> Dict[str, Any]:
+    message = {"role": "assistant", "content": None if tool_calls else text}
+    if tool_calls:
+        message["tool_calls"] = tool_calls
+    return {
+        "id": "chatcmpl-bench", "object": "chat.completion", "created": int(time.time()), "model": model,
+        "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if tool_calls else "stop"}],
+        "usage": usage,
+    }
+
+
+def _chunks(model: str, tool_calls, text: str, usage: Dict[str, int]):
+    base = {"id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+    if tool_calls:
+        for index, call in enumerate(tool_calls):
+            arguments = call["function"]["arguments"]
+            # Name first, then the arguments in two pieces, the way the real API streams them
+            pieces = [{"id": call["id"], "type": "function", "function": {"name": call["function"]["name"], "arguments": ""}},
+                      {"function": {"arguments": arguments[:len(arguments) // 2]}},
+                      {"function": {"arguments": arguments[len(arguments) // 2:]}}]
+            for piece in pieces:
+                yield {**base, "choices": [{"index": 0, "delta": {"tool_calls": [{"index": index, **piece}]}, "finish_reason": None}]}
+        finish = "tool_calls"
+    else:
+        for word in text.split(" "):
+            yield {**base, "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}
+        finish = "stop"
+    yield {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": finish}]}
+    yield {**base, "choices": [], "usage": usage}
+
+
+def _handler(fake: FakeOpenAI):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _json(self, status: int, body: Any):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                return self._json(404, {"error": {"message": f"No stub for {self.path}"}})
+            fake.behaviour.delay()
+            status, error = fake.behaviour.injected_error()
+            if status is not None:
+                return self._json(status, error)
+            tool_calls, text, usage = fake.complete(request)
+            model = request.get("model", "bench")
+            if not request.get("stream"):
+                return self._json(200, _completion(model, tool_calls, text, usage))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for chunk in _chunks(model, tool_calls, text, usage):
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.close_connection = True
+
+    return Handler
+
+
+def serve(fake: FakeOpenAI, port: int = 0) -> ThreadingHTTPServer:
+    """Starts the stub on a daemon thread; point OPENAI_BASE_URL at http://127.0.0.1:{server.server_port}/v1."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), _handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True).start()
+    return server
@@ -0,0 +1,252 @@
+"""Offline end-to-end benchmark: the real app against a fake LLM and fake Google APIs.
+
+Run from the backend directory:
+
+    python -m benchmarks.run --workload multi_tool --concurrency 1,4,16 --requests 50
+    python -m benchmarks.run --workload large_sheet --google-latency-ms 120 --google-error-rate 0.02 --label flaky
+    python -m benchmarks.run --compare benchmarks/results/A.json benchmarks/results/B.json
+
+The fakes run in this process; the app runs in a fresh uvicorn process configured through its
+environment (OPENAI_BASE_URL, GOOGLE_API_ENDPOINT, a throwaway token, database, log and trace file), so
+nothing touches real accounts or the working tree. Each concurrency level sends --requests chats
+and reports throughput and p50/p95/p99 latency. Results are written as JSON under
+benchmarks/results/ so runs can be compared.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import fake_google, fake_openai
+from .workloads import WORKLOADS
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def percentile(samples: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile, q in [0, 100]."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[max(0, min(len(ordered) - 1, round(q / 100 * len(ordered) + 0.5) - 1))]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _fake_token(path: Path):
+    # Far-future expiry, so the app never tries to refresh it against Google
+    path.write_text(json.dumps({
+        "token": "bench-token", "refresh_token": "bench-refresh", "client_id": "bench", "client_secret": "bench",
+        "token_uri": "http://127.0.0.1:9/token", "expiry": "2099-01-01T00:00:00Z"
+    }))
+
+
+def start_app(workdir: Path, openai_url: str, google_url: str, extra_env: Dict[str, str]) -> Tuple[subprocess.Popen, str]:
+    token = workdir / "token.json"
+    _fake_token(token)
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": "bench", "OPENAI_BASE_URL": openai_url, "ANTHROPIC_API_KEY": "", "LLM_PROVIDER": "openai",
+        "GOOGLE_CLIENT_ID": "bench", "GOOGLE_CLIENT_SECRET": "bench", "GOOGLE_API_ENDPOINT": google_url,
+        "TOKEN_PATH": str(token), "DATABASE_URL": f"sqlite:///{workdir / 'bench.db'}",
+        "LOG_FILE": str(workdir / "app.log"), "TRACE_FILE": str(workdir / "traces.jsonl"),
+        "LOG_LEVEL": "WARNING", "STARTUP_WARMUP": "blocking",
+        # Measured runs start cold unless a run opts in with --env PREFETCH_ENABLED=true
+        "PREFETCH_ENABLED": "false",
+        **extra_env,
+    }
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    base = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    while time.perf_counter() - started < 120:
+        if server.poll() is not None:
+            raise RuntimeError(f"App exited during startup:\n{server.stderr.read().decode()[-2000:]}")
+        try:
+            with urllib.request.urlopen(f"{base}/ready", timeout=1) as response:
+                if response.status == 200:
+                    return server, base
+        except OSError:
+            time.sleep(0.05)
+    server.terminate()
+    raise TimeoutError("App did not become ready within 120s")
+
+
+def chat_once(base: str, message: str, user: str, timeout: float, detail: str = "") -> Tuple[int, float, int]:
+    """(HTTP status, seconds, response bytes) of one chat request; status 0 means a transport error."""
+    headers = {"Content-Type": "application/json", "X-User-ID": user}
+    if detail:
+        headers["X-Chat-Detail"] = detail
+    request = urllib.request.Request(
+        f"{base}/api/v1/chat", data=json.dumps({"message": message}).encode(), headers=headers, method="POST"
+    )
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            size = len(response.read())
+            return response.status, time.perf_counter() - started, size
+    except urllib.error.HTTPError as e:
+        e.read()
+        return e.code, time.perf_counter() - started, 0
+    except OSError:
+        return 0, time.perf_counter() - started, 0
+
+
+def run_level(base: str, workload: str, concurrency: int, requests: int, users: int, timeout: float, offset: int, detail: str = "") -> Dict[str, Any]:
+    make = WORKLOADS[workload]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(
+            lambda n: chat_once(base, make(offset + n), f"user{n % users}", timeout, detail),
+            range(requests)
+        ))
+    wall = time.perf_counter() - started
+    ok = [seconds for status, seconds, _ in results if status == 200]
+    errors: Dict[str, int] = {}
+    for status, _, _ in results:
+        if status != 200:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "ok": len(ok),
+        "errors": errors,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(ok) / wall, 3) if wall else 0.0,
+        "mean": round(sum(ok) / len(ok), 4) if ok else None,
+        **{f"p{q}": (round(percentile(ok, q), 4) if ok else None) for q in (50, 95, 99)},
+        "response_bytes_mean": round(sum(size for *_, size in results) / len(results)) if results else 0,
+    }
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    llm = fake_openai.FakeOpenAI(fake_openai.Behaviour(args.llm_latency_ms, args.llm_jitter_ms, args.llm_error_rate, seed=args.seed))
+    google = fake_google.FakeGoogle(
+        fake_openai.Behaviour(args.google_latency_ms, args.google_jitter_ms, args.google_error_rate, args.google_error_status, seed=args.seed),
+        fake_google.GoogleData(inbox=args.inbox, sheet_rows=args.sheet_rows, sheet_cols=args.sheet_cols, form_responses=args.form_responses)
+    )
+    llm_server = fake_openai.serve(llm)
+    google_server = fake_google.serve(google)
+    extra_env = dict(item.split("=", 1) for item in args.env)
+    with tempfile.TemporaryDirectory(prefix="bench-") as workdir:
+        app, base = start_app(
+            Path(workdir), f"http://127.0.0.1:{llm_server.server_port}/v1",
+            f"http://127.0.0.1:{google_server.server_port}", extra_env
+        )
+        try:
+            levels, offset = [], 0
+            for concurrency in args.concurrency:
+                level = run_level(base, args.workload, concurrency, args.requests, args.users, args.timeout, offset, args.detail)
+                offset += args.requests
+                levels.append(level)
+                print(_format_level(level))
+        finally:
+            app.terminate()
+            app.wait(timeout=30)
+            llm_server.shutdown()
+            google_server.shutdown()
+    return {
+        "label": args.label,
+        "workload": args.workload,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": _git_revision(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("compare", "output")},
+        "levels": levels,
+        "llm_calls": llm.calls,
+        "google_requests": sum(google.requests.values()),
+    }
+
+
+def _format_level(level: Dict[str, Any]) -> str:
+    def ms(value):
+        return f"{value * 1000:8.1f}" if value is not None else "       -"
+    errors = ", ".join(f"{k}x{v}" for k, v in level["errors"].items()) or "-"
+    return (f"c={level['concurrency']:<4} ok={level['ok']:<5} rps={level['throughput_rps']:8.2f}  "
+            f"p50={ms(level['p50'])}ms p95={ms(level['p95'])}ms p99={ms(level['p99'])}ms  errors={errors}")
+
+
+def compare(old_path: Path, new_path: Path) -> str:
+    old, new = json.loads(old_path.read_text()), json.loads(new_path.read_text())
+    lines = [f"{old.get('label') or old_path.name} -> {new.get('label') or new_path.name} ({new['workload']})"]
+
+    def delta(a, b):
+        return f"{(b - a) / a * 100:+6.1f}%" if a and b is not None else "     -"
+
+    old_levels = {level["concurrency"]: level for level in old["levels"]}
+    for level in new["levels"]:
+        before = old_levels.get(level["concurrency"])
+        if before is None:
+            continue
+        lines.append(
+            f"c={level['concurrency']:<4} rps {before['throughput_rps']:.2f} -> {level['throughput_rps']:.2f} ({delta(before['throughput_rps'], level['throughput_rps'])})"
+            + "".join(f"  {q} {delta(before[q], level[q])}" for q in ("p50", "p95", "p99"))
+        )
+    return "\n".join(lines)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workload", choices=sorted(WORKLOADS), default="multi_tool")
+    parser.add_argument("--concurrency", type=lambda s: [int(c) for c in s.split(",")], default=[1, 4, 16], help="comma-separated levels")
+    parser.add_argument("--requests", type=int, default=40, help="chats per concurrency level")
+    parser.add_argument("--users", type=int, default=4, help="distinct X-User-ID values to spread requests over")
+    parser.add_argument("--timeout", type=float, default=120.0, help="client timeout per chat")
+    parser.add_argument("--detail", choices=["none", "summary", "full"], default="", help="tool_details level to request (default: the app's)")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=50.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--google-latency-ms", type=float, default=80.0)
+    parser.add_argument("--google-jitter-ms", type=float, default=20.0)
+    parser.add_argument("--google-error-rate", type=float, default=0.0)
+    parser.add_argument("--google-error-status", type=int, default=503)
+    parser.add_argument("--inbox", type=int, default=200, help="messages in the fake mailbox")
+    parser.add_argument("--sheet-rows", type=int, default=5000)
+    parser.add_argument("--sheet-cols", type=int, default=10)
+    parser.add_argument("--form-responses", type=int, default=500)
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE", help="extra app setting, e.g. --env CHAT_MAX_CONCURRENT=16")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--label", default="", help="name stored with the results")
+    parser.add_argument("--output", type=Path, help="results file (default: benchmarks/results/<time>-<workload>[-label].json)")
+    parser.add_argument("--compare", nargs=2, type=Path, metavar=("OLD", "NEW"), help="compare two results files and exit")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        print(compare(*args.compare))
+        return 0
+
+    results = benchmark(args)
+    output = args.output or RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{args.workload}{'-' + args.label if args.label else ''}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"LLM calls: {results['llm_calls']}  Google requests: {results['google_requests']}")
+    print(f"Results written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
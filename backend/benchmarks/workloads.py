@@ -0,0 +1,44 @@
+"""Scripted chat workloads for the fake LLM.
+
+Each workload turns a request number into a chat message that makes the stub plan a fixed set of
+tool calls. Ids vary with the request number so the read cache does not serve every request;
+`cache_hits` deliberately repeats one read.
+"""
+import json
+from typing import Any, Callable, Dict, List
+
+from .fake_openai import SCRIPT_PREFIX
+
+
+def script(tools: List[Dict[str, Any]], answer: str = "Done.") -> str:
+    return SCRIPT_PREFIX + json.dumps({"tools": tools, "answer": answer})
+
+
+def _call(name: str, **arguments) -> Dict[str, Any]:
+    return {"name": name, "arguments": arguments}
+
+
+WORKLOADS: Dict[str, Callable[[int], str]] = {
+    # One LLM round trip, no tools
+    "no_tool": lambda n: script([], f"Plain answer {n}."),
+    "single_tool": lambda n: script([_call("gdocs_read_document", document_id=f"doc{n}")]),
+    # Independent reads the orchestrator can run in parallel
+    "multi_tool": lambda n: script([
+        _call("gmail_read_emails", query=f"bench {n}", max_results=5),
+        _call("calendar_list_events", max_results=10),
+        _call("gdocs_read_document", document_id=f"doc{n}"),
+    ]),
+    "large_sheet": lambda n: script([_call("gsheet_read_sheet", spreadsheet_id=f"sheet{n}", range="Sheet1!A1:J5000")]),
+    # One list call plus one metadata get per message
+    "many_emails": lambda n: script([_call("gmail_read_emails", query=f"bench {n}", max_results=50)]),
+    # Paged ingestion into the local response store, then aggregates
+    "form_responses": lambda n: script([_call("gforms_get_responses", form_id=f"form{n}")]),
+    "sheet_write": lambda n: script([_call("gsheet_update_sheet", spreadsheet_id=f"sheet{n}", range="Sheet1!A1", values=[[f"r{r}c{c}" for c in range(5)] for r in range(200)])]),
+    "cache_hits": lambda n: script([_call("gdocs_read_document", document_id="doc-shared")]),
+    # One execute_plan call: read rows, then email each one, with no LLM call between the steps
+    "plan_fanout": lambda n: script([_call("execute_plan", steps=[
+        {"id": "rows", "tool": "gsheet_read_sheet", "args": {"spreadsheet_id": f"sheet{n}", "range": "Sheet1!A1:B10"}},
+        {"id": "mails", "tool": "gmail_send_email", "for_each": "${rows.values}",
+         "args": {"recipient": "${item.1}@example.com", "subject": "Row ${index}", "body": "Hello ${item.0}"}},
+    ])]),
+}
@@ -0,0 +1,21 @@
+import os
+import sys
+from pathlib import Path
+
+# Settings are read when `app.config` is first imported; these stand in for the .env of a real deployment
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("GOOGLE_CLIENT_ID", "test")
+os.environ.setdefault("GOOGLE_CLIENT_SECRET", "test")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+from app.config import settings
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """Points the local SQLite stores at a fresh database file."""
+    monkeypatch.setattr(settings, "DATABASE_URL", f"sqlite:///{tmp_path / 'test.db'}")
+    return tmp_path / "test.db"
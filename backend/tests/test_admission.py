@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from app.services.admission import AdmissionController, AdmissionRejected
+
+
+async def _chat(controller, user, order, name, release=None, deadline=30.0):
+    async with controller.slot(user, deadline):
+        order.append(name)
+        if release is not None:
+            await release.wait()
+        else:
+            await asyncio.sleep(0)
+
+
+def test_queue_is_fair_across_users():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=10, max_per_user=0, expected_seconds=0.01)
+        order, release = [], asyncio.Event()
+        blocker = asyncio.create_task(_chat(controller, "alice", order, "a0", release))
+        await asyncio.sleep(0)
+        # alice queues a burst before bob asks once; her running chat already counts, so bob goes next
+        tasks = [asyncio.create_task(_chat(controller, "alice", order, f"a{i}")) for i in (1, 2, 3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(_chat(controller, "bob", order, "b0")))
+        await asyncio.sleep(0)
+        assert controller.status()["queued"] == 4
+        release.set()
+        await asyncio.gather(blocker, *tasks)
+        return order, controller
+
+    order, controller = asyncio.run(scenario())
+    assert order == ["a0", "b0", "a1", "a2", "a3"]
+    assert controller.status()["running"] == 0 and controller.status()["users"] == 0
+    # Nobody is active any more, so no fairness tags are kept
+    assert controller._user_finish == {}
+
+
+def test_rejects_beyond_the_per_user_limit():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=10, max_per_user=2, expected_seconds=0.01)
+        order, release = [], asyncio.Event()
+        first = asyncio.create_task(_chat(controller, "alice", order, "a0", release))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(_chat(controller, "alice", order, "a1"))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await _chat(controller, "alice", order, "a2")
+        # Another user is not affected by alice's limit
+        other = asyncio.create_task(_chat(controller, "bob", order, "b0"))
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(first, second, other)
+        return rejected.value, order
+
+    rejected, order = asyncio.run(scenario())
+    assert rejected.status_code == 429
+    assert rejected.retry_after >= 1
+    assert sorted(order) == ["a0", "a1", "b0"]
+
+
+def test_rejects_when_the_queue_is_full():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=1, max_per_user=0, expected_seconds=0.01)
+        order, release = [], asyncio.Event()
+        running = asyncio.create_task(_chat(controller, "alice", order, "a0", release))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(_chat(controller, "bob", order, "b0"))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await _chat(controller, "carol", order, "c0")
+        release.set()
+        await asyncio.gather(running, queued)
+        return rejected.value
+
+    assert asyncio.run(scenario()).status_code == 503
+
+
+def test_rejects_when_the_wait_exceeds_the_deadline():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=10, max_per_user=0, expected_seconds=5.0)
+        order, release = [], asyncio.Event()
+        running = asyncio.create_task(_chat(controller, "alice", order, "a0", release))
+        await asyncio.sleep(0)
+        # One chat ahead (5s) plus this chat's own 5s do not fit into 8s
+        with pytest.raises(AdmissionRejected) as rejected:
+            await _chat(controller, "bob", order, "b0", deadline=8.0)
+        release.set()
+        await running
+        return rejected.value, controller
+
+    rejected, controller = asyncio.run(scenario())
+    assert rejected.status_code == 503
+    assert rejected.retry_after == 5
+    assert controller.status()["queued"] == 0
+
+
+def test_forgets_idle_users_while_busy():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=2, max_queue=10, max_per_user=0, expected_seconds=0.01)
+        order, release = [], asyncio.Event()
+        long_chat = asyncio.create_task(_chat(controller, "long", order, "long", release))
+        await asyncio.sleep(0)
+        for i in range(50):
+            await _chat(controller, f"user{i}", order, f"u{i}")
+        tracked = set(controller._user_finish)
+        release.set()
+        await long_chat
+        return tracked
+
+    assert asyncio.run(scenario()) == {"long"}
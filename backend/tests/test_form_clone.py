@@ -0,0 +1,60 @@
+from app.mcp_servers import gforms_server
+from app.mcp_servers.gforms_server import GFormsMCPServer
+
+
+class _Request:
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self, **kwargs):
+        return self.result
+
+
+class FakeForms:
+    """forms.get/create/batchUpdate over one editable source form."""
+
+    def __init__(self, items):
+        self.items = items
+        self.reads = 0
+        self.created = []
+
+    def forms(self):
+        return self
+
+    def get(self, formId):
+        self.reads += 1
+        return _Request({"info": {"title": "Source"}, "items": list(self.items)})
+
+    def create(self, body):
+        self.created.append([])
+        return _Request({"formId": f"new-{len(self.created)}"})
+
+    def batchUpdate(self, formId, body):
+        self.created[-1].extend(r["createItem"]["item"]["title"] for r in body["requests"] if "createItem" in r)
+        return _Request({})
+
+
+def _item(title):
+    return {"title": title, "questionItem": {"question": {"textQuestion": {}}}}
+
+
+def test_clone_from_a_source_form_sees_its_later_edits(database, monkeypatch):
+    monkeypatch.setattr(gforms_server, "execute_request", lambda request, idempotent=None: request.execute())
+    server = GFormsMCPServer()
+    server.service = FakeForms([_item("Name")])
+    assert server.gforms_clone_form("First", source_form_id="F")["status"] == "success"
+
+    server.service.items.append(_item("Email"))
+    assert server.gforms_clone_form("Second", source_form_id="F")["status"] == "success"
+    assert server.service.created == [["Name"], ["Name", "Email"]]
+
+
+def test_named_template_is_saved_once_and_reused(database, monkeypatch):
+    monkeypatch.setattr(gforms_server, "execute_request", lambda request, idempotent=None: request.execute())
+    server = GFormsMCPServer()
+    server.service = FakeForms([_item("Name")])
+    server.gforms_clone_form("First", template_name="intake", source_form_id="F")
+    server.service.items.append(_item("Email"))
+    server.gforms_clone_form("Second", template_name="intake", source_form_id="F")
+    assert server.service.reads == 1
+    assert server.service.created == [["Name"], ["Name"]]
@@ -0,0 +1,29 @@
+from app.mcp_servers.gforms_responses import FormResponseStore, ResponseAggregator
+
+QUESTIONS = {"q1": {"title": "Rating", "kind": "scale"}}
+
+
+def _response(response_id, submitted, value):
+    return {"responseId": response_id, "lastSubmittedTime": submitted, "answers": {"q1": {"textAnswers": {"answers": [{"value": value}]}}}}
+
+
+def test_overlapping_pages_are_not_counted_twice(database):
+    store, aggregator = FormResponseStore(), ResponseAggregator()
+    page = [_response("r1", "2024-01-01T00:00:00Z", "4"), _response("r2", "2024-01-01T00:00:01Z", "5")]
+    assert store.save_page("F", page, QUESTIONS, aggregator, 0, None) == 2
+    assert store.save_page("F", page, QUESTIONS, aggregator, 2, None) == 0
+    assert aggregator.state["q1"]["options"] == {"4": 1, "5": 1}
+
+
+def test_edited_response_replaces_its_answers_in_the_aggregates(database):
+    store, aggregator = FormResponseStore(), ResponseAggregator()
+    store.save_page("F", [_response("r1", "2024-01-01T00:00:00Z", "1"), _response("r2", "2024-01-01T00:00:01Z", "5")], QUESTIONS, aggregator, 0, None)
+
+    # r1 was edited after the watermark, so the next ingestion fetches it again
+    assert store.save_page("F", [_response("r1", "2024-01-02T00:00:00Z", "3")], QUESTIONS, aggregator, 2, None) == 0
+    entry = aggregator.state["q1"]
+    assert entry["answered"] == 2
+    assert entry["options"] == {"3": 1, "5": 1}
+    assert entry["numeric"]["min"] == 3 and entry["numeric"]["sum"] == 8
+    assert store.load_state("F")["aggregates"] == aggregator.state
+    assert store.latest_responses("F", 1)[0]["answers"]["q1"]["textAnswers"]["answers"][0]["value"] == "3"
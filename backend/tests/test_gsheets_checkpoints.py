@@ -0,0 +1,178 @@
+import pytest
+
+from app.config import settings
+from app.mcp_servers import gsheets_server
+from app.mcp_servers.checkpoint import JobContext, job_context
+from app.mcp_servers.gsheets_server import GSheetsMCPServer
+from app.mcp_servers.gsheets_writer import group_value_ranges, parse_range_start, split_rows
+
+
+class _Request:
+    def __init__(self, run):
+        self._run = run
+
+    def execute(self, **kwargs):
+        return self._run()
+
+
+class FakeSheets:
+    """Just enough of the Sheets v4 values API; fails the `fail_on`-th write to simulate a crash."""
+
+    def __init__(self, grid=None, fail_on=None):
+        self.grid = [list(row) for row in grid or []]
+        self.appended = []
+        self.reads = []
+        self.writes = 0
+        self.fail_on = fail_on
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    def _write(self, apply):
+        def run():
+            self.writes += 1
+            if self.writes == self.fail_on:
+                raise ConnectionError("worker died")
+            return apply()
+        return _Request(run)
+
+    def _set(self, a1_range, values):
+        _, col, row = parse_range_start(a1_range)
+        for r, cells in enumerate(values):
+            while len(self.grid) <= row + r:
+                self.grid.append([])
+            target = self.grid[row + r]
+            target.extend([""] * (col + len(cells) - len(target)))
+            target[col:col + len(cells)] = cells
+        return sum(len(cells) for cells in values)
+
+    def get(self, spreadsheetId, range, valueRenderOption="FORMATTED_VALUE"):
+        self.reads.append(valueRenderOption)
+        return _Request(lambda: {"values": [list(row) for row in self.grid]})
+
+    def batchUpdate(self, spreadsheetId, body):
+        return self._write(lambda: {"totalUpdatedCells": sum(self._set(vr["range"], vr["values"]) for vr in body["data"])})
+
+    def append(self, spreadsheetId, range, valueInputOption, insertDataOption, body):
+        def apply():
+            self.appended.extend(body["values"])
+            return {"updates": {"updatedCells": sum(len(row) for row in body["values"])}}
+        return self._write(apply)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(gsheets_server, "execute_request", lambda request, idempotent=False: request.execute())
+    # Tiny requests, so a handful of rows spans several batches and chunks
+    monkeypatch.setattr(gsheets_server, "group_value_ranges", lambda value_ranges: group_value_ranges(value_ranges, max_bytes=1))
+    monkeypatch.setattr(gsheets_server, "split_rows", lambda values: split_rows(values, max_rows=2))
+    return GSheetsMCPServer()
+
+
+@pytest.fixture
+def job():
+    checkpoints = {}
+    return JobContext("job-1", checkpoints, lambda key, state: checkpoints.__setitem__(key, state) or True)
+
+
+@pytest.mark.parametrize("a1_range, start", [
+    ("Sheet1!B2:D10", ("Sheet1!", 1, 1)),
+    ("A:C", ("", 0, 0)),
+    ("C3", ("", 2, 2)),
+    ("Sheet1", ("Sheet1!", 0, 0)),
+    # Short sheet names look like column letters
+    ("Jan", ("Jan!", 0, 0)),
+    ("Q", ("Q!", 0, 0)),
+    ("Jan!B2", ("Jan!", 1, 1)),
+])
+def test_parse_range_start(a1_range, start):
+    assert parse_range_start(a1_range) == start
+
+
+def _ranges(count):
+    return [{"range": f"Sheet1!A{i + 1}:B{i + 1}", "values": [[f"r{i}", str(i)]]} for i in range(count)]
+
+
+def test_batch_update_resumes_after_the_last_saved_batch(server, job):
+    sheets = FakeSheets(fail_on=3)
+    with job_context(job), pytest.raises(ConnectionError):
+        server._batch_update(sheets, "S", _ranges(5))
+    assert job.checkpoints["sheets.batch_update:S"]["completed"] == 2
+    assert len(sheets.grid) == 2
+
+    sheets.fail_on = None
+    sheets.writes = 0
+    with job_context(job):
+        sent = server._batch_update(sheets, "S", _ranges(5))
+    # Only the three missing batches were sent; the totals still cover the whole write
+    assert sheets.writes == 3
+    assert sent["requests"] == 5 and sent["cells"] == 10 and sent["updated"] == 10
+    assert sheets.grid == [[f"r{i}", str(i)] for i in range(5)]
+
+
+def test_batch_update_outside_a_job_saves_nothing(server, job):
+    sheets = FakeSheets(fail_on=2)
+    with pytest.raises(ConnectionError):
+        server._batch_update(sheets, "S", _ranges(3))
+    assert job.checkpoints == {}
+
+
+def test_append_resumes_without_resending_chunks(server, job):
+    rows = [[f"r{i}", str(i)] for i in range(5)]
+    sheets = FakeSheets(fail_on=2)
+    sheets.spreadsheets = lambda: sheets
+    server.service = sheets
+    with job_context(job):
+        failed = server.gsheet_update_sheet("S", "Sheet1!A1", rows, mode="append")
+    assert failed["status"] == "error"
+    assert job.checkpoints["sheets.append:S:Sheet1!A1"]["completed"] == 1
+
+    sheets.fail_on = None
+    with job_context(job):
+        result = server.gsheet_update_sheet("S", "Sheet1!A1", rows, mode="append")
+    assert result["status"] == "success"
+    # Every row landed exactly once, in order
+    assert sheets.appended == rows
+    assert result["details"]["requests"] == 3
+
+
+def test_diff_resume_sends_the_saved_diff(server, job):
+    sheets = FakeSheets(grid=[["a", "b"], ["c", "d"], ["e", "f"]], fail_on=2)
+    server.service = sheets
+    target = [["X", "b"], ["c", "Y"], ["Z", "f"]]
+    with job_context(job):
+        assert server.gsheet_update_sheet("S", "Sheet1!A1:B3", target, mode="diff")["status"] == "error"
+    assert sheets.grid[0] == ["X", "b"]
+
+    sheets.fail_on = None
+    with job_context(job):
+        result = server.gsheet_update_sheet("S", "Sheet1!A1:B3", target, mode="diff")
+    # Diffing again against the half-written sheet would shift the batches and skip the second row
+    assert result["status"] == "success"
+    assert sheets.grid == target
+
+
+def test_diff_reads_formulas_fresh_instead_of_the_cached_snapshot(server):
+    sheets = FakeSheets(grid=[["1", "=A1+1"]])
+    server.service = sheets
+    # A stale snapshot of the rendered values; the sheet now holds a formula in B1
+    server.table_cache.put("S", "Sheet1!A1:B1", [["1", "2"]])
+    result = server.gsheet_update_sheet("S", "Sheet1!A1:B1", [["1", "2"]], mode="diff")
+    assert result["status"] == "success"
+    assert sheets.reads == ["FORMULA"]
+    # The literal replaces the formula even though it equals the formula's displayed value
+    assert sheets.grid == [["1", "2"]]
+    assert server.table_cache.get("S", "Sheet1!A1:B1") is None
+
+
+@pytest.mark.parametrize("overrides", [{"WORKERS": 2}, {"MCP_SERVER_MODE": "subprocess", "MCP_WORKERS_PER_SERVER": 2}])
+def test_sheet_tables_are_not_cached_across_worker_processes(monkeypatch, overrides):
+    for name, value in overrides.items():
+        monkeypatch.setattr(settings, name, value)
+    server = GSheetsMCPServer()
+    server.table_cache.put("S", "Sheet1!A1:B2", [["name", "n"], ["a", "1"]])
+    # Another worker may have written the sheet since, and only its own copy would be invalidated
+    assert server.table_cache.get("S", "Sheet1!A1:B2") is None
@@ -0,0 +1,109 @@
+import threading
+import time
+
+from app.config import settings
+from app.services.job_queue import JobStore
+
+
+def _submit(store, count, tool_name="gsheet_update_sheet"):
+    jobs = []
+    for i in range(count):
+        jobs.append(store.submit(tool_name, {"n": i}))
+        time.sleep(0.002)  # distinct created_at, so claim order is defined
+    return jobs
+
+
+def test_claim_takes_the_oldest_queued_job(database):
+    store = JobStore()
+    first, second = _submit(store, 2)
+
+    claimed = store.claim()
+    assert claimed["id"] == first["id"]
+    assert claimed["status"] == "running" and claimed["attempts"] == 1
+    assert claimed["args"] == {"n": 0}
+    assert store.claim()["id"] == second["id"]
+    assert store.claim() is None
+
+
+def test_claim_skips_cancelled_jobs(database):
+    store = JobStore()
+    first, second = _submit(store, 2)
+    assert store.cancel(first["id"])["status"] == "cancelled"
+    assert store.claim()["id"] == second["id"]
+
+
+def test_concurrent_claims_never_share_a_job(database):
+    store = JobStore()
+    jobs = _submit(store, 20)
+    claimed, lock = [], threading.Lock()
+
+    def worker():
+        while True:
+            job = JobStore().claim()
+            if job is None:
+                return
+            with lock:
+                claimed.append(job["id"])
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claimed) == sorted(job["id"] for job in jobs)
+
+
+def test_recover_stale_requeues_resumable_jobs(database):
+    store = JobStore()
+    job = _submit(store, 1)[0]
+    store.claim()
+    store.save_checkpoints(job["id"], {"sheets.append:S:A1": {"completed": 2, "total": 5, "data": {}}})
+
+    # A lease in the past makes every running job stale
+    assert store.recover_stale(-1, lambda tool_name: True) == 1
+    recovered = store.get(job["id"])
+    assert recovered["status"] == "queued" and recovered["finished_at"] is None
+    # The next attempt starts from the saved checkpoints
+    resumed = store.claim()
+    assert resumed["id"] == job["id"] and resumed["attempts"] == 2
+    assert resumed["progress"] == {"sheets.append:S:A1": {"completed": 2, "total": 5}}
+
+
+def test_recover_stale_fails_jobs_that_are_unsafe_to_repeat(database):
+    store = JobStore()
+    job = _submit(store, 1, "gmail_send_email")[0]
+    store.claim()
+    assert store.recover_stale(-1, lambda tool_name: tool_name != "gmail_send_email") == 1
+    failed = store.get(job["id"])
+    assert failed["status"] == "failed"
+    assert "not safe to repeat" in failed["error"]
+
+
+def test_recover_stale_gives_up_after_max_attempts(database, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_MAX_ATTEMPTS", 2)
+    store = JobStore()
+    job = _submit(store, 1)[0]
+    store.claim()
+    store.recover_stale(-1, lambda tool_name: True)
+    store.claim()
+    store.recover_stale(-1, lambda tool_name: True)
+    gave_up = store.get(job["id"])
+    assert gave_up["status"] == "failed" and "giving up" in gave_up["error"]
+
+
+def test_recover_stale_finishes_cancelled_jobs(database):
+    store = JobStore()
+    job = _submit(store, 1)[0]
+    store.claim()
+    store.cancel(job["id"])
+    assert store.get(job["id"])["status"] == "running"
+    store.recover_stale(-1, lambda tool_name: True)
+    assert store.get(job["id"])["status"] == "cancelled"
+
+
+def test_recover_stale_leaves_live_jobs_alone(database):
+    store = JobStore()
+    job = _submit(store, 1)[0]
+    store.claim()
+    assert store.recover_stale(60, lambda tool_name: True) == 0
+    assert store.get(job["id"])["status"] == "running"
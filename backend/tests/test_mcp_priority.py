@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+from app.mcp_servers.gsheets_server import GSheetsMCPServer
+from app.mcp_servers.quota import PRIORITY_ARG, current_priority, quota_scope
+from app.services.mcp_worker_pool import MCPWorkerPool
+
+
+def test_pool_sends_the_callers_priority(monkeypatch):
+    sent = []
+
+    async def call(server_name, tool_name, args):
+        sent.append(args)
+        return {"status": "success"}
+
+    pool = MCPWorkerPool([])
+    monkeypatch.setattr(pool, "_call", call)
+    monkeypatch.setattr(pool, "_submit", lambda coro, timeout=None: asyncio.run(coro))
+    with quota_scope(priority="bulk"):
+        pool.call("GSheetsMCPServer", "gsheet_read_sheet", {"spreadsheet_id": "S", "range": "A1"})
+    pool.call("GSheetsMCPServer", "gsheet_read_sheet", {"spreadsheet_id": "S", "range": "A1"})
+    assert [args[PRIORITY_ARG] for args in sent] == ["bulk", "interactive"]
+
+
+def test_host_runs_the_tool_at_the_callers_priority(monkeypatch):
+    types = pytest.importorskip("mcp.types")
+    from app.mcp_servers.mcp_host import build_mcp_server
+
+    seen = []
+
+    def read_sheet(self, spreadsheet_id, range):
+        seen.append((spreadsheet_id, current_priority()))
+        return {"status": "success", "values": []}
+
+    monkeypatch.setattr(GSheetsMCPServer, "gsheet_read_sheet", read_sheet)
+    server = build_mcp_server("GSheetsMCPServer")
+    request = types.CallToolRequest(method="tools/call", params=types.CallToolRequestParams(
+        name="gsheet_read_sheet", arguments={"spreadsheet_id": "S", "range": "A1", PRIORITY_ARG: "bulk"}
+    ))
+    result = asyncio.run(server.request_handlers[types.CallToolRequest](request))
+    assert not result.root.isError
+    assert seen == [("S", "bulk")]
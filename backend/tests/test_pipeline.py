@@ -0,0 +1,98 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.config import settings
+from app.mcp_servers.checkpoint import JobContext, job_context
+from app.services.pipeline import _email_sink, _form_records, _sheet_sink, _SinkStats
+
+
+class _Responses:
+    def __init__(self, questions, responses):
+        self.questions = questions
+        self.responses = responses
+
+    def load_state(self, form_id):
+        return {"questions": self.questions}
+
+    def iter_responses(self, form_id, batch_size):
+        return iter(self.responses)
+
+
+def _answer(value):
+    return {"textAnswers": {"answers": [{"value": value}]}}
+
+
+class FlakySink:
+    """Records tool calls and fails the calls numbered in `fail`."""
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.calls = []
+
+    def __call__(self, tool_name, args):
+        self.calls.append(args)
+        if len(self.calls) in self.fail:
+            return {"status": "error", "message": "quota exceeded"}
+        return {"status": "success"}
+
+
+@pytest.fixture
+def job():
+    checkpoints = {}
+    return JobContext("job-1", checkpoints, lambda key, state: checkpoints.__setitem__(key, state) or True)
+
+
+def test_form_records_carry_every_question_in_form_order():
+    store = _Responses(
+        {"q1": {"title": "Name"}, "q2": {"title": "Phone (optional)"}, "q3": {"title": "Score"}},
+        [{"responseId": "r1", "answers": {"q1": _answer("Ann"), "q3": _answer("9")}},
+         {"responseId": "r2", "answers": {"q1": _answer("Bo"), "q2": _answer("555"), "q3": _answer("7")}}],
+    )
+    records = list(_form_records(SimpleNamespace(response_store=store), lambda tool, args: {"status": "success"}, {"form_id": "F"}))
+    assert list(records[0][1]) == ["response_id", "submitted", "email", "Name", "Phone (optional)", "Score"]
+    assert records[0][1]["Phone (optional)"] == ""
+
+    sink = FlakySink()
+    _sheet_sink(sink, {"spreadsheet_id": "S", "range": "A1"}, records, {}, _SinkStats())
+    assert sink.calls[0]["values"][0][3:] == ["Name", "Phone (optional)", "Score"]
+    assert sink.calls[0]["values"][2][3:] == ["Bo", "555", "7"]
+
+
+def test_sheet_sink_default_columns_are_the_union_of_fields():
+    sink = FlakySink()
+    records = [("1", {"a": "1"}), ("2", {"a": "2", "b": "x"})]
+    _sheet_sink(sink, {"spreadsheet_id": "S", "range": "A1"}, records, {}, _SinkStats())
+    assert sink.calls[0]["values"] == [["a", "b"], ["1", ""], ["2", "x"]]
+
+
+def test_failed_sheet_batch_is_retried_on_resume(job, monkeypatch):
+    monkeypatch.setattr(settings, "PIPELINE_BATCH_ROWS", 1)
+    records = [(str(i), {"n": str(i)}) for i in range(3)]
+    sink, stats = FlakySink(fail={2}), _SinkStats()
+    with job_context(job):
+        _sheet_sink(sink, {"spreadsheet_id": "S", "range": "A1"}, records, {"header": False}, stats)
+    # The sink stops at the failed batch, and only the batch before it is checkpointed
+    assert len(sink.calls) == 2 and stats.written == 1 and stats.errors
+    assert job.checkpoints["pipeline.sink"]["data"]["keys"] == ["0"]
+
+    sink, stats = FlakySink(), _SinkStats()
+    with job_context(job):
+        _sheet_sink(sink, {"spreadsheet_id": "S", "range": "A1"}, records, {"header": False}, stats)
+    assert [call["values"] for call in sink.calls] == [[["1"]], [["2"]]]
+    assert stats.skipped == 1
+
+
+def test_failed_email_is_retried_on_resume(job):
+    args = {"recipient": "{to}", "subject": "Hi", "body": "Hello {to}"}
+    records = [(str(i), {"to": f"u{i}@x.test"}) for i in range(3)]
+    sink = FlakySink(fail={2})
+    with job_context(job):
+        _email_sink(sink, args, records, {}, _SinkStats())
+    assert [c["recipient"] for c in sink.calls] == ["u0@x.test", "u1@x.test"]
+    assert job.checkpoints["pipeline.sink"]["data"]["keys"] == ["0"]
+
+    sink = FlakySink()
+    with job_context(job):
+        _email_sink(sink, args, records, {}, _SinkStats())
+    assert [c["recipient"] for c in sink.calls] == ["u1@x.test", "u2@x.test"]
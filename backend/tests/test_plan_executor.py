@@ -0,0 +1,190 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.config import settings
+from app.services.plan_executor import PLAN_TOOL_NAME, PlanError, PlanExecutor, parse_plan, references, resolve
+
+TOOLS = {"gsheet_read_sheet", "gmail_send_email"}
+
+
+def test_parse_plan_collects_dependencies():
+    steps = parse_plan([
+        {"id": "rows", "tool": "gsheet_read_sheet", "args": {"spreadsheet_id": "S", "range": "A1:B"}},
+        {"id": "draft", "ask": "Write a note about ${rows.values}"},
+        {"id": "mails", "tool": "gmail_send_email", "for_each": "${rows.values}",
+         "args": {"recipient": "${item.1}", "subject": "Hi", "body": "${draft.text}"}, "after": ["rows"]},
+    ], TOOLS, set())
+    assert [s.id for s in steps] == ["rows", "draft", "mails"]
+    assert steps[0].deps == set()
+    assert steps[1].deps == {"rows"}
+    assert steps[2].deps == {"rows", "draft"}
+    assert steps[2].label == "gmail_send_email" and steps[1].label == "ask"
+
+
+def test_parse_plan_accepts_references_to_finished_steps():
+    steps = parse_plan([{"id": "again", "tool": "gmail_send_email", "args": {"body": "${rows.values}"}}], TOOLS, {"rows"})
+    assert steps[0].deps == {"rows"}
+
+
+@pytest.mark.parametrize("specs, error", [
+    ([], "non-empty list"),
+    ([{"tool": "gmail_send_email"}], "needs an id"),
+    ([{"id": "a b", "tool": "gmail_send_email"}], "needs an id"),
+    ([{"id": "a", "tool": "gmail_send_email"}, {"id": "a", "tool": "gmail_send_email"}], "used twice"),
+    ([{"id": "item", "tool": "gmail_send_email"}], "used twice"),
+    ([{"id": "a"}], "exactly one of tool or ask"),
+    ([{"id": "a", "tool": "gmail_send_email", "ask": "?"}], "exactly one of tool or ask"),
+    ([{"id": "a", "tool": "gdocs_delete_everything"}], "unknown tool"),
+    ([{"id": "a", "tool": "gmail_send_email", "args": {"body": "${nowhere.text}"}}], "unknown step(s): nowhere"),
+    ([{"id": "a", "tool": "gmail_send_email", "after": ["b"]}], "unknown step(s): b"),
+])
+def test_parse_plan_rejects_invalid_plans(specs, error):
+    with pytest.raises(PlanError, match=error.replace("(", r"\(").replace(")", r"\)")):
+        parse_plan(specs, TOOLS, set())
+
+
+def test_parse_plan_rejects_cycles():
+    with pytest.raises(PlanError, match="cycle: a, b"):
+        parse_plan([
+            {"id": "root", "tool": "gsheet_read_sheet"},
+            {"id": "a", "ask": "${b.text} ${root.values}"},
+            {"id": "b", "ask": "${a.text}"},
+        ], TOOLS, set())
+
+
+def test_parse_plan_rejects_reusing_a_finished_id():
+    with pytest.raises(PlanError, match="used twice"):
+        parse_plan([{"id": "rows", "tool": "gsheet_read_sheet"}], TOOLS, {"rows"})
+
+
+def test_references_ignore_for_each_locals():
+    assert references({"a": ["${rows.values.0}", "${item.1} ${index}"], "b": 3}) == {"rows"}
+
+
+def test_resolve_keeps_the_type_of_a_whole_reference():
+    scope = {"rows": {"values": [["Ann", "ann@example.com"], ["Bob", "bob@example.com"]]}}
+    assert resolve("${rows.values}", scope) == scope["rows"]["values"]
+    assert resolve({"to": ["${rows.values.1.1}"]}, scope) == {"to": ["bob@example.com"]}
+    assert resolve(7, scope) == 7
+
+
+def test_resolve_formats_embedded_references_as_text():
+    scope = {"rows": {"values": [["Ann", 3]]}, "item": ["Ann", 3]}
+    assert resolve("Hello ${item.0}, you scored ${item.1}", scope) == "Hello Ann, you scored 3"
+    assert resolve("Rows: ${rows.values}", scope) == 'Rows: [["Ann", 3]]'
+
+
+@pytest.mark.parametrize("value, error", [
+    ("${missing.values}", "names no finished step"),
+    ("${rows.values.5}", "does not exist in the output of 'rows'"),
+    ("${rows.values.x}", "does not exist in the output of 'rows'"),
+    ("Hi ${rows.count.deeper}", "does not exist in the output of 'rows'"),
+])
+def test_resolve_rejects_bad_references(value, error):
+    with pytest.raises(PlanError, match=error):
+        resolve(value, {"rows": {"values": [["a"]], "count": 1}})
+
+
+class _Tools:
+    def get_tool_definitions(self):
+        return [{"function": {"name": name}} for name in TOOLS]
+
+    def execute_tool(self, name, args, allow_background=False):
+        if name == "gmail_send_email":
+            return {"status": "error", "message": "send failed"}
+        return {"status": "success", "values": [["a", "b"]]}
+
+
+class _Replanner:
+    def __init__(self, steps):
+        self.steps = steps
+
+    def replan(self, context, tools):
+        call = SimpleNamespace(function=SimpleNamespace(name=PLAN_TOOL_NAME, arguments=json.dumps({"steps": self.steps})))
+        return {"tool_calls": [call], "usage": None}
+
+
+def test_invalid_replan_keeps_the_failed_steps():
+    executor = PlanExecutor(_Tools(), _Replanner([{"id": "retry", "tool": "gmail_send_email", "args": {}, "after": ["missing"]}]))
+    try:
+        result = executor.run("mail the rows", {"steps": [
+            {"id": "rows", "tool": "gsheet_read_sheet", "args": {"spreadsheet_id": "S", "range": "A1:B"}},
+            {"id": "mail", "tool": "gmail_send_email", "args": {"recipient": "${rows.values.0.1}"}},
+        ]})
+    finally:
+        executor.close()
+    assert result["status"] == "partial"
+    assert result["steps"]["mail"]["status"] == "error"
+    assert result["note"].startswith("Invalid re-plan")
+
+
+class _CountingTools(_Tools):
+    def __init__(self):
+        self.running = self.peak = 0
+        self._lock = threading.Lock()
+
+    def execute_tool(self, name, args, allow_background=False):
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(0.05)
+        with self._lock:
+            self.running -= 1
+        return {"status": "success", "values": []}
+
+
+def test_parallel_limit_applies_to_each_plan(monkeypatch):
+    monkeypatch.setattr(settings, "PLAN_MAX_PARALLEL", 2)
+    tools = _CountingTools()
+    executor = PlanExecutor(tools, _Replanner([]))
+    steps = [{"id": f"s{i}", "tool": "gsheet_read_sheet", "args": {"spreadsheet_id": "S", "range": "A1"}} for i in range(6)]
+    try:
+        threads = [threading.Thread(target=executor.run, args=("read", {"steps": steps})) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        executor.close()
+    # Two plans of two steps each; one plan alone never goes above its limit
+    assert tools.peak == 4
+
+
+class _PickyTools(_Tools):
+    def execute_tool(self, name, args, allow_background=False):
+        if name == "gmail_send_email":
+            ok = args["recipient"] != "bad@x.test"
+            return {"status": "success" if ok else "error", "message": "sent" if ok else "bounced"}
+        return {"status": "success", "values": [["a@x.test"], ["bad@x.test"], ["c@x.test"]]}
+
+
+class _GiveUp:
+    def __init__(self):
+        self.contexts = []
+
+    def replan(self, context, tools):
+        self.contexts.append(context)
+        return {"tool_calls": [], "text": "Could not fix it.", "usage": None}
+
+
+def test_for_each_with_failed_items_is_not_counted_as_success():
+    llm = _GiveUp()
+    executor = PlanExecutor(_PickyTools(), llm)
+    try:
+        result = executor.run("mail everyone", {"steps": [
+            {"id": "rows", "tool": "gsheet_read_sheet", "args": {"spreadsheet_id": "S", "range": "A1:A3"}},
+            {"id": "mails", "tool": "gmail_send_email", "for_each": "${rows.values}", "args": {"recipient": "${item.0}"}},
+            {"id": "report", "tool": "gmail_send_email", "after": ["mails"], "args": {"recipient": "me@x.test"}},
+        ]})
+    finally:
+        executor.close()
+    assert result["status"] == "partial"
+    assert result["steps"]["mails"]["status"] == "partial"
+    assert result["steps"]["report"]["status"] == "skipped"
+    assert "1 partly failed" in result["message"]
+    # The failure was offered for re-planning, with the items that need another try
+    assert "Failed item indexes: [1]" in llm.contexts[0]
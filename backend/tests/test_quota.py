@@ -0,0 +1,64 @@
+import time
+
+import pytest
+
+from app.mcp_servers import resilience
+from app.config import settings
+from app.mcp_servers.quota import QuotaQueue, quota_limits
+from app.mcp_servers.resilience import CircuitBreaker, CircuitOpenError, execute_request
+
+
+class _Request:
+    methodId = "sheets.spreadsheets.values.get"
+    method = "GET"
+
+    def execute(self, **kwargs):
+        return {}
+
+
+def test_open_circuit_rejects_before_taking_quota(monkeypatch):
+    acquired = []
+    breaker = CircuitBreaker("sheets", failure_threshold=1, reset_seconds=60)
+    breaker.record_failure()
+    monkeypatch.setattr(resilience, "get_breaker", lambda api: breaker)
+    monkeypatch.setattr(resilience.scheduler, "acquire", lambda request, deadline: acquired.append(request))
+    with pytest.raises(CircuitOpenError):
+        execute_request(_Request())
+    assert acquired == []
+
+
+def test_quota_timeout_hands_back_the_half_open_probe(monkeypatch):
+    breaker = CircuitBreaker("sheets", failure_threshold=1, reset_seconds=0)
+    breaker.record_failure()
+
+    def timeout(request, deadline):
+        raise TimeoutError("no quota")
+
+    monkeypatch.setattr(resilience, "get_breaker", lambda api: breaker)
+    monkeypatch.setattr(resilience.scheduler, "acquire", timeout)
+    with pytest.raises(TimeoutError):
+        execute_request(_Request())
+    assert breaker.allow()
+
+
+def test_idle_users_are_forgotten():
+    queue = QuotaQueue("sheets/read", project_per_minute=6000, user_per_minute=6000)
+    for i in range(50):
+        queue.acquire(1, f"user-{i}", "interactive", time.monotonic() + 1)
+    # Nobody is queued, so every tag is passed; buckets go once they have refilled
+    assert queue._user_finish == {}
+    time.sleep(0.05)
+    queue.acquire(1, "user-last", "interactive", time.monotonic() + 1)
+    assert set(queue.users) == {"user-last"}
+
+
+def test_quota_is_split_across_every_process_calling_the_api(monkeypatch):
+    monkeypatch.setattr(settings, "WORKERS", 2)
+    monkeypatch.setattr(settings, "MCP_SERVER_MODE", "subprocess")
+    monkeypatch.setattr(settings, "MCP_WORKERS_PER_SERVER", 2)
+    monkeypatch.setattr(settings, "MCP_SERVER_WORKERS", {"GSheetsMCPServer": 3})
+    # 2 uvicorn workers x 3 sheets host processes, each pacing on its own
+    assert quota_limits("sheets")["read"] == (300 // 6, 60 // 6)
+    assert quota_limits("docs")["write"] == (600 // 4, 60 // 4)
+    monkeypatch.setattr(settings, "MCP_SERVER_MODE", "inprocess")
+    assert quota_limits("sheets")["read"] == (150, 30)
@@ -0,0 +1,129 @@
+import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
+
+from app.config import settings
+from app.mcp_servers import resilience
+from app.mcp_servers.resilience import CircuitBreaker, CircuitOpenError, execute_request
+
+
+class FakeHttp:
+    """Answers each request with the next (status, delay) in `script`; the last entry repeats."""
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        with self._lock:
+            self.calls += 1
+            status, delay = self.script[min(self.calls, len(self.script)) - 1]
+            call = self.calls
+        time.sleep(delay)
+        if isinstance(status, Exception):
+            raise status
+        return httplib2.Response({"status": status}), json.dumps({"call": call}).encode()
+
+
+def _request(http, method="GET", method_id="sheets.spreadsheets.values.get"):
+    return HttpRequest(http, lambda resp, content: json.loads(content), "https://sheets.test/v4", method=method, methodId=method_id)
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    breaker = CircuitBreaker("sheets", failure_threshold=3, reset_seconds=60)
+    monkeypatch.setattr(resilience, "get_breaker", lambda api: breaker)
+    monkeypatch.setattr(resilience, "_backoff", lambda attempt, error: 0.0)
+    monkeypatch.setattr(settings, "GOOGLE_QUOTA_ENABLED", False)
+    monkeypatch.setattr(settings, "GOOGLE_RETRY_MAX_ATTEMPTS", 3)
+    return breaker
+
+
+def test_429_is_retried_even_for_writes(breaker):
+    http = FakeHttp((429, 0), (200, 0))
+    assert execute_request(_request(http, method="POST", method_id="gmail.users.messages.send")) == {"call": 2}
+
+
+@pytest.mark.parametrize("failure", [503, ConnectionError("reset")])
+def test_transient_failures_are_retried_for_reads(breaker, failure):
+    http = FakeHttp((failure, 0), (200, 0))
+    assert execute_request(_request(http)) == {"call": 2}
+    assert breaker.state == "closed" and breaker.failures == 0
+
+
+@pytest.mark.parametrize("failure", [503, ConnectionError("reset")])
+def test_transient_failures_are_not_retried_for_writes(breaker, failure):
+    # The first attempt may have been applied; a retry could send the email or append the rows twice
+    http = FakeHttp((failure, 0), (200, 0))
+    with pytest.raises((HttpError, ConnectionError)):
+        execute_request(_request(http, method="POST", method_id="sheets.spreadsheets.values.append"))
+    assert http.calls == 1
+
+
+def test_client_errors_are_not_retried_and_do_not_trip_the_breaker(breaker):
+    http = FakeHttp((404, 0))
+    with pytest.raises(HttpError):
+        execute_request(_request(http))
+    assert http.calls == 1
+    assert breaker.failures == 0
+
+
+def test_breaker_opens_and_is_checked_before_quota(breaker, monkeypatch):
+    http = FakeHttp((503, 0))
+    with pytest.raises(HttpError):
+        execute_request(_request(http))
+    assert breaker.state == "open" and http.calls == 3
+
+    acquired = []
+    monkeypatch.setattr(resilience.scheduler, "acquire", lambda request, deadline: acquired.append(request))
+    with pytest.raises(CircuitOpenError):
+        execute_request(_request(http))
+    assert http.calls == 3 and acquired == []
+
+
+def test_slow_read_is_hedged_and_the_faster_copy_wins(breaker, monkeypatch):
+    monkeypatch.setattr(settings, "GOOGLE_HEDGE_AFTER_SECONDS", 0.05)
+    http = FakeHttp((200, 0.5), (200, 0))
+    assert execute_request(_request(http)) == {"call": 2}
+
+
+def test_writes_are_never_hedged(breaker, monkeypatch):
+    monkeypatch.setattr(settings, "GOOGLE_HEDGE_AFTER_SECONDS", 0.01)
+    http = FakeHttp((200, 0.1))
+    assert execute_request(_request(http, method="POST", method_id="sheets.spreadsheets.values.append")) == {"call": 1}
+    time.sleep(0.15)
+    assert http.calls == 1
+
+
+class _BusyExecutor:
+    """Runs the first submission; later ones stay queued, as when every executor thread is busy."""
+
+    def __init__(self):
+        self.pool = ThreadPoolExecutor(max_workers=1)
+        self.queued = []
+        self.started = False
+
+    def submit(self, fn, *args):
+        if not self.started:
+            self.started = True
+            return self.pool.submit(fn, *args)
+        future = Future()
+        self.queued.append(future)
+        return future
+
+
+def test_hedge_that_has_not_started_is_cancelled(breaker, monkeypatch):
+    executor = _BusyExecutor()
+    monkeypatch.setattr(resilience, "_executor", executor)
+    monkeypatch.setattr(settings, "GOOGLE_HEDGE_AFTER_SECONDS", 0.02)
+    http = FakeHttp((200, 0.1))
+    assert execute_request(_request(http)) == {"call": 1}
+    assert len(executor.queued) == 1 and executor.queued[0].cancelled()
+    assert http.calls == 1
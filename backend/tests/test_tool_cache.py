@@ -0,0 +1,48 @@
+import pytest
+
+from app.services.tool_cache import SQLiteToolResultCache, ToolResultCache
+
+OK = {"status": "success", "values": [["a"]]}
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache(request, database):
+    return ToolResultCache() if request.param == "memory" else SQLiteToolResultCache()
+
+
+@pytest.mark.parametrize("write, write_args, read, read_args", [
+    ("gmail_send_email", {"recipient": "a@b.c"}, "gmail_read_emails", {"max_results": 5}),
+    ("calendar_schedule_meeting", {"summary": "Sync"}, "calendar_list_events", {}),
+    ("calendar_cancel_event", {"event_id": "E"}, "calendar_list_events", {}),
+    ("gdocs_update_document", {"document_id": "D"}, "gdocs_read_document", {"document_id": "D"}),
+    ("gsheet_update_sheet", {"spreadsheet_id": "S"}, "gsheet_read_sheet", {"spreadsheet_id": "S", "range": "A1:B"}),
+    ("gsheet_update_sheet", {"spreadsheet_id": "S"}, "gsheet_query", {"spreadsheet_id": "S", "range": "A1:B"}),
+])
+def test_write_invalidates_cached_reads(cache, write, write_args, read, read_args):
+    cache.put(read, read_args, OK, since=cache.begin_read())
+    assert cache.get(read, read_args) == OK
+    assert cache.invalidate_for(write, write_args) == 1
+    assert cache.get(read, read_args) is None
+
+
+def test_write_leaves_other_resources_cached(cache):
+    cache.put("gsheet_read_sheet", {"spreadsheet_id": "T", "range": "A1"}, OK, since=cache.begin_read())
+    assert cache.invalidate_for("gsheet_update_sheet", {"spreadsheet_id": "S"}) == 0
+    assert cache.get("gsheet_read_sheet", {"spreadsheet_id": "T", "range": "A1"}) == OK
+
+
+def test_read_that_overlapped_a_write_is_not_stored(cache):
+    args = {"document_id": "D"}
+    since = cache.begin_read()
+    # The write lands while the read is still running, so its result may predate the write
+    cache.invalidate_for("gdocs_update_document", args)
+    cache.put("gdocs_read_document", args, OK, since=since)
+    assert cache.get("gdocs_read_document", args) is None
+
+    cache.put("gdocs_read_document", args, OK, since=cache.begin_read())
+    assert cache.get("gdocs_read_document", args) == OK
+
+
+def test_errors_are_not_cached(cache):
+    cache.put("gdocs_read_document", {"document_id": "D"}, {"status": "error", "message": "nope"}, since=cache.begin_read())
+    assert cache.get("gdocs_read_document", {"document_id": "D"}) is None